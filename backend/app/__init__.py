@@ -1,13 +1,23 @@
 from flask import Flask, send_from_directory
 from .db import db, migrate
+from .services.presence import presence
+from .services.message_writer import message_writer
+from .services.password_hasher import password_hasher
+from .services.auth import auth
+from .services.profile_cache import profile_cache
+from .services.chat_purge import chat_purge
 import os
-from .models import user, chat, message, rating
+import secrets
+from .models import user, chat, chat_member, chat_participant, message, message_archive_segment, rating, rating_summary
 from .routes.auth import auth_bp
 from .routes.profile import profile_bp
 from .routes.match import match_bp
 from .routes.chat import chat_bp
 from .routes.upload import upload_bp
 from .routes.ratings import rating_bp
+from .routes.sync import sync_bp
+from .routes.users import users_bp
+from .cli import messages_cli, chats_cli, bench_cli, users_cli
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -30,12 +40,61 @@ def create_app(config=None):
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("SQLALCHEMY_DATABASE_URI")
     app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024  # 5MB max file size
     app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(__file__), "..", "uploads")
+    # Messages older than this, in chats idle for MESSAGE_ARCHIVE_INACTIVE_DAYS, move to the archive
+    app.config["MESSAGE_ARCHIVE_AGE_DAYS"] = int(os.environ.get("MESSAGE_ARCHIVE_AGE_DAYS", 365))
+    app.config["MESSAGE_ARCHIVE_INACTIVE_DAYS"] = int(os.environ.get("MESSAGE_ARCHIVE_INACTIVE_DAYS", 90))
+    # POST /chats/messages/bulk is refused unless this is set, flask messages import always works
+    app.config["MESSAGE_BULK_IMPORT_ENABLED"] = os.environ.get("MESSAGE_BULK_IMPORT_ENABLED", "false").lower() == "true"
+    # Deleted chats are purged by a background thread (or only by flask chats purge
+    # when CHAT_PURGE_IN_BACKGROUND is false), in batches of this many rows
+    app.config["CHAT_PURGE_IN_BACKGROUND"] = os.environ.get("CHAT_PURGE_IN_BACKGROUND", "true").lower() == "true"
+    app.config["CHAT_PURGE_BATCH_SIZE"] = int(os.environ.get("CHAT_PURGE_BATCH_SIZE", 1000))
+    # Users are online for this long after their last activity, which is
+    # written to users.last_seen_at every PRESENCE_FLUSH_SECONDS (0 disables the flush thread)
+    app.config["PRESENCE_TTL_SECONDS"] = int(os.environ.get("PRESENCE_TTL_SECONDS", 60))
+    app.config["PRESENCE_FLUSH_SECONDS"] = int(os.environ.get("PRESENCE_FLUSH_SECONDS", 30))
+    # Group commit: sent messages arriving within the window are committed as one transaction
+    app.config["MESSAGE_GROUP_COMMIT"] = os.environ.get("MESSAGE_GROUP_COMMIT", "false").lower() == "true"
+    app.config["MESSAGE_GROUP_COMMIT_WINDOW_MS"] = float(os.environ.get("MESSAGE_GROUP_COMMIT_WINDOW_MS", 5))
+    app.config["MESSAGE_GROUP_COMMIT_MAX_BATCH"] = int(os.environ.get("MESSAGE_GROUP_COMMIT_MAX_BATCH", 100))
+    # A send that waits longer than this for its batch to commit answers 202, as the batch may still commit
+    app.config["MESSAGE_GROUP_COMMIT_TIMEOUT_SECONDS"] = float(os.environ.get("MESSAGE_GROUP_COMMIT_TIMEOUT_SECONDS", 10))
+    # Password hashing runs in a pool of worker processes (0 hashes on the request thread).
+    # Stored hashes made with another method are rehashed on the next login
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 32))
+    app.config["PASSWORD_HASH_TIMEOUT_SECONDS"] = float(os.environ.get("PASSWORD_HASH_TIMEOUT_SECONDS", 5))
+    # Login returns a signed token, so every process must share the SECRET_KEY
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY")
+    app.config["AUTH_TOKEN_MAX_AGE_SECONDS"] = int(os.environ.get("AUTH_TOKEN_MAX_AGE_SECONDS", 7 * 24 * 3600))
+    # Routes acting as a user reject requests without a token when this is set
+    app.config["AUTH_REQUIRED"] = os.environ.get("AUTH_REQUIRED", "false").lower() == "true"
+    # Users confirmed to exist are cached per process for this long (0 disables the cache)
+    app.config["AUTH_PRINCIPAL_TTL_SECONDS"] = float(os.environ.get("AUTH_PRINCIPAL_TTL_SECONDS", 60))
+    app.config["AUTH_PRINCIPAL_CACHE_SIZE"] = int(os.environ.get("AUTH_PRINCIPAL_CACHE_SIZE", 10000))
+    # Serialized profiles are cached in memory:// (per process) or redis://host/db (shared)
+    app.config["PROFILE_CACHE_URL"] = os.environ.get("PROFILE_CACHE_URL", "memory://")
+    app.config["PROFILE_CACHE_TTL_SECONDS"] = int(os.environ.get("PROFILE_CACHE_TTL_SECONDS", 300))
+    app.config["PROFILE_CACHE_SIZE"] = int(os.environ.get("PROFILE_CACHE_SIZE", 10000))
 
     if config:
         app.config.update(config)
 
+    if not app.config["SECRET_KEY"]:
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY must be set outside debug mode and tests")
+        # A random key per process is fine when a single process serves everything
+        app.config["SECRET_KEY"] = secrets.token_hex(32)
+
     db.init_app(app)
     migrate.init_app(app, db)
+    presence.init_app(app)
+    message_writer.init_app(app)
+    password_hasher.init_app(app)
+    auth.init_app(app)
+    profile_cache.init_app(app)
+    chat_purge.init_app(app)
 
     # Register Blueprints
     app.register_blueprint(auth_bp)
@@ -44,5 +103,13 @@ def create_app(config=None):
     app.register_blueprint(chat_bp)
     app.register_blueprint(upload_bp)
     app.register_blueprint(rating_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(users_bp)
+
+    # Register CLI commands
+    app.cli.add_command(messages_cli)
+    app.cli.add_command(chats_cli)
+    app.cli.add_command(bench_cli)
+    app.cli.add_command(users_cli)
 
     return app
\ No newline at end of file
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .services.message_import import import_messages, DEFAULT_CHUNK_SIZE
+from .services.message_archive import archive_messages, DEFAULT_SEGMENT_SIZE
+from .services.chat_purge import purge_deleted_chats
+from .services.user_import import import_users, DEFAULT_CHUNK_SIZE as DEFAULT_USER_CHUNK_SIZE
+from .services.benchmark import (
+    seed_dataset, run_benchmarks,
+    DEFAULT_USERS, DEFAULT_CHATS, DEFAULT_MESSAGES, DEFAULT_BATCH_SIZE, DEFAULT_REQUESTS
+)
+
+messages_cli = AppGroup("messages", help="Manage chat messages.")
+chats_cli = AppGroup("chats", help="Manage chats.")
+bench_cli = AppGroup("bench", help="Seed and benchmark the chat routes.")
+users_cli = AppGroup("users", help="Manage users.")
+
+def read_records(file):
+    """Stream dict records from a JSON Lines or CSV file, chosen by extension"""
+    if file.name.endswith(".csv"):
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+@messages_cli.command("import")
+@click.argument("file", type=click.File("r", encoding="utf-8"))
+@click.option("--chunk-size", default=DEFAULT_CHUNK_SIZE, show_default=True, help="Messages per transaction.")
+def import_messages_command(file, chunk_size):
+    """Bulk import messages from a JSON Lines or CSV FILE."""
+    result = import_messages(read_records(file), chunk_size=chunk_size)
+    for rejected in result["rejected"]:
+        click.echo(f"Rejected record {rejected['index']}: {rejected['error']}", err=True)
+    click.echo(
+        f"Imported {result['inserted']} messages ({result['rejected_count']} rejected) "
+        f"in {result['elapsed_seconds']}s, {result['rows_per_second']} rows/s"
+    )
+
+@messages_cli.command("archive")
+@click.option("--older-than-days", type=int, help="Archive messages older than this. Defaults to MESSAGE_ARCHIVE_AGE_DAYS.")
+@click.option("--inactive-days", type=int, help="Only archive chats idle this long. Defaults to MESSAGE_ARCHIVE_INACTIVE_DAYS.")
+@click.option("--segment-size", default=DEFAULT_SEGMENT_SIZE, show_default=True, help="Messages per compressed segment.")
+def archive_messages_command(older_than_days, inactive_days, segment_size):
+    """Move old messages from inactive chats into the compressed archive."""
+    result = archive_messages(
+        older_than_days if older_than_days is not None else current_app.config["MESSAGE_ARCHIVE_AGE_DAYS"],
+        inactive_days if inactive_days is not None else current_app.config["MESSAGE_ARCHIVE_INACTIVE_DAYS"],
+        segment_size=segment_size
+    )
+    click.echo(
+        f"Archived {result['messages']} messages from {result['chats']} chats "
+        f"into {result['segments']} segments in {result['elapsed_seconds']}s"
+    )
+
+@chats_cli.command("purge")
+@click.option("--batch-size", type=int, help="Rows per DELETE. Defaults to CHAT_PURGE_BATCH_SIZE.")
+def purge_chats_command(batch_size):
+    """Purge the messages and ratings of deleted chats."""
+    result = purge_deleted_chats(batch_size or current_app.config["CHAT_PURGE_BATCH_SIZE"])
+    click.echo(f"Purged {result['chats']} deleted chats ({result['rows']} rows)")
+
+@users_cli.command("import")
+@click.argument("file", type=click.File("r", encoding="utf-8"))
+@click.option("--chunk-size", default=DEFAULT_USER_CHUNK_SIZE, show_default=True, help="Users per transaction.")
+@click.option("--workers", type=int, help="Processes hashing passwords, 0 to hash inline. Defaults to the CPU count.")
+def import_users_command(file, chunk_size, workers):
+    """Bulk import users from a JSON Lines or CSV FILE."""
+    result = import_users(
+        read_records(file), chunk_size=chunk_size, workers=workers if workers is not None else os.cpu_count() or 1
+    )
+    for rejected in result["rejected"]:
+        click.echo(f"Rejected record {rejected['index']}: {rejected['error']}", err=True)
+    click.echo(
+        f"Imported {result['inserted']} users ({result['rejected_count']} rejected) "
+        f"in {result['elapsed_seconds']}s, {result['rows_per_second']} rows/s"
+    )
+
+@bench_cli.command("seed")
+@click.option("--users", default=DEFAULT_USERS, show_default=True, help="Number of users.")
+@click.option("--chats", default=DEFAULT_CHATS, show_default=True, help="Number of chats.")
+@click.option("--messages", default=DEFAULT_MESSAGES, show_default=True, help="Number of messages.")
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True, help="Rows per batch and commit.")
+@click.option("--seed", default=42, show_default=True, help="Random seed.")
+def seed_benchmark_command(users, chats, messages, batch_size, seed):
+    """Bulk-generate a benchmark data set into the configured database."""
+    try:
+        result = seed_dataset(users, chats, messages, batch_size=batch_size, seed=seed, progress=click.echo)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(
+        f"Seeded {result['users']} users, {result['chats']} chats and "
+        f"{result['messages']} messages in {result['elapsed_seconds']}s"
+    )
+
+@bench_cli.command("run")
+@click.option("--requests", default=DEFAULT_REQUESTS, show_default=True, help="Requests per scenario.")
+@click.option("--scenario", "scenarios", multiple=True,
+              type=click.Choice(["get_user_chats", "get_chat_messages", "send_message", "mark_messages_as_read"]),
+              help="Scenario to run, repeatable. Defaults to all.")
+@click.option("--seed", default=42, show_default=True, help="Random seed.")
+@click.option("--login-threads", default=0, show_default=True,
+              help="Threads signing in a seeded user while the scenarios run.")
+@click.option("--json", "as_json", is_flag=True, help="Print the results as JSON.")
+def run_benchmark_command(requests, scenarios, seed, login_threads, as_json):
+    """Benchmark the chat routes against the seeded database."""
+    try:
+        results = run_benchmarks(current_app._get_current_object(), requests=requests, scenarios=list(scenarios) or None,
+                                 seed=seed, login_threads=login_threads)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+    login_load = results.pop("login_load", None)
+    click.echo(f"{'scenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'stmts':>8}{'rows':>10}")
+    for name, result in results.items():
+        rows = result["rows_scanned"] if result["rows_scanned"] is not None else "n/a"
+        click.echo(
+            f"{name:<24}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{result['max_ms']:>10}{result['statements']:>8}{rows:>10}"
+        )
+    if login_load:
+        click.echo(
+            f"login load: {login_load['threads']} threads, {login_load['logins_per_second']} logins/s, "
+            f"{login_load['failures']} failed"
+        )
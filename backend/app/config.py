@@ -1,3 +1,13 @@
 # config.py
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB 
\ No newline at end of file
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MESSAGE_PAGE_SIZE_MAX = 200
+MESSAGE_PREVIEW_LENGTH = 100
+SYNC_MESSAGE_LIMIT = 500
+RATING_PAGE_SIZE_MAX = 100
+USER_SEARCH_PAGE_SIZE_MAX = 50
+# Time-decayed Bayesian reputation: ratings lose half their weight every
+# half-life and are averaged with PRIOR_WEIGHT ratings of PRIOR_MEAN
+REPUTATION_HALF_LIFE_DAYS = 180
+REPUTATION_PRIOR_MEAN = 3.0
+REPUTATION_PRIOR_WEIGHT = 5
@@ -1,6 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.dialects import postgresql, sqlite
 from .models.base import Base
 
 db = SQLAlchemy(model_class=Base)
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+def dialect_insert(cls):
+    """
+    Build an INSERT for the bound database dialect.
+
+    The PostgreSQL and SQLite inserts both support ON CONFLICT, which lets
+    callers write upserts as a single statement.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(cls)
+    return sqlite.insert(cls)
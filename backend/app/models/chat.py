@@ -1,30 +1,78 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from ..db import db
-from sqlalchemy import ForeignKey
+from ..db import db, dialect_insert
+from .chat_member import ChatMember
+from .sync_version import VERSION_TYPE, next_version
+from sqlalchemy import ForeignKey, Index
+from typing import Optional
 from datetime import datetime, timezone
 
+def pair_low_id(context):
+    """Default for user_low_id: the lower of the two participant ids"""
+    params = context.get_current_parameters()
+    return min(params["user1_id"], params["user2_id"])
+
+def pair_high_id(context):
+    """Default for user_high_id: the higher of the two participant ids"""
+    params = context.get_current_parameters()
+    return max(params["user1_id"], params["user2_id"])
+
 class Chat(db.Model):
     __tablename__ = "chats"
+    __table_args__ = (
+        # One live chat per pair of users, whichever of them started it
+        Index(
+            "uq_chats_user_pair", "user_low_id", "user_high_id",
+            unique=True,
+            postgresql_where=db.text("deleted_at IS NULL"),
+            sqlite_where=db.text("deleted_at IS NULL")
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Foreign keys column
     user1_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     user2_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Canonical (low, high) ordering of the two user ids
+    user_low_id: Mapped[int] = mapped_column(nullable=False, default=pair_low_id)
+    user_high_id: Mapped[int] = mapped_column(nullable=False, default=pair_high_id)
 
     created_at: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    # Set when the chat is deleted; its messages and ratings are purged in the background
+    deleted_at: Mapped[Optional[datetime]]
+    # Latest message and message count, kept up to date as messages are inserted.
+    # last_message_id is not a foreign key because old messages move to the archive.
+    last_message_id: Mapped[Optional[int]]
+    last_message_at: Mapped[Optional[datetime]]
+    message_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    # Change version for client sync, bumped on every update: new messages,
+    # deletion, and explicitly by touch() for changes stored in other tables
+    version: Mapped[int] = mapped_column(
+        VERSION_TYPE, nullable=False, default=next_version(), onupdate=next_version(), server_default="0", index=True
+    )
 
     # Relationship attributes
     user1: Mapped["User"] = relationship("User", foreign_keys=[user1_id], backref="chats_as_user1")
     user2: Mapped["User"] = relationship("User", foreign_keys=[user2_id], backref="chats_as_user2")
     messages: Mapped[list["Message"]] = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    archive_segments: Mapped[list["MessageArchiveSegment"]] = relationship("MessageArchiveSegment", back_populates="chat", cascade="all, delete-orphan")
+    participants: Mapped[list["ChatParticipant"]] = relationship("ChatParticipant", back_populates="chat", cascade="all, delete-orphan")
+    members: Mapped[list["ChatMember"]] = relationship("ChatMember", back_populates="chat", cascade="all, delete-orphan")
+    last_message: Mapped[Optional["Message"]] = relationship(
+        "Message", primaryjoin="foreign(Chat.last_message_id) == Message.id", viewonly=True
+    )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.created_at is None:
             self.created_at = datetime.now(timezone.utc)
+        if not self.members and self.user1_id is not None and self.user2_id is not None:
+            self.members = [ChatMember(user_id=user_id) for user_id in dict.fromkeys((self.user1_id, self.user2_id))]
 
-    def to_dict(self, current_user_id=None):
-        """Convert chat to dictionary with relationship data"""
+    def to_dict(self, current_user_id=None, is_rated=None):
+        """
+        Convert chat to dictionary with relationship data.
+        Pass is_rated when it is already known, to skip the rating lookup for current_user_id.
+        """
         result = {
             "id": self.id,
             "user1_id": self.user1_id,
@@ -34,9 +82,13 @@ class Chat(db.Model):
             "user2_name": self.user2.name,
             "user1_avatar": self.user1.image_url,
             "user2_avatar": self.user2.image_url,
+            "last_message_at": self.last_message_at.isoformat() if self.last_message_at else None,
+            "message_count": self.message_count,
         }
         
-        if current_user_id is not None:
+        if is_rated is not None:
+            result["is_rated_by_current_user"] = is_rated
+        elif current_user_id is not None:
             # Import Rating here to avoid circular import
             from .rating import Rating
             # Check if the current user has already submitted a rating in this chat
@@ -49,11 +101,110 @@ class Chat(db.Model):
             
         return result
 
+    @classmethod
+    def get_or_create(cls, user1_id, user2_id):
+        """
+        Return the chat between two users, creating it if needed, in one statement.
+
+        The insert upserts on the unique (user_low_id, user_high_id) pair of live chats, so
+        concurrent requests for the same pair all get the same row back. A new chat
+        also gets its two members. The caller commits.
+
+        Returns:
+            Tuple of (chat, created)
+        """
+        created_at = datetime.now(timezone.utc)
+        statement = dialect_insert(cls).values(
+            user1_id=user1_id,
+            user2_id=user2_id,
+            user_low_id=min(user1_id, user2_id),
+            user_high_id=max(user1_id, user2_id),
+            created_at=created_at
+        )
+        # A no-op update on conflict makes RETURNING yield the existing row too
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.user_low_id, cls.user_high_id],
+            index_where=cls.deleted_at.is_(None),
+            set_={"user_low_id": statement.excluded.user_low_id}
+        ).returning(cls, cls.created_at == created_at)
+        chat, created = db.session.execute(
+            statement, execution_options={"populate_existing": True}
+        ).one()
+        if created:
+            db.session.execute(
+                db.insert(ChatMember),
+                [{"chat_id": chat.id, "user_id": user_id} for user_id in dict.fromkeys((user1_id, user2_id))]
+            )
+        return chat, bool(created)
+
+    @classmethod
+    def record_messages(cls, connection, messages):
+        """
+        Count newly inserted messages and advance each chat's latest message,
+        with one executemany UPDATE of the chats and one of their members. The latest message is the newest by
+        timestamp, so importing older history leaves it in place.
+
+        Args:
+            connection: The connection the messages were inserted on
+            messages: Iterable of (chat_id, timestamp) pairs
+        """
+        # Import Message here to avoid circular import
+        from .message import Message
+        summaries = {}
+        for chat_id, timestamp in messages:
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=timezone.utc)
+            summary = summaries.setdefault(chat_id, {"target_id": chat_id, "added": 0, "latest_at": timestamp})
+            summary["added"] += 1
+            summary["latest_at"] = max(summary["latest_at"], timestamp)
+        if not summaries:
+            return
+
+        chats = cls.__table__
+        latest_at = db.bindparam("latest_at", type_=db.DateTime)
+        latest_id = (
+            db.select(Message.id)
+            .where(Message.chat_id == chats.c.id, Message.timestamp == latest_at)
+            .order_by(Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        is_newer = db.or_(chats.c.last_message_at.is_(None), chats.c.last_message_at <= latest_at)
+        statement = (
+            db.update(chats)
+            .where(chats.c.id == db.bindparam("target_id"))
+            .values(
+                message_count=chats.c.message_count + db.bindparam("added", type_=db.Integer),
+                last_message_at=db.case((is_newer, latest_at), else_=chats.c.last_message_at),
+                last_message_id=db.case((is_newer, latest_id), else_=chats.c.last_message_id)
+            )
+        )
+        connection.execute(statement, list(summaries.values()))
+
+        # Members keep a copy for the inbox index
+        members = ChatMember.__table__
+        connection.execute(
+            db.update(members)
+            .where(members.c.chat_id == db.bindparam("target_id"))
+            .values(last_message_at=db.case(
+                (db.or_(members.c.last_message_at.is_(None), members.c.last_message_at <= latest_at), latest_at),
+                else_=members.c.last_message_at
+            )),
+            list(summaries.values())
+        )
+
+    @classmethod
+    def touch(cls, chat_id):
+        """Bump a chat's change version, for changes such as read cursors that live in other tables"""
+        db.session.execute(
+            db.update(cls.__table__).where(cls.__table__.c.id == chat_id).values(version=next_version())
+        )
+
     @classmethod
     def from_dict(cls, data):
         """Create chat from dictionary data"""
-        chat = cls()
-        chat.user1_id = data["user1_id"]
-        chat.user2_id = data["user2_id"]
-        chat.created_at = data.get("created_at") or datetime.now(timezone.utc)
-        return chat
\ No newline at end of file
+        return cls(
+            user1_id=data["user1_id"],
+            user2_id=data["user2_id"],
+            created_at=data.get("created_at") or datetime.now(timezone.utc)
+        )
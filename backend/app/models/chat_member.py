@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from ..db import db
+from sqlalchemy import ForeignKey, Index
+
+class ChatMember(db.Model):
+    """Membership of a user in a chat, the index-backed way to find a user's chats"""
+    __tablename__ = "chat_members"
+    __table_args__ = (
+        # Serves "chats of this user" as a range scan
+        Index("ix_chat_members_user_id_chat_id", "user_id", "chat_id"),
+        # Serve each member's inbox, newest activity first and chats without
+        # messages last. PostgreSQL sorts nulls first in a descending index
+        # unless told otherwise, while SQLite sorts them last and cannot be told.
+        Index(
+            "ix_chat_members_user_id_last_message_at",
+            "user_id", db.text("last_message_at DESC NULLS LAST"), db.text("chat_id DESC")
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_chat_members_user_id_last_message_at",
+            "user_id", db.text("last_message_at DESC"), db.text("chat_id DESC")
+        ).ddl_if(dialect="sqlite"),
+    )
+
+    chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # Copy of chats.last_message_at, kept up to date by Chat.record_messages,
+    # so the inbox is one index range scan instead of a join and sort
+    last_message_at: Mapped[Optional[datetime]]
+
+    # Relationship attributes
+    chat: Mapped["Chat"] = relationship("Chat", back_populates="members")
@@ -0,0 +1,84 @@
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from ..db import db, dialect_insert
+from typing import Optional
+from sqlalchemy import ForeignKey
+
+class ChatParticipant(db.Model):
+    """Per-user read state for a chat, stored as a cursor into the chat's messages"""
+    __tablename__ = "chat_participants"
+
+    chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # Every message in the chat with an id up to this one has been read by the user
+    last_read_message_id: Mapped[Optional[int]]
+
+    # Relationship attributes
+    chat: Mapped["Chat"] = relationship("Chat", back_populates="participants")
+
+    @classmethod
+    def mark_read(cls, chat_id, user_id):
+        """
+        Move the user's read cursor to the newest message in the chat.
+        This is a single-row upsert and the cursor never moves backwards.
+        """
+        # Import Message here to avoid circular import
+        from .message import Message
+        latest_message_id = (
+            db.select(db.func.max(Message.id))
+            .where(Message.chat_id == chat_id)
+            .scalar_subquery()
+        )
+        statement = dialect_insert(cls).values(
+            chat_id=chat_id,
+            user_id=user_id,
+            last_read_message_id=latest_message_id
+        )
+        new_cursor = db.func.coalesce(statement.excluded.last_read_message_id, 0)
+        current_cursor = db.func.coalesce(cls.last_read_message_id, 0)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.chat_id, cls.user_id],
+            set_={
+                "last_read_message_id": db.case(
+                    (new_cursor > current_cursor, statement.excluded.last_read_message_id),
+                    else_=cls.last_read_message_id
+                )
+            }
+        )
+        db.session.execute(statement)
+
+    @classmethod
+    def read_cursors(cls, chat_id):
+        """Return {user_id: last_read_message_id} for everyone with read state in the chat"""
+        query = db.select(cls.user_id, cls.last_read_message_id).where(cls.chat_id == chat_id)
+        return {user_id: cursor for user_id, cursor in db.session.execute(query)}
+
+    @classmethod
+    def read_cursors_for_chats(cls, chat_ids):
+        """Return {chat_id: {user_id: last_read_message_id}} for several chats in one query"""
+        cursors = {chat_id: {} for chat_id in chat_ids}
+        if chat_ids:
+            query = db.select(cls.chat_id, cls.user_id, cls.last_read_message_id).where(cls.chat_id.in_(chat_ids))
+            for chat_id, user_id, cursor in db.session.execute(query):
+                cursors[chat_id][user_id] = cursor
+        return cursors
+
+    @classmethod
+    def unread_counts(cls, user_id, chat_ids):
+        """
+        Count the messages past the user's read cursor in each chat.
+        Returns {chat_id: unread_count}; chats without unread messages are omitted.
+        """
+        from .message import Message
+        if not chat_ids:
+            return {}
+        query = (
+            db.select(Message.chat_id, db.func.count(Message.id))
+            .outerjoin(cls, (cls.chat_id == Message.chat_id) & (cls.user_id == user_id))
+            .where(
+                Message.chat_id.in_(chat_ids),
+                Message.sender_id != user_id,
+                Message.id > db.func.coalesce(cls.last_read_message_id, 0)
+            )
+            .group_by(Message.chat_id)
+        )
+        return {chat_id: count for chat_id, count in db.session.execute(query)}
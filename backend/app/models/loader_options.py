@@ -0,0 +1,41 @@
+from sqlalchemy.orm import joinedload, load_only, raiseload
+from .chat import Chat
+from .message import Message
+from .rating import Rating
+from .user import User
+
+# Loader options for queries whose results are serialized with to_dict.
+# Everything to_dict reads is loaded with the base query, and raiseload
+# turns any other relationship access into an error instead of a lazy
+# load per row, so serialization never issues queries.
+
+def message_list_options():
+    """Load each message's sender with the message rows"""
+    return (
+        joinedload(Message.sender),
+        raiseload("*"),
+    )
+
+def chat_list_options():
+    """Load both participants and the latest message of each chat with the chat rows"""
+    return (
+        joinedload(Chat.user1),
+        joinedload(Chat.user2),
+        joinedload(Chat.last_message),
+        raiseload("*"),
+    )
+
+def rating_list_options():
+    """Load each rating's rater with the rating rows"""
+    return (
+        joinedload(Rating.rater),
+        raiseload("*"),
+    )
+
+def user_card_options():
+    """Load only the columns to_card reads, leaving out the rest of the profile"""
+    return (
+        load_only(User.id, User.name, User.pronouns, User.location, User.image_url,
+                  User.skills_to_offer, User.skills_to_learn),
+        raiseload("*"),
+    )
@@ -1,11 +1,58 @@
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from ..db import db
-from sqlalchemy import ForeignKey
+from .sync_version import VERSION_TYPE, next_version
+from sqlalchemy import DDL, ForeignKey, Index, event
+from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
+# Text search configuration for the PostgreSQL full-text index. "simple" does
+# no stemming or stop words, so any language and tokens like URLs match as typed.
+SEARCH_CONFIG = "simple"
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp, treating naive values as UTC"""
+    if value is None or value == "":
+        return datetime.now(timezone.utc)
+    if isinstance(value, datetime):
+        timestamp = value
+    else:
+        timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
+def message_is_read(message_id, sender_id, read_cursors):
+    """
+    Check whether any participant other than the sender has read past a message.
+
+    Args:
+        message_id: The ID of the message
+        sender_id: The ID of the user who sent the message
+        read_cursors: Dict of {user_id: last_read_message_id} for the chat
+    """
+    return any(
+        cursor is not None and cursor >= message_id
+        for user_id, cursor in read_cursors.items()
+        if user_id != sender_id
+    )
+
 
 class Message(db.Model):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves the unread count, a range scan past each participant's read cursor
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+        # Serves listing a chat's messages in timestamp order
+        Index("ix_messages_chat_id_timestamp", "chat_id", "timestamp"),
+        # Full-text search on PostgreSQL; SQLite uses the messages_fts table below
+        Index(
+            "ix_messages_content_fts",
+            db.text(f"to_tsvector('{SEARCH_CONFIG}', content)"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     # Foreign keys column
@@ -14,8 +61,11 @@ class Message(db.Model):
 
     content: Mapped[str] = mapped_column(nullable=False)
     timestamp: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
-    # Boolean column for read status, use to show unread message counts in frontend
-    is_read: Mapped[bool] = mapped_column(default=False, nullable=False)
+    # Change version for client sync. Message ids are not usable for that,
+    # because they are handed out before commit and commit out of order.
+    version: Mapped[int] = mapped_column(
+        VERSION_TYPE, nullable=False, default=next_version(), server_default="0", index=True
+    )
 
     # Relationship attributes
     chat: Mapped["Chat"] = relationship("Chat", back_populates="messages")
@@ -23,13 +73,37 @@ class Message(db.Model):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.is_read is None:
-            self.is_read = False
         if self.timestamp is None:
             self.timestamp = datetime.now(timezone.utc)
 
-    def to_dict(self):
-        """Convert message to dictionary with sender name"""
+    @validates("timestamp")
+    def validate_timestamp(self, key, value):
+        """
+        Store timestamps as aware datetimes however they are assigned, so the
+        after_flush hook and to_dict never see a client's string. Raises
+        ValueError for a malformed one.
+        """
+        return parse_timestamp(value)
+
+    @property
+    def is_read(self):
+        """Read status derived from the chat participants' read cursors"""
+        if self.id is None or self.chat is None:
+            return False
+        return self.is_read_by(
+            {participant.user_id: participant.last_read_message_id for participant in self.chat.participants}
+        )
+
+    def is_read_by(self, read_cursors):
+        """Check this message against the chat's {user_id: last_read_message_id} cursors"""
+        return message_is_read(self.id, self.sender_id, read_cursors)
+
+    def to_dict(self, read_cursors=None):
+        """
+        Convert message to dictionary with sender name.
+        Pass the chat's read_cursors when serializing many messages to avoid reloading them.
+        """
+        is_read = self.is_read if read_cursors is None else self.is_read_by(read_cursors)
         return {
             "id": self.id,
             "chat_id": self.chat_id,
@@ -37,7 +111,7 @@ class Message(db.Model):
             "sender_name": self.sender.name,
             "content": self.content,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
-            "is_read": self.is_read
+            "is_read": is_read
         }
 
     @classmethod
@@ -47,6 +121,33 @@ class Message(db.Model):
         msg.chat_id = data["chat_id"]
         msg.sender_id = data["sender_id"]
         msg.content = data["content"]
-        msg.timestamp = data.get("timestamp", datetime.now(timezone.utc))
-        msg.is_read = data.get("is_read") if "is_read" in data else False
+        # Parsed by validate_timestamp
+        msg.timestamp = data.get("timestamp")
         return msg
+
+# On SQLite, full-text search uses an FTS5 table over messages.content kept in sync by triggers
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='id')",
+    """CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+for statement in SQLITE_FTS_DDL:
+    event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Message.__table__, "before_drop", DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite"))
+
+@event.listens_for(Session, "after_flush")
+def record_new_messages(session, flush_context):
+    """Update the denormalized latest message and count of chats that got new messages"""
+    new_messages = [(obj.chat_id, obj.timestamp) for obj in session.new if isinstance(obj, Message)]
+    if new_messages:
+        # Import Chat here to avoid circular import
+        from .chat import Chat
+        Chat.record_messages(session.connection(), new_messages)
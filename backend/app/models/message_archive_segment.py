@@ -0,0 +1,61 @@
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from ..db import db
+from sqlalchemy import ForeignKey, Index, LargeBinary
+from datetime import datetime
+import json
+import zlib
+
+
+class MessageArchiveSegment(db.Model):
+    """A compressed run of consecutive archived messages from one chat"""
+    __tablename__ = "message_archive_segments"
+    __table_args__ = (
+        # Serves paging backwards through a chat's archive
+        Index("ix_message_archive_segments_chat_id_last_message_id", "chat_id", "last_message_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False)
+    # Message ids are kept, so read cursors stay valid after archiving
+    first_message_id: Mapped[int] = mapped_column(nullable=False)
+    last_message_id: Mapped[int] = mapped_column(nullable=False)
+    first_timestamp: Mapped[datetime] = mapped_column(nullable=False)
+    last_timestamp: Mapped[datetime] = mapped_column(nullable=False)
+    message_count: Mapped[int] = mapped_column(nullable=False)
+    # zlib-compressed JSON array of [id, sender_id, content, timestamp] rows
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    # Relationship attributes
+    chat: Mapped["Chat"] = relationship("Chat", back_populates="archive_segments")
+
+    @classmethod
+    def from_messages(cls, chat_id, messages):
+        """Pack messages, ordered by id, into a new segment"""
+        rows = [
+            [message.id, message.sender_id, message.content,
+             message.timestamp.isoformat() if message.timestamp else None]
+            for message in messages
+        ]
+        segment = cls()
+        segment.chat_id = chat_id
+        segment.first_message_id = messages[0].id
+        segment.last_message_id = messages[-1].id
+        segment.first_timestamp = messages[0].timestamp
+        segment.last_timestamp = messages[-1].timestamp
+        segment.message_count = len(messages)
+        segment.payload = zlib.compress(json.dumps(rows).encode("utf-8"))
+        return segment
+
+    def unpack(self):
+        """Return the archived messages as dicts, ordered by id"""
+        rows = json.loads(zlib.decompress(self.payload).decode("utf-8"))
+        return [
+            {
+                "id": message_id,
+                "chat_id": self.chat_id,
+                "sender_id": sender_id,
+                "content": content,
+                "timestamp": timestamp,
+            }
+            for message_id, sender_id, content, timestamp in rows
+        ]
@@ -1,22 +1,32 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from ..db import db
+from .rating_summary import RatingSummary
 from typing import Optional
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index, UniqueConstraint, event, inspect
+from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
 class Rating(db.Model):
     __tablename__ = "ratings"
+    __table_args__ = (
+        # One rating per rater and chat, which the rating upsert conflicts on
+        UniqueConstraint("chat_id", "rater_id", name="uq_ratings_chat_id_rater_id"),
+        # Serves a user's received ratings, newest first, paged by id
+        Index("ix_ratings_rated_id_id", "rated_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     rater_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    # The user who is being rated
-    rated_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # The user who is being rated. Columns the rating summary is derived from
+    # load their old value before a change (active_history), so the summary
+    # can take the old rating out
+    rated_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, active_history=True)
     # The chat this rating is associated with
     chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False)
     
-    rating: Mapped[int] = mapped_column(nullable=False) 
+    rating: Mapped[int] = mapped_column(nullable=False, active_history=True)
     comment: Mapped[Optional[str]]
-    timestamp: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc))
+    timestamp: Mapped[datetime] = mapped_column(default=lambda: datetime.now(timezone.utc), active_history=True)
 
     # Relationship attributes
     rater: Mapped["User"] = relationship("User", foreign_keys=[rater_id], back_populates="ratings_given")
@@ -28,14 +38,20 @@ class Rating(db.Model):
         if self.timestamp is None:
             self.timestamp = datetime.now(timezone.utc)
 
-    def to_dict(self):
-        """Convert rating to dictionary with rater name"""
+    def to_dict(self, rater_name=None):
+        """
+        Convert rating to dictionary with rater name.
+
+        Args:
+            rater_name: The rater's name when it was loaded with the rating,
+                otherwise it is read from the rater relationship
+        """
         return {
             "id": self.id,
             "rater_id": self.rater_id,
             "rated_id": self.rated_id,
             "chat_id": self.chat_id,
-            "rater_name": self.rater.name,
+            "rater_name": rater_name if rater_name is not None else self.rater.name,
             "rating": self.rating,
             "comment": self.comment,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
@@ -51,4 +67,28 @@ class Rating(db.Model):
         rating.rating = data["rating"]
         rating.comment = data.get("comment")
         rating.timestamp = data.get("timestamp") or datetime.now(timezone.utc)
-        return rating
\ No newline at end of file
+        return rating
+
+@event.listens_for(Session, "after_flush")
+def record_rating_changes(session, flush_context):
+    """Update the rated users' summaries for ratings added, changed or removed in the flush"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Rating):
+            changes.append((obj.rated_id, obj.rating, obj.timestamp, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Rating):
+            changes.append((obj.rated_id, obj.rating, obj.timestamp, -1))
+    for obj in session.dirty:
+        if isinstance(obj, Rating):
+            state = inspect(obj).attrs
+            if not any(state[name].history.has_changes() for name in ("rated_id", "rating", "timestamp")):
+                continue
+
+            def before(name):
+                history = state[name].history
+                return history.deleted[0] if history.deleted else getattr(obj, name)
+
+            changes.append((before("rated_id"), before("rating"), before("timestamp"), -1))
+            changes.append((obj.rated_id, obj.rating, obj.timestamp, 1))
+    RatingSummary.record(session.connection(), changes)
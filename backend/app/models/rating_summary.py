@@ -0,0 +1,153 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from ..db import db, dialect_insert
+from ..config import REPUTATION_HALF_LIFE_DAYS, REPUTATION_PRIOR_MEAN, REPUTATION_PRIOR_WEIGHT
+from sqlalchemy import ForeignKey, case
+from datetime import datetime, timezone
+import math
+
+RATING_VALUES = range(1, 6)
+
+def is_rating_value(value):
+    """Check for a whole number of stars. Booleans are ints in Python, and are not ratings."""
+    return type(value) is int and value in RATING_VALUES
+
+# Fixed point in time that reputation landmarks are counted from
+REPUTATION_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# Half-lives between landmarks. Stored weights stay below 2 ** this, and a
+# summary more than one landmark behind is decayed to nothing.
+REPUTATION_LANDMARK_HALF_LIVES = 32
+
+def reputation_half_lives(timestamp):
+    """Half-lives from the epoch to timestamp"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - REPUTATION_EPOCH).total_seconds() / (REPUTATION_HALF_LIFE_DAYS * 86400)
+
+def reputation_period(timestamp):
+    """Number of the last landmark at or before timestamp"""
+    return math.floor(reputation_half_lives(timestamp) / REPUTATION_LANDMARK_HALF_LIVES)
+
+def reputation_weight(timestamp, period=0):
+    """
+    Weight of a rating given at timestamp, relative to the period's landmark.
+
+    Weights double every half-life, so a rating counts half as much as one
+    given a half-life later. Decaying everything to the present is a single
+    multiplication at read time, and adding or removing a rating is a plain
+    addition to the stored sums.
+    """
+    return 2.0 ** (reputation_half_lives(timestamp) - period * REPUTATION_LANDMARK_HALF_LIVES)
+
+def rescale_factor(from_period, to_period):
+    """SQL factor moving weights from one landmark to a later one"""
+    return case(
+        (to_period == from_period, 1.0),
+        (to_period == from_period + 1, 2.0 ** -REPUTATION_LANDMARK_HALF_LIVES),
+        else_=0.0
+    )
+
+class RatingSummary(db.Model):
+    """
+    Per-user totals of received ratings, kept up to date as ratings are
+    written so the summary is read as one row instead of aggregating ratings.
+    """
+    __tablename__ = "rating_summaries"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    rating_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    rating_total: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Histogram of received ratings, one column per value
+    stars_1: Mapped[int] = mapped_column(default=0, server_default="0")
+    stars_2: Mapped[int] = mapped_column(default=0, server_default="0")
+    stars_3: Mapped[int] = mapped_column(default=0, server_default="0")
+    stars_4: Mapped[int] = mapped_column(default=0, server_default="0")
+    stars_5: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Sums of reputation_weight and reputation_weight * rating over the
+    # received ratings, from which the time-decayed reputation is derived
+    reputation_weight: Mapped[float] = mapped_column(default=0.0, server_default="0")
+    reputation_weighted_total: Mapped[float] = mapped_column(default=0.0, server_default="0")
+    # Landmark the reputation sums are relative to
+    reputation_period: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    @classmethod
+    def record(cls, connection, changes):
+        """
+        Apply rating changes to the rated users' summaries with one upsert.
+
+        Args:
+            connection: The connection the ratings were written on, so the
+                summaries change in the same transaction
+            changes: Iterable of (rated_id, rating, timestamp, sign) with sign 1
+                for an added rating and -1 for a removed one
+
+        Weights are relative to the current landmark. A summary still on an
+        earlier one is rescaled to it by the same upsert, and a concurrent
+        writer that computed its weights just before a landmark passed has
+        them rescaled instead.
+        """
+        period = reputation_period(datetime.now(timezone.utc))
+        deltas = {}
+        for rated_id, rating, timestamp, sign in changes:
+            delta = deltas.setdefault(rated_id, {
+                "user_id": rated_id, "rating_count": 0, "rating_total": 0,
+                **{f"stars_{value}": 0 for value in RATING_VALUES},
+                "reputation_weight": 0.0, "reputation_weighted_total": 0.0, "reputation_period": period
+            })
+            weight = reputation_weight(timestamp, period)
+            delta["rating_count"] += sign
+            delta["rating_total"] += sign * rating
+            delta[f"stars_{rating}"] += sign
+            delta["reputation_weight"] += sign * weight
+            delta["reputation_weighted_total"] += sign * weight * rating
+        if not deltas:
+            return
+
+        statement = dialect_insert(cls).values(list(deltas.values()))
+        counters = ["rating_count", "rating_total"] + [f"stars_{value}" for value in RATING_VALUES]
+        set_ = {name: getattr(cls, name) + getattr(statement.excluded, name) for name in counters}
+        stored, added = cls.reputation_period, statement.excluded.reputation_period
+        latest = case((added > stored, added), else_=stored)
+        for name in ("reputation_weight", "reputation_weighted_total"):
+            set_[name] = (getattr(cls, name) * rescale_factor(stored, latest)
+                          + getattr(statement.excluded, name) * rescale_factor(added, latest))
+        set_["reputation_period"] = latest
+        statement = statement.on_conflict_do_update(index_elements=[cls.user_id], set_=set_)
+        connection.execute(statement)
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Return the user's rating summary as a dictionary, empty if they have no ratings"""
+        summary = db.session.get(cls, user_id)
+        if summary is None:
+            summary = cls(user_id=user_id, rating_count=0, rating_total=0,
+                          reputation_weight=0.0, reputation_weighted_total=0.0, reputation_period=0,
+                          **{f"stars_{value}": 0 for value in RATING_VALUES})
+        return summary.to_dict()
+
+    @property
+    def average(self):
+        """Plain mean of the received ratings, 0 without ratings"""
+        return self.rating_total / self.rating_count if self.rating_count else 0
+
+    def reputation(self, now=None):
+        """
+        Bayesian average of the received ratings with exponential time decay.
+
+        The ratings, decayed to now, are averaged together with
+        REPUTATION_PRIOR_WEIGHT ratings of REPUTATION_PRIOR_MEAN, so users with
+        few or only old ratings stay close to the prior.
+        """
+        decay = 1 / reputation_weight(now or datetime.now(timezone.utc), self.reputation_period or 0)
+        weight = (self.reputation_weight or 0.0) * decay
+        weighted_total = (self.reputation_weighted_total or 0.0) * decay
+        return (REPUTATION_PRIOR_WEIGHT * REPUTATION_PRIOR_MEAN + weighted_total) / (REPUTATION_PRIOR_WEIGHT + weight)
+
+    def to_dict(self):
+        """Convert the summary to a dictionary with the mean, histogram and reputation"""
+        return {
+            "user_id": self.user_id,
+            "count": self.rating_count,
+            "mean": round(self.rating_total / self.rating_count, 2) if self.rating_count else None,
+            "histogram": {str(value): getattr(self, f"stars_{value}") for value in RATING_VALUES},
+            "reputation": round(self.reputation(), 3),
+        }
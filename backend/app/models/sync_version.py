@@ -0,0 +1,62 @@
+from sqlalchemy import BigInteger, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from ..db import db
+
+# Change versions for client sync are shared by every versioned table, so a
+# single number says how far a client has synced. They must follow commit
+# order: a sync skips past every version below its watermark, so a version
+# that commits after a higher one was read would be lost.
+VERSIONED_TABLES = ("chats", "users", "messages")
+# Type of the version columns. Transaction ids outgrow 32 bits, while
+# SQLite's INTEGER is 64 bits already.
+VERSION_TYPE = BigInteger().with_variant(Integer(), "sqlite")
+
+def highest_version_sql():
+    """SQL for the highest version in use, read from the version indexes"""
+    highest = " UNION ALL ".join(f"SELECT max(version) AS version FROM {table}" for table in VERSIONED_TABLES)
+    return f"(SELECT coalesce(max(version), 0) FROM ({highest}))"
+
+class next_version(FunctionElement):
+    """
+    SQL expression for the next change version, used as the insert and
+    update default of version columns.
+    """
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(next_version, "postgresql")
+def compile_next_version_postgresql(element, compiler, **kw):
+    # The writing transaction's id. Ids are handed out before commit, like
+    # sequence values, but current_version only reports ids whose
+    # transaction has finished, so everything below it is final.
+    return "pg_current_xact_id()::text::bigint"
+
+@compiles(next_version)
+def compile_next_version(element, compiler, **kw):
+    # Without transaction ids, count up from the highest version in use. Safe
+    # on SQLite, where writes are serialized by the database lock.
+    return f"({highest_version_sql()} + 1)"
+
+class current_version_head(FunctionElement):
+    """SQL expression for the highest version whose transaction has finished"""
+    type = BigInteger()
+    inherit_cache = True
+
+@compiles(current_version_head, "postgresql")
+def compile_current_version_head_postgresql(element, compiler, **kw):
+    # Every transaction id below the snapshot's xmin has committed or rolled
+    # back, while later ones may still be in flight
+    return "pg_snapshot_xmin(pg_current_snapshot())::text::bigint - 1"
+
+@compiles(current_version_head)
+def compile_current_version_head(element, compiler, **kw):
+    return highest_version_sql()
+
+def current_version():
+    """
+    Return the version below which no change can still commit. Rows with a
+    higher version are left for a later sync, once their older neighbours
+    are final.
+    """
+    return db.session.scalar(db.select(current_version_head()))
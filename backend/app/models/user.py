@@ -1,15 +1,38 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from ..db import db
+from .sync_version import VERSION_TYPE, next_version
+from ..config import REPUTATION_PRIOR_MEAN
 from typing import Optional, List
+from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import DDL, Index, event
 from sqlalchemy.dialects.postgresql import ARRAY
 
+def normalize_email(email):
+    """The form emails are compared in, matching the lower(email) index"""
+    return email.strip().lower()
+
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # Emails are unique regardless of case, and looked up through this index
+        Index("ix_users_lower_email", db.text("lower(email)"), unique=True),
+        # Directory search on PostgreSQL: trigram indexes serve substring
+        # matches on name and location, pattern indexes serve short prefixes,
+        # and GIN indexes on the skill arrays serve containment
+        Index("ix_users_name_trgm", "name", postgresql_using="gin",
+              postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_lower_name_prefix", db.text("lower(name) text_pattern_ops")).ddl_if(dialect="postgresql"),
+        Index("ix_users_location_trgm", "location", postgresql_using="gin",
+              postgresql_ops={"location": "gin_trgm_ops"}).ddl_if(dialect="postgresql"),
+        Index("ix_users_lower_location_prefix", db.text("lower(location) text_pattern_ops")).ddl_if(dialect="postgresql"),
+        Index("ix_users_skills_to_offer", "skills_to_offer", postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index("ix_users_skills_to_learn", "skills_to_learn", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(nullable=False)
-    email: Mapped[str] = mapped_column(unique=True, nullable=False)
+    email: Mapped[str] = mapped_column(nullable=False)
     password_hash: Mapped[str] = mapped_column(nullable=False)
     pronouns: Mapped[Optional[str]]
     bio: Mapped[Optional[str]]
@@ -19,16 +42,38 @@ class User(db.Model):
     skills_to_offer: Mapped[Optional[List[str]]] = mapped_column(ARRAY(db.String(50)))
     skills_to_learn: Mapped[Optional[List[str]]] = mapped_column(ARRAY(db.String(50)))
     image_url: Mapped[Optional[str]]
+    # Last activity, written in batches by the presence service
+    last_seen_at: Mapped[Optional[datetime]]
+    # Change version for client sync, bumped on every profile update
+    version: Mapped[int] = mapped_column(
+        VERSION_TYPE, nullable=False, default=next_version(), onupdate=next_version(), server_default="0", index=True
+    )
 
     # Relationships to the Rating model
     ratings_given: Mapped[list["Rating"]] = relationship("Rating", foreign_keys="[Rating.rater_id]", back_populates="rater")
     ratings_received: Mapped[list["Rating"]] = relationship("Rating", foreign_keys="[Rating.rated_id]", back_populates="rated")
+    # Totals of the received ratings, maintained as ratings are written
+    rating_summary: Mapped[Optional["RatingSummary"]] = relationship("RatingSummary", viewonly=True)
+
+    @classmethod
+    def by_email(cls, email):
+        """Find the user with this email, ignoring case, or return None"""
+        return db.session.scalars(
+            db.select(cls).where(db.func.lower(cls.email) == normalize_email(email))
+        ).one_or_none()
 
     @property
     def average_rating(self):
-        if not self.ratings_received:
+        if self.rating_summary is None:
             return 0
-        return sum(r.rating for r in self.ratings_received) / len(self.ratings_received)
+        return self.rating_summary.average
+
+    @property
+    def reputation(self):
+        """Time-decayed Bayesian average of the received ratings, decayed to now on read"""
+        if self.rating_summary is None:
+            return REPUTATION_PRIOR_MEAN
+        return self.rating_summary.reputation()
 
     def set_password(self, password: str):
         # Hash the password before storing it in the database
@@ -52,6 +97,7 @@ class User(db.Model):
             "skills_to_offer": self.skills_to_offer,
             "skills_to_learn": self.skills_to_learn,
             "average_rating": self.average_rating,
+            "reputation": round(self.reputation, 3),
             "image_url": self.image_url,
         }
         return result
@@ -61,7 +107,7 @@ class User(db.Model):
         """Create user from dictionary data"""
         user = cls()
         user.name = data["name"]
-        user.email = data["email"]
+        user.email = data["email"].strip()
         user.pronouns = data.get("pronouns")
         user.bio = data.get("bio")
         user.location = data.get("location")
@@ -72,4 +118,23 @@ class User(db.Model):
         user.image_url = data.get("image_url")
         if "password" in data:
             user.set_password(data["password"])
+        elif "password_hash" in data:
+            # Already hashed by the caller, e.g. in the password hashing pool
+            user.password_hash = data["password_hash"]
         return user
+
+    def to_card(self):
+        """Convert user to the compact dictionary listed in search results"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "pronouns": self.pronouns,
+            "location": self.location,
+            "image_url": self.image_url,
+            "skills_to_offer": self.skills_to_offer,
+            "skills_to_learn": self.skills_to_learn,
+        }
+
+# The trigram operator classes come from the pg_trgm extension
+event.listen(User.__table__, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
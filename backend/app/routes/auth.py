@@ -1,11 +1,36 @@
-from flask import Blueprint, request, Response
+from flask import Blueprint, request, Response, current_app
 from ..models.user import User
 from ..db import db
+from ..services.password_hasher import password_hasher, HashingBusy
+from ..services.auth import auth, issue_token, Principal
 from .route_utilities import create_model
+from sqlalchemy.exc import IntegrityError
 import json
 
 auth_bp = Blueprint("auth_bp", __name__, url_prefix="/auth")
 
+def busy_response():
+    """503 for when the password hashing pool is saturated"""
+    return Response(
+        json.dumps({"error": "Too many sign-ins right now, please retry"}),
+        status=503,
+        headers={"Retry-After": "1"},
+        mimetype="application/json"
+    )
+
+def rehash_password(user, password):
+    """
+    Store a new hash of the password made with the current hash settings.
+    A new password hash is not a profile change, so the sync version is kept.
+    """
+    users = User.__table__
+    db.session.execute(
+        db.update(users)
+        .where(users.c.id == user.id)
+        .values(password_hash=password_hasher.hash(password), version=users.c.version)
+    )
+    db.session.commit()
+
 @auth_bp.post("/signup")
 def signup():
     data = request.get_json()
@@ -15,21 +40,36 @@ def signup():
             status=400,
             mimetype="application/json"
         )
+    if not isinstance(data["email"], str):
+        return Response(
+            json.dumps({"error": "email must be a string"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    # Hash the password in the hashing pool, off the request thread
+    try:
+        password_hash = password_hasher.hash(data["password"])
+    except HashingBusy:
+        return busy_response()
+    user_data = {key: value for key, value in data.items() if key != "password"}
+    user_data["password_hash"] = password_hash
 
-    # Check if the email is already registered
-    if User.query.filter_by(email=data["email"]).first():
+    # Create the user with a single INSERT. The unique index on lower(email)
+    # rejects emails already registered in any case, even by a concurrent signup
+    try:
+        response_data, status_code = create_model(
+            User,
+            user_data,
+            additional_fields={"message": "User created successfully"}
+        )
+    except IntegrityError:
+        db.session.rollback()
         return Response(
             json.dumps({"error": "Email already registered"}),
             status=400,
             mimetype="application/json"
         )
-
-    # Create the user
-    response_data, status_code = create_model(
-        User, 
-        data, 
-        additional_fields={"message": "User created successfully"}
-    )
     return Response(
         json.dumps(response_data),
         status=status_code,
@@ -45,14 +85,37 @@ def login():
             status=400,
             mimetype="application/json"
         )
+    if not isinstance(data["email"], str):
+        return Response(
+            json.dumps({"error": "email must be a string"}),
+            status=400,
+            mimetype="application/json"
+        )
 
-    # Check if the email is registered
-    user = User.query.filter_by(email=data["email"]).first()
+    # Check if the email is registered, ignoring case
+    user = User.by_email(data["email"])
     # Check if the password is correct
-    if user and user.check_password(data["password"]):
-        # Return the user id and name
+    try:
+        valid = user is not None and password_hasher.verify(user.password_hash, data["password"])
+    except HashingBusy:
+        return busy_response()
+    if valid and password_hasher.needs_rehash(user.password_hash):
+        # Upgrading the hash is best effort, the next login tries again
+        try:
+            rehash_password(user, data["password"])
+        except HashingBusy:
+            pass
+    if valid:
+        # Return the user id and name, with a token for the Authorization header
+        auth.principals.put(Principal(user.id, user.name))
         return Response(
-            json.dumps({"message": "Login successful", "user_id": user.id, "name": user.name}),
+            json.dumps({
+                "message": "Login successful",
+                "user_id": user.id,
+                "name": user.name,
+                "token": issue_token(user.id),
+                "expires_in": current_app.config["AUTH_TOKEN_MAX_AGE_SECONDS"]
+            }),
             status=200,
             mimetype="application/json"
         )
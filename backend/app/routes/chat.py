@@ -1,10 +1,22 @@
-from flask import Blueprint, request, Response
-import sqlalchemy as sa
+from flask import Blueprint, request, Response, current_app, stream_with_context
+from datetime import datetime, timezone
 from ..models.chat import Chat
-from ..models.message import Message
+from ..models.chat_member import ChatMember
+from ..models.chat_participant import ChatParticipant
+from ..models.message import Message, parse_timestamp
 from ..models.user import User
-from ..models.rating import Rating
-from .route_utilities import validate_model, create_model
+from ..models.loader_options import message_list_options
+from .route_utilities import validate_model, create_model, authorize_user, authorize_member, authorize_chat_reader, authorize_chat_member, validate_user
+from ..services.message_import import import_messages
+from ..services.auth import auth
+from ..services.message_archive import load_archived_messages, serialize_archived_messages
+from ..services.message_search import search_messages
+from ..services.chat_purge import chat_purge
+from ..services.presence import presence
+from ..services.inbox import user_chats_query, serialize_inbox
+from ..services.message_writer import message_writer
+from ..services.message_export import EXPORT_FORMATS, iter_chat_messages
+from ..config import MESSAGE_PAGE_SIZE_MAX
 from ..db import db
 import json
 
@@ -13,39 +25,66 @@ chat_bp = Blueprint("chat_bp", __name__, url_prefix="/chats")
 @chat_bp.get("/<user_id>")
 def get_user_chats(user_id):
     """
-    Get all chats this user, including the unread message count
-    and a flag indicating if the current user has already rated the chat.
+    Get all chats this user, most recently active first, including a preview
+    of the last message, the unread message count, a flag indicating if the
+    current user has already rated the chat and the presence of both participants.
     """
-    user = validate_model(User, user_id)
-    # Get all chats for the user
-    query = db.select(Chat).where((Chat.user1_id == user.id) | (Chat.user2_id == user.id))
-    chats = db.session.scalars(query).all()
-
-    # Create a list to store the chat data
-    chat_list = []
-    for chat in chats:
-        # Use to_dict method to get chat data
-        chat_data = chat.to_dict(current_user_id=user.id)
-        
-        # Calculate unread messages for this user in this chat
-        unread_count_query = db.select(db.func.count(Message.id)).where(
-            Message.chat_id == chat.id,
-            Message.sender_id != user.id,
-            Message.is_read == False
-        )
-        unread_count = db.session.scalar(unread_count_query)
-        
-        # Add the unread count to the chat data
-        chat_data["unread_count"] = unread_count
-        
-        chat_list.append(chat_data)
-        
+    user = validate_user(user_id)
+    presence.touch(user.id)
+    chats = db.session.scalars(user_chats_query(user.id)).unique().all()
+    chat_list = serialize_inbox(user.id, chats)
     return Response(
         json.dumps({"chats": chat_list}),
         status=200,
         mimetype="application/json"
     )
 
+@chat_bp.get("/<user_id>/search")
+def search_user_messages(user_id):
+    """
+    Full-text search the messages in this user's chats, newest first.
+    Use ?limit=N and the returned next_before as ?before= to page through results.
+    """
+    user = validate_user(user_id)
+    text = request.args.get("q", "").strip()
+    # Check if search terms are provided
+    if not text:
+        return Response(
+            json.dumps({"error": "q is required"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    # Validate the pagination parameters
+    try:
+        limit = int(request.args.get("limit", 20))
+        before = request.args.get("before")
+        before = int(before) if before is not None else None
+    except ValueError:
+        return Response(
+            json.dumps({"error": "limit and before must be integers"}),
+            status=400,
+            mimetype="application/json"
+        )
+    if limit < 1 or limit > MESSAGE_PAGE_SIZE_MAX:
+        return Response(
+            json.dumps({"error": f"limit must be between 1 and {MESSAGE_PAGE_SIZE_MAX}"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    messages, next_before = search_messages(user.id, text, before=before, limit=limit)
+    # Load the read cursors of every chat in the results in one query
+    read_cursors = ChatParticipant.read_cursors_for_chats({msg.chat_id for msg in messages})
+    return Response(
+        json.dumps({
+            "messages": [msg.to_dict(read_cursors[msg.chat_id]) for msg in messages],
+            "next_before": next_before
+        }),
+        status=200,
+        mimetype="application/json"
+    )
+
 @chat_bp.put("/<chat_id>/messages/read")
 def mark_messages_as_read(chat_id):
     """
@@ -63,7 +102,7 @@ def mark_messages_as_read(chat_id):
     
     # Validate that chat exists
     chat = db.session.get(Chat, chat_id_int)
-    if not chat:
+    if not chat or chat.deleted_at is not None:
         return Response(
             json.dumps({"error": f"Chat {chat_id} not found"}),
             status=404,
@@ -80,17 +119,14 @@ def mark_messages_as_read(chat_id):
             mimetype="application/json"
         )
 
-    # Find all unread messages in this chat that were not sent by the current user and mark them as read
-    statement = (
-        sa.update(Message)
-        .where(
-            Message.chat_id == chat_id_int,
-            Message.sender_id != user_id,
-            Message.is_read == False
-        )
-        .values(is_read=True)
-    )
-    db.session.execute(statement)
+    # Validate that the user exists, that the request may act as them and that they are in the chat
+    user_id = validate_user(user_id).id
+    authorize_member(chat_id_int, user_id)
+
+    # Move the user's read cursor past every message currently in the chat
+    ChatParticipant.mark_read(chat_id_int, user_id)
+    # Unread counts changed, so clients should sync the chat again
+    Chat.touch(chat_id_int)
     db.session.commit()
     
     return Response(
@@ -112,51 +148,145 @@ def create_chat():
             mimetype="application/json"
         )
     
-    # Validate that both users exist
-    user1 = db.session.get(User, user1_id)
-    user2 = db.session.get(User, user2_id)
-    if not user1 or not user2:
+    try:
+        user1_id, user2_id = int(user1_id), int(user2_id)
+    except (TypeError, ValueError):
+        return Response(
+            json.dumps({"error": "user1_id and user2_id must be integers"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    authorize_user(user1_id)
+
+    # Validate that both users exist, in one query that also puts them in the
+    # session so serializing the chat does not load them again
+    found_users = db.session.scalars(
+        db.select(User).where(User.id.in_([user1_id, user2_id]))
+    ).all()
+    if len(found_users) != len({user1_id, user2_id}):
         return Response(
             json.dumps({"error": "One or both users not found"}),
             status=404,
             mimetype="application/json"
         )
-    
-    # Check if chat already exists
-    existing_chat = db.session.scalar(
-        db.select(Chat).where(
-            ((Chat.user1_id == user1_id) & (Chat.user2_id == user2_id)) |
-            ((Chat.user1_id == user2_id) & (Chat.user2_id == user1_id))
-        )
+
+    # Return the existing chat for this pair of users, or create it
+    chat, created = Chat.get_or_create(user1_id, user2_id)
+    # Pass the current user ID to to_dict, a new chat cannot have been rated yet
+    chat_data = chat.to_dict(current_user_id=user1_id, is_rated=False if created else None)
+    db.session.commit()
+    return Response(
+        json.dumps(chat_data),
+        status=201 if created else 200,
+        mimetype="application/json"
     )
-    if existing_chat:
-        # Pass the current user ID to to_dict
+
+@chat_bp.get("/<chat_id>/messages")
+def get_chat_messages(chat_id):
+    """
+    Get the messages of a chat. With ?limit=N, return the newest N messages
+    before the ?before=<message_id> cursor and a next_before cursor for the
+    following page. Pages continue into the message archive once they go past
+    the oldest message in the hot table. Pass the reading participant as
+    ?user_id= to record their presence.
+    """
+    chat = validate_model(Chat, chat_id)
+    authorize_chat_reader(chat.id)
+    reader_id = request.args.get("user_id", "")
+    if reader_id.isdigit() and db.session.get(ChatMember, (chat.id, int(reader_id))):
+        presence.touch(int(reader_id))
+    # Load the read cursors once so is_read is derived without a query per message
+    read_cursors = ChatParticipant.read_cursors(chat.id)
+
+    limit = request.args.get("limit")
+    if limit is None:
+        # Archived history comes first, its ids are all older than the hot messages
+        archived = serialize_archived_messages(load_archived_messages(chat.id), read_cursors)
+        # Get all hot messages for the specific chat, ordered by timestamp
+        query = (
+            db.select(Message)
+            .where(Message.chat_id == chat.id)
+            .order_by(Message.timestamp)
+            .options(*message_list_options())
+        )
+        messages = db.session.scalars(query)
         return Response(
-            json.dumps(existing_chat.to_dict(current_user_id=user1_id)),
+            json.dumps({"messages": archived + [msg.to_dict(read_cursors) for msg in messages]}), #Convert the messages to a list of dictionaries
             status=200,
             mimetype="application/json"
         )
 
-    # Create new chat if it doesn't exist
-    response_data, status_code = create_model(Chat, data)
-    # Add the current_user_id for the to_dict method
-    chat = Chat.query.get(response_data["id"])
+    # Validate the pagination parameters
+    try:
+        limit = int(limit)
+        before = request.args.get("before")
+        before = int(before) if before is not None else None
+    except ValueError:
+        return Response(
+            json.dumps({"error": "limit and before must be integers"}),
+            status=400,
+            mimetype="application/json"
+        )
+    if limit < 1 or limit > MESSAGE_PAGE_SIZE_MAX:
+        return Response(
+            json.dumps({"error": f"limit must be between 1 and {MESSAGE_PAGE_SIZE_MAX}"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    # Newest hot messages before the cursor
+    query = (
+        db.select(Message)
+        .where(Message.chat_id == chat.id)
+        .order_by(Message.id.desc())
+        .limit(limit)
+        .options(*message_list_options())
+    )
+    if before is not None:
+        query = query.where(Message.id < before)
+    messages = [msg.to_dict(read_cursors) for msg in reversed(db.session.scalars(query).all())]
+
+    # Fill the rest of the page from the archive when the hot table runs out
+    if len(messages) < limit:
+        archive_before = messages[0]["id"] if messages else before
+        archived = load_archived_messages(chat.id, before=archive_before, limit=limit - len(messages))
+        messages = serialize_archived_messages(archived, read_cursors) + messages
+
     return Response(
-        json.dumps(chat.to_dict(current_user_id=user1_id)),
-        status=status_code,
+        json.dumps({
+            "messages": messages,
+            "next_before": messages[0]["id"] if len(messages) == limit else None
+        }),
+        status=200,
         mimetype="application/json"
     )
 
-@chat_bp.get("/<chat_id>/messages")
-def get_chat_messages(chat_id):
+@chat_bp.get("/<chat_id>/export")
+def export_chat_messages(chat_id):
+    """
+    Stream the full transcript of a chat, archived messages included,
+    as JSON Lines (?format=jsonl, the default) or CSV (?format=csv).
+    """
     chat = validate_model(Chat, chat_id)
-    # Get all messages for the specific chat, ordered by timestamp
-    query = db.select(Message).where(Message.chat_id == chat.id).order_by(Message.timestamp)
-    messages = db.session.scalars(query)
+    authorize_chat_reader(chat.id)
+    export_format = request.args.get("format", "jsonl")
+    # Check if the format is supported
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            json.dumps({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    encode, mimetype = EXPORT_FORMATS[export_format]
+    read_cursors = ChatParticipant.read_cursors(chat.id)
+    # Keep the request context, and with it the session, open while the response streams
     return Response(
-        json.dumps({"messages": [msg.to_dict() for msg in messages]}), #Convert the messages to a list of dictionaries
+        stream_with_context(encode(iter_chat_messages(chat, read_cursors))),
         status=200,
-        mimetype="application/json"
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=chat-{chat.id}.{export_format}"}
     )
 
 @chat_bp.post("/<chat_id>/messages")
@@ -173,30 +303,110 @@ def send_message(chat_id):
             mimetype="application/json"
         )
     
+    # Parse the client's timestamp here, so a malformed one is a 400 on either write path
+    try:
+        data["timestamp"] = parse_timestamp(data.get("timestamp"))
+    except (TypeError, ValueError):
+        return Response(
+            json.dumps({"error": "timestamp must be an ISO 8601 date and time"}),
+            status=400,
+            mimetype="application/json"
+        )
+
     # Validate that sender exists
-    sender = db.session.get(User, sender_id)
+    sender = db.session.get(User, authorize_user(sender_id))
     if not sender:
         return Response(
             json.dumps({"error": "Sender not found"}),
             status=404,
             mimetype="application/json"
         )
+    authorize_member(chat.id, sender.id)
     
+    presence.touch(sender.id)
+
     # Add chat_id to the data
     data["chat_id"] = chat.id
     
-    response_data, status_code = create_model(Message, data)
+    if current_app.config["MESSAGE_GROUP_COMMIT"]:
+        # Commit together with other messages sent in the same few milliseconds
+        try:
+            response_data, status_code = message_writer.submit(data), 201
+        except TimeoutError:
+            # The batch may still commit, so the client has to check before sending again
+            response_data, status_code = {
+                "status": "indeterminate",
+                "message": "The message may or may not have been saved, sync the chat to find out"
+            }, 202
+    else:
+        # The sender is already in the session, and nobody has read a message that was just sent
+        response_data, status_code = create_model(Message, data, to_dict_args={"read_cursors": {}})
     return Response(
         json.dumps(response_data),
         status=status_code,
         mimetype="application/json"
     )
 
+@chat_bp.post("/messages/bulk")
+def bulk_import_messages():
+    """
+    Import many messages in one request, e.g. conversation history from another platform.
+    Records are validated per chunk with a single query and inserted in chunked transactions.
+
+    Disabled unless MESSAGE_BULK_IMPORT_ENABLED is set, and then only imports
+    messages sent by the token's user, into chats they are a member of.
+    """
+    if not current_app.config["MESSAGE_BULK_IMPORT_ENABLED"]:
+        return Response(
+            json.dumps({"error": "Bulk import is disabled, use flask messages import"}),
+            status=403,
+            mimetype="application/json"
+        )
+    user_id = auth.current_user_id()
+    if user_id is None:
+        return Response(
+            json.dumps({"error": "Bulk import requires a token"}),
+            status=403,
+            mimetype="application/json"
+        )
+
+    data = request.get_json()
+    messages = data.get("messages") if isinstance(data, dict) else None
+    # Check if the messages are provided as a list
+    if not isinstance(messages, list) or not messages:
+        return Response(
+            json.dumps({"error": "Expected a JSON object with messages as a non-empty list"}),
+            status=400,
+            mimetype="application/json"
+        )
+    # The import checks that each sender is in the chat, so this also limits it to the user's chats
+    if any(isinstance(record, dict) and str(record.get("sender_id")) != str(user_id) for record in messages):
+        return Response(
+            json.dumps({"error": "Only messages sent by the token's user can be imported"}),
+            status=403,
+            mimetype="application/json"
+        )
+
+    result = import_messages(messages)
+    # Nothing was created when every record was rejected
+    return Response(
+        json.dumps(result),
+        status=201 if result["inserted"] else 400,
+        mimetype="application/json"
+    )
+
 @chat_bp.delete("/<chat_id>")
 def delete_chat(chat_id):
+    """
+    Delete a chat. The chat is hidden immediately, and its messages and
+    ratings are purged in bounded batches by the background purge worker.
+    Only a member of the chat, signed in with a token, may delete it.
+    """
     chat = validate_model(Chat, chat_id)
-    db.session.delete(chat)
+    authorize_chat_member(chat.id)
+    chat.deleted_at = datetime.now(timezone.utc)
     db.session.commit()
+    chat_purge.notify()
     return Response(
         json.dumps({"message": "Chat deleted successfully"}),
         status=200,
@@ -1,7 +1,8 @@
 from flask import Blueprint, Response
 from werkzeug.exceptions import HTTPException
 from ..models.user import User
-from .route_utilities import validate_model
+from sqlalchemy.orm import selectinload
+from .route_utilities import validate_model, authorize_user
 from ..db import db
 import google.generativeai as genai
 import os
@@ -93,9 +94,10 @@ def find_ai_matches(user_skills_to_offer: list, user_skills_to_learn: list,
 @match_bp.get("/<user_id>")
 def get_matches(user_id):
     try:
-        user = validate_model(User, user_id)
+        user = validate_model(User, authorize_user(user_id))
         user_dict = user.to_dict()
-        query = db.select(User).where(User.id != user.id)  # Get all candidates except the input user
+        # Get all candidates except the input user, with their stored rating summaries
+        query = db.select(User).where(User.id != user.id).options(selectinload(User.rating_summary))
         candidates = db.session.scalars(query)
         matches = []
         
@@ -131,6 +133,8 @@ def get_matches(user_id):
                     candidate_dict["learn_matches"] = list(learn_match)
                     matches.append(candidate_dict)
         
+        # Rank matches by reputation, which is read from the stored summaries
+        matches.sort(key=lambda match: match["reputation"], reverse=True)
         response_data = {
             "matches": matches,
             "count": len(matches),
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, Response
 from ..models.user import User
-from .route_utilities import validate_model
+from .route_utilities import validate_model, authorize_user, parse_id
+from ..services.profile_cache import profile_cache
+from ..services.profile_events import diff_profile, apply_profile_changes, emit_profile_changes
 from ..db import db
 import json
 
@@ -8,28 +10,50 @@ profile_bp = Blueprint("profile_bp", __name__, url_prefix="/profile")
 
 @profile_bp.get("/<user_id>")
 def get_profile(user_id):
-    user = validate_model(User, user_id)
-    return Response(
-        json.dumps(user.to_dict()),
-        status=200,
-        mimetype="application/json"
-    )
+    """
+    Get a user's profile, served from the profile cache when it is there.
+    Send the returned ETag as If-None-Match to get 304 while it is unchanged.
+    """
+    cached = profile_cache.get(parse_id(User, user_id))
+    if cached.etag is None:
+        user = validate_model(User, user_id)
+        cached = profile_cache.put(user.id, json.dumps(user.to_dict()), cached)
+    response = Response(cached.body, status=200, mimetype="application/json")
+    response.set_etag(cached.etag)
+    # Clients may keep the profile, but must revalidate it before use
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @profile_bp.put("/<user_id>")
+@profile_bp.patch("/<user_id>")
 def update_profile(user_id):
-    user = validate_model(User, user_id)
+    """
+    Change the given profile fields, leaving the others as they are. Only
+    fields whose value differs are written, and subscribers to
+    profile_changed hear about them after the commit. A request that
+    changes nothing writes nothing.
+    """
+    user = validate_model(User, authorize_user(user_id))
     data = request.get_json()
-    # Update only allowed fields
-    for field in [
-        "name", "pronouns", "bio", "location", "availability",
-        "learning_style", "skills_to_offer", "skills_to_learn", "rating",
-        "image_url"
-    ]:
-        if field in data:
-            setattr(user, field, data[field])
-    db.session.commit()
+    if not isinstance(data, dict):
+        return Response(
+            json.dumps({"error": "Expected a JSON object of profile fields"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    fields = diff_profile(user, data)
+    if fields:
+        apply_profile_changes(user, fields)
+        # Serialize before the commit expires the user, so it is not loaded again
+        db.session.flush()
+        profile = user.to_dict()
+        db.session.commit()
+        emit_profile_changes(user.id, fields)
+    else:
+        profile = user.to_dict()
     return Response(
-        json.dumps(user.to_dict()),
+        json.dumps(profile),
         status=200,
         mimetype="application/json"
     )
@@ -1,16 +1,19 @@
 from flask import Blueprint, request, jsonify
 from ..models.rating import Rating
-from ..models.user import User
-from ..models.chat import Chat
-from .route_utilities import validate_model, create_model
+from ..models.rating_summary import RatingSummary, is_rating_value
+from ..models.loader_options import rating_list_options
+from ..services.rating_upsert import save_rating
+from .route_utilities import validate_user, authorize_user
 from ..db import db
+from ..config import RATING_PAGE_SIZE_MAX
 
 rating_bp = Blueprint("rating_bp", __name__, url_prefix="/ratings")
 
 @rating_bp.post("")
 def create_rating():
     """
-    Creates a new rating for a user within a specific chat.
+    Creates a rating for a user within a specific chat, or replaces the
+    rater's earlier rating for the chat.
     """
     data = request.get_json()
     
@@ -23,12 +26,57 @@ def create_rating():
 
     if not all([rater_id, rated_id, chat_id, rating_value]):
         return jsonify({"error": "Missing required fields: rater_id, rated_id, chat_id, and rating are required."}), 400
+    if not is_rating_value(rating_value):
+        return jsonify({"error": "rating must be an integer between 1 and 5"}), 400
+    try:
+        rater_id, rated_id, chat_id = int(rater_id), int(rated_id), int(chat_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "rater_id, rated_id and chat_id must be integers"}), 400
+    if rater_id == rated_id:
+        return jsonify({"error": "Users cannot rate themselves"}), 400
+    authorize_user(rater_id)
 
-    # Model Validation
-    validate_model(User, rater_id)
-    validate_model(User, rated_id)
-    validate_model(Chat, chat_id)
-
-    # Create New Rating
-    response_data, status_code = create_model(Rating, data)
+    # One query validates the users and chat, one upsert saves the rating
+    # and the rated user's summary changes in the same transaction
+    response_data, status_code = save_rating(rater_id, rated_id, chat_id, rating_value, comment)
     return jsonify(response_data), status_code
+
+@rating_bp.get("/user/<user_id>")
+def get_user_ratings(user_id):
+    """
+    Get the ratings a user received, newest first.
+    Use ?limit=N and the returned next_before as ?before= to page through them.
+    """
+    user = validate_user(user_id, authorize=False)
+    try:
+        limit = int(request.args.get("limit", 20))
+        before = request.args.get("before")
+        before = int(before) if before is not None else None
+    except ValueError:
+        return jsonify({"error": "limit and before must be integers"}), 400
+    if limit < 1 or limit > RATING_PAGE_SIZE_MAX:
+        return jsonify({"error": f"limit must be between 1 and {RATING_PAGE_SIZE_MAX}"}), 400
+
+    query = (
+        db.select(Rating)
+        .where(Rating.rated_id == user.id)
+        .order_by(Rating.id.desc())
+        .limit(limit)
+        .options(*rating_list_options())
+    )
+    if before is not None:
+        query = query.where(Rating.id < before)
+    ratings = [rating.to_dict() for rating in db.session.scalars(query)]
+    return jsonify({
+        "ratings": ratings,
+        "next_before": ratings[-1]["id"] if len(ratings) == limit else None
+    }), 200
+
+@rating_bp.get("/user/<user_id>/summary")
+def get_user_rating_summary(user_id):
+    """
+    Get the number of ratings a user received, their mean and a histogram of
+    the values, read from the user's precomputed summary row.
+    """
+    user = validate_user(user_id, authorize=False)
+    return jsonify(RatingSummary.for_user(user.id)), 200
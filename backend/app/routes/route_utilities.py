@@ -1,5 +1,16 @@
-from flask import abort, make_response
+from flask import abort, make_response, current_app
 from ..db import db
+from ..models.chat_member import ChatMember
+from ..models.user import User
+from ..services.auth import auth, Principal
+
+def parse_id(cls, model_id):
+    """Parse a model ID from the request, aborting with 400 if it is not an integer"""
+    try:
+        return int(model_id)
+    except (TypeError, ValueError):
+        response = {"message": f"{cls.__name__} {model_id} invalid"}
+        abort(make_response(response, 400))
 
 def validate_model(cls, model_id):
     """
@@ -9,22 +20,90 @@ def validate_model(cls, model_id):
         cls: The model class
         model_id: The ID of the model to validate
     """
-    try:
-        model_id = int(model_id)
-    except:
-        response = {"message": f"{cls.__name__} {model_id} invalid"}
-        abort(make_response(response , 400))
+    model_id = parse_id(cls, model_id)
 
     query = db.select(cls).where(cls.id == model_id)
     model = db.session.scalar(query)
     
-    if not model:
+    # Soft-deleted models are treated as not found
+    if not model or getattr(model, "deleted_at", None) is not None:
         response = {"message": f"{cls.__name__} {model_id} not found"}
         abort(make_response(response, 404))
     
     return model
 
-def create_model(cls, model_data, status_code=201, additional_fields=None):
+def authorize_user(user_id):
+    """
+    Check that the request may act as this user, without touching the database.
+
+    With a bearer token the user must be the token's user. Without one the
+    request is let through, unless AUTH_REQUIRED is set.
+
+    Returns:
+        The user id as an integer
+    """
+    user_id = parse_id(User, user_id)
+
+    token_user_id = auth.current_user_id()
+    if token_user_id is None:
+        if current_app.config["AUTH_REQUIRED"]:
+            abort(make_response({"error": "Authentication required"}, 401))
+    elif token_user_id != user_id:
+        abort(make_response({"error": "Access denied"}, 403))
+    return user_id
+
+def authorize_member(chat_id, user_id):
+    """Check that a user is a member of a chat, aborting with 403 if not"""
+    if db.session.get(ChatMember, (chat_id, user_id)) is None:
+        abort(make_response({"error": f"User {user_id} is not a member of chat {chat_id}"}, 403))
+
+def authorize_chat_reader(chat_id):
+    """
+    Check that a request with a bearer token comes from a member of the chat.
+    Requests without one are let through, as for other public reads.
+    """
+    token_user_id = auth.current_user_id()
+    if token_user_id is not None:
+        authorize_member(chat_id, token_user_id)
+
+def authorize_chat_member(chat_id):
+    """
+    Check that the request has a bearer token from a member of the chat.
+    Unlike reads, requests without one are refused with 401.
+
+    Returns:
+        The token's user id
+    """
+    token_user_id = auth.current_user_id()
+    if token_user_id is None:
+        abort(make_response({"error": "Authentication required"}, 401))
+    authorize_member(chat_id, token_user_id)
+    return token_user_id
+
+def validate_user(user_id, authorize=True):
+    """
+    Confirm that a user exists, through the per-process principal cache so
+    that most requests skip the users SELECT.
+
+    Args:
+        user_id: The user's id
+        authorize: Also check that the request may act as this user, see authorize_user
+
+    Returns:
+        The user's Principal
+    """
+    user_id = authorize_user(user_id) if authorize else parse_id(User, user_id)
+
+    principal = auth.principals.get(user_id)
+    if principal is None:
+        row = db.session.execute(db.select(User.id, User.name).where(User.id == user_id)).one_or_none()
+        if row is None:
+            abort(make_response({"message": f"User {user_id} not found"}, 404))
+        principal = Principal(row.id, row.name)
+        auth.principals.put(principal)
+    return principal
+
+def create_model(cls, model_data, status_code=201, additional_fields=None, to_dict_args=None):
     """
     Create a model instance and save it to database.
     
@@ -33,20 +112,23 @@ def create_model(cls, model_data, status_code=201, additional_fields=None):
         model_data: Dictionary of data to create the model
         status_code: HTTP status code to return
         additional_fields: Dict of additional fields to include in response
+        to_dict_args: Dict of keyword arguments for the model's to_dict
     
     Returns:
         Tuple of (response_data, status_code)
     """
     try:
         new_model = cls.from_dict(model_data)
-    except KeyError as e:
+    except (KeyError, TypeError, ValueError) as e:
         response = {"details": f"Invalid data: {str(e)}"}
         abort(make_response(response, 400))
     
     db.session.add(new_model)
+    # Serialize after the flush assigns the id but before the commit expires
+    # the loaded objects, so to_dict does not reload them
+    db.session.flush()
+    response_data = new_model.to_dict(**(to_dict_args or {}))
     db.session.commit()
-
-    response_data = new_model.to_dict()
     if additional_fields:
         response_data.update(additional_fields)
     
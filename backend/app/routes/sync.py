@@ -0,0 +1,35 @@
+from flask import Blueprint, request, Response
+from ..models.user import User
+from .route_utilities import validate_model, authorize_user
+from ..services.presence import presence
+from ..services.sync import parse_sync_token, sync_user
+from ..config import SYNC_MESSAGE_LIMIT
+import json
+
+sync_bp = Blueprint("sync_bp", __name__, url_prefix="/sync")
+
+@sync_bp.get("/<user_id>")
+def sync(user_id):
+    """
+    Return everything that changed for a user since the ?since=<token> of
+    their last sync, or the full state without one, plus the next token.
+    """
+    user = validate_model(User, authorize_user(user_id))
+    since = request.args.get("since")
+    # Validate the sync token
+    if since is not None:
+        try:
+            since = parse_sync_token(since)
+        except ValueError:
+            return Response(
+                json.dumps({"error": "Invalid sync token"}),
+                status=400,
+                mimetype="application/json"
+            )
+
+    presence.touch(user.id)
+    return Response(
+        json.dumps(sync_user(user, since, message_limit=SYNC_MESSAGE_LIMIT)),
+        status=200,
+        mimetype="application/json"
+    )
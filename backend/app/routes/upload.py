@@ -8,7 +8,8 @@ from PIL import Image
 import magic
 from ..db import db
 from ..models.user import User
-from .route_utilities import validate_model
+from .route_utilities import validate_model, authorize_user
+from ..services.profile_events import diff_profile, apply_profile_changes, emit_profile_changes
 from ..config import ALLOWED_EXTENSIONS, MAX_FILE_SIZE
 
 upload_bp = Blueprint("upload_bp", __name__, url_prefix="/upload")
@@ -96,8 +97,10 @@ def process_and_save_image(file, file_path):
 
 def update_user_image_url(user, image_url):
     """Update user's image_url in database"""
-    user.image_url = image_url
+    fields = diff_profile(user, {"image_url": image_url})
+    apply_profile_changes(user, fields)
     db.session.commit()
+    emit_profile_changes(user.id, fields)
 
 def delete_file_from_path(file_path):
     """Delete a file if it exists"""
@@ -145,7 +148,7 @@ def upload_profile_image(user_id):
     """Upload a profile image for a user"""
     try:
         # Validate user exists
-        user = validate_model(User, user_id)
+        user = validate_model(User, authorize_user(user_id))
         
         # Check if file was uploaded
         if "image" not in request.files:
@@ -199,7 +202,7 @@ def upload_profile_image(user_id):
 def delete_profile_image(user_id):
     """Delete a user's profile image"""
     try:
-        user = validate_model(User, user_id)
+        user = validate_model(User, authorize_user(user_id))
         
         if not user.image_url:
             return jsonify({"error": "No profile image to delete"}), 404
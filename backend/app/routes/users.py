@@ -0,0 +1,45 @@
+from flask import Blueprint, request, Response
+from ..services.user_search import search_users
+from ..config import USER_SEARCH_PAGE_SIZE_MAX
+import json
+
+users_bp = Blueprint("users_bp", __name__, url_prefix="/users")
+
+@users_bp.get("/search")
+def search_user_directory():
+    """
+    Search users by ?q= (name), ?skill= and ?location=, newest first, as
+    compact user cards. Use ?limit=N and the returned next_before as
+    ?before= to page through results.
+    """
+    text = request.args.get("q", "").strip()
+    skill = request.args.get("skill", "").strip()
+    location = request.args.get("location", "").strip()
+
+    # Validate the pagination parameters
+    try:
+        limit = int(request.args.get("limit", 20))
+        before = request.args.get("before")
+        before = int(before) if before is not None else None
+    except ValueError:
+        return Response(
+            json.dumps({"error": "limit and before must be integers"}),
+            status=400,
+            mimetype="application/json"
+        )
+    if limit < 1 or limit > USER_SEARCH_PAGE_SIZE_MAX:
+        return Response(
+            json.dumps({"error": f"limit must be between 1 and {USER_SEARCH_PAGE_SIZE_MAX}"}),
+            status=400,
+            mimetype="application/json"
+        )
+
+    users, next_before = search_users(text, skill, location, before=before, limit=limit)
+    return Response(
+        json.dumps({
+            "users": [user.to_card() for user in users],
+            "next_before": next_before
+        }),
+        status=200,
+        mimetype="application/json"
+    )
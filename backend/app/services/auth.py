@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, request, abort, make_response
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from .profile_events import profile_changed, ProfileChange
+
+# Namespaces the signatures, so other values signed with SECRET_KEY are not tokens
+TOKEN_SALT = "auth-token"
+
+class Principal:
+    """The signed-in user as routes see it, without loading the users row"""
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+def token_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=TOKEN_SALT)
+
+def issue_token(user_id):
+    """Sign a token for the user that expires after AUTH_TOKEN_MAX_AGE_SECONDS"""
+    return token_serializer().dumps({"uid": user_id})
+
+def read_token(token):
+    """
+    Verify a token's signature and age, without touching the database.
+
+    Returns:
+        The user id the token was issued to, or None if it is invalid or expired
+    """
+    try:
+        payload = token_serializer().loads(token, max_age=current_app.config["AUTH_TOKEN_MAX_AGE_SECONDS"])
+    except (SignatureExpired, BadSignature):
+        return None
+    return payload.get("uid") if isinstance(payload, dict) else None
+
+class PrincipalCache:
+    """
+    Per-process TTL cache of principals, so confirming that a user exists
+    usually skips the users SELECT.
+
+    Entries live for AUTH_PRINCIPAL_TTL_SECONDS and the cache holds at most
+    AUTH_PRINCIPAL_CACHE_SIZE of them, dropping the least recently used.
+    Changes made through another server process show up here once the
+    entry expires.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal):
+        ttl = self._app.config["AUTH_PRINCIPAL_TTL_SECONDS"]
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[principal.id] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self._app.config["AUTH_PRINCIPAL_CACHE_SIZE"]:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+def load_token():
+    """
+    Read the bearer token of the request, if any, into g.auth_user_id.
+    A request with a bad or expired token is rejected outright.
+    """
+    g.auth_user_id = None
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return
+    user_id = read_token(header[len("Bearer "):].strip())
+    if user_id is None:
+        abort(make_response({"error": "Invalid or expired token"}, 401))
+    g.auth_user_id = user_id
+
+class Auth:
+    """Flask extension that verifies bearer tokens and caches principals per app"""
+
+    def init_app(self, app):
+        app.extensions["principal_cache"] = PrincipalCache(app)
+        app.before_request(load_token)
+
+    @property
+    def principals(self):
+        return current_app.extensions["principal_cache"]
+
+    def current_user_id(self):
+        """The id of the user the request's token was issued to, or None"""
+        return g.get("auth_user_id")
+
+    def invalidate(self, user_id):
+        """Drop a cached principal after the user changed"""
+        self.principals.invalidate(user_id)
+
+auth = Auth()
+
+@profile_changed.connect
+def refresh_principal(app, user_id, changes, **kwargs):
+    """Principals carry the user's name, so only a name change drops them"""
+    if ProfileChange.NAME in changes:
+        app.extensions["principal_cache"].invalidate(user_id)
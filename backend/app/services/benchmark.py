@@ -0,0 +1,358 @@
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from ..db import db
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.chat_participant import ChatParticipant
+from ..models.message import Message
+from ..models.user import User
+from .message_import import chunked, insert_rows
+
+DEFAULT_USERS = 10_000
+DEFAULT_CHATS = 100_000
+DEFAULT_MESSAGES = 10_000_000
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_REQUESTS = 200
+# Every seeded user signs in with this password
+BENCHMARK_PASSWORD = "benchmark"
+# Scan nodes whose actual rows count as rows read in EXPLAIN ANALYZE output
+SCAN_NODE_TYPES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+def insert_batches(table, rows, batch_size):
+    """Insert rows into a table with one executemany per batch, committing each"""
+    inserted = 0
+    for batch in chunked(rows, batch_size):
+        db.session.execute(db.insert(table), batch)
+        db.session.commit()
+        inserted += len(batch)
+    return inserted
+
+def seed_users(count, batch_size, tag):
+    """Insert benchmark users sharing one precomputed password hash and return their ids"""
+    first_id = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+    insert_batches(User.__table__, (
+        {"name": f"Bench User {i}", "email": f"bench-{tag}-{i}@example.com", "password_hash": password_hash}
+        for i in range(count)
+    ), batch_size)
+    return list(db.session.scalars(db.select(User.id).where(User.id >= first_id).order_by(User.id)))
+
+def seed_chats(user_ids, count, batch_size):
+    """
+    Insert chats between distinct pairs of users, and their members.
+
+    Chat k pairs user k mod U with the user k // U + 1 places after it, so
+    no pair repeats while count is below U * (U - 1) / 2.
+
+    Returns:
+        List of (chat_id, user1_id, user2_id)
+    """
+    user_count = len(user_ids)
+    first_id = (db.session.scalar(db.select(db.func.max(Chat.id))) or 0) + 1
+    created_at = datetime.now(timezone.utc) - timedelta(days=365)
+
+    def pairs():
+        for k in range(count):
+            low = k % user_count
+            high = (low + k // user_count + 1) % user_count
+            user1_id, user2_id = user_ids[low], user_ids[high]
+            yield {
+                "user1_id": user1_id,
+                "user2_id": user2_id,
+                "user_low_id": min(user1_id, user2_id),
+                "user_high_id": max(user1_id, user2_id),
+                "created_at": created_at,
+            }
+
+    insert_batches(Chat.__table__, pairs(), batch_size)
+    chats = db.session.execute(
+        db.select(Chat.id, Chat.user1_id, Chat.user2_id).where(Chat.id >= first_id).order_by(Chat.id)
+    ).all()
+    insert_batches(ChatMember.__table__, (
+        {"chat_id": chat_id, "user_id": user_id}
+        for chat_id, user1_id, user2_id in chats
+        for user_id in (user1_id, user2_id)
+    ), batch_size)
+    return [tuple(chat) for chat in chats]
+
+def seed_messages(chats, count, batch_size, rng):
+    """
+    Insert messages spread over the last year, each in a random chat from a
+    random member, through the bulk import path (COPY on PostgreSQL).
+    """
+    started = datetime.now(timezone.utc) - timedelta(days=365)
+    step = timedelta(days=365) / max(count, 1)
+
+    def messages():
+        for i in range(count):
+            chat_id, user1_id, user2_id = chats[rng.randrange(len(chats))]
+            yield {
+                "chat_id": chat_id,
+                "sender_id": user1_id if rng.random() < 0.5 else user2_id,
+                "content": f"Benchmark message {i}",
+                "timestamp": started + step * i,
+            }
+
+    inserted = 0
+    for batch in chunked(messages(), batch_size):
+        insert_rows(batch)
+        db.session.commit()
+        inserted += len(batch)
+    return inserted
+
+def refresh_chat_stats(chat_ids):
+    """Recompute the denormalized message columns of the given chats from their messages, set-based"""
+    chats = Chat.__table__
+    latest = (
+        db.select(Message.id)
+        .where(Message.chat_id == chats.c.id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(chats)
+        .where(chats.c.id.in_(chat_ids))
+        .values(
+            message_count=db.select(db.func.count(Message.id)).where(Message.chat_id == chats.c.id).scalar_subquery(),
+            last_message_at=db.select(db.func.max(Message.timestamp)).where(Message.chat_id == chats.c.id).scalar_subquery(),
+            last_message_id=latest
+        )
+    )
+    members = ChatMember.__table__
+    db.session.execute(
+        db.update(members)
+        .where(members.c.chat_id.in_(chat_ids))
+        .values(last_message_at=db.select(chats.c.last_message_at).where(chats.c.id == members.c.chat_id).scalar_subquery())
+    )
+    db.session.commit()
+
+def seed_read_cursors(chat_ids):
+    """Give one member of every chat a read cursor at its last message, leaving the other with unread messages"""
+    db.session.execute(
+        db.insert(ChatParticipant).from_select(
+            ["chat_id", "user_id", "last_read_message_id"],
+            db.select(ChatMember.chat_id, ChatMember.user_id, Chat.last_message_id)
+            .join(Chat, Chat.id == ChatMember.chat_id)
+            .where(ChatMember.chat_id.in_(chat_ids), ChatMember.user_id == Chat.user1_id)
+        )
+    )
+    db.session.commit()
+
+def seed_dataset(users=DEFAULT_USERS, chats=DEFAULT_CHATS, messages=DEFAULT_MESSAGES,
+                 batch_size=DEFAULT_BATCH_SIZE, seed=42, progress=None):
+    """
+    Bulk-generate a benchmark data set of users, chats and messages.
+
+    Args:
+        users: Number of users
+        chats: Number of chats, between distinct pairs of users
+        messages: Number of messages, spread randomly over the chats
+        batch_size: Rows per executemany and commit
+        seed: Random seed, so the same arguments produce the same data set
+        progress: Optional callable receiving a line of text after each step
+
+    Returns:
+        Dict with the rows created per table and the elapsed seconds
+    """
+    if chats > users * (users - 1) // 2:
+        raise ValueError("Too many chats for the number of users")
+    rng = random.Random(seed)
+    report = progress or (lambda line: None)
+    started = time.perf_counter()
+
+    def step(name, rows):
+        report(f"{name}: {rows} rows after {time.perf_counter() - started:.1f}s")
+
+    user_ids = seed_users(users, batch_size, tag=f"{seed}-{int(time.time())}")
+    step("users", len(user_ids))
+    chat_rows = seed_chats(user_ids, chats, batch_size)
+    step("chats", len(chat_rows))
+    message_count = seed_messages(chat_rows, messages, batch_size, rng)
+    step("messages", message_count)
+    for chat_ids in chunked((chat_id for chat_id, _, _ in chat_rows), batch_size):
+        refresh_chat_stats(chat_ids)
+        seed_read_cursors(chat_ids)
+    step("chat stats and read cursors", len(chat_rows))
+
+    return {
+        "users": len(user_ids),
+        "chats": len(chat_rows),
+        "messages": message_count,
+        "elapsed_seconds": round(time.perf_counter() - started, 1),
+    }
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def rows_scanned(statements):
+    """
+    Sum the rows read by scan nodes over the statements of one request, with
+    EXPLAIN ANALYZE inside a transaction that is rolled back.
+    Returns None where the database cannot report it (SQLite).
+    """
+    if db.engine.dialect.name != "postgresql":
+        return None
+
+    def scanned(plan):
+        rows = plan.get("Actual Rows", 0) * plan.get("Actual Loops", 1) if plan["Node Type"] in SCAN_NODE_TYPES else 0
+        return rows + sum(scanned(child) for child in plan.get("Plans", []))
+
+    total = 0
+    with db.engine.connect() as connection:
+        with connection.begin() as transaction:
+            for statement, parameters in statements:
+                result = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, FORMAT JSON) {statement}", parameters).scalar()
+                plan = result if isinstance(result, list) else json.loads(result)
+                total += scanned(plan[0]["Plan"])
+            transaction.rollback()
+    return total
+
+def scenario_requests(chats, rng):
+    """Build the request for each benchmark scenario against a random seeded chat"""
+    chat_id, user1_id, user2_id = chats[rng.randrange(len(chats))]
+    member_id = user1_id if rng.random() < 0.5 else user2_id
+    return {
+        "get_user_chats": ("GET", f"/chats/{member_id}", None),
+        "get_chat_messages": ("GET", f"/chats/{chat_id}/messages?limit=50&user_id={member_id}", None),
+        "send_message": ("POST", f"/chats/{chat_id}/messages", {"sender_id": member_id, "content": "Benchmark reply"}),
+        "mark_messages_as_read": ("PUT", f"/chats/{chat_id}/messages/read", {"user_id": member_id}),
+    }
+
+class LoginLoad:
+    """
+    Background threads signing a seeded user in as fast as they can, to
+    measure the other scenarios while logins compete with them for CPU.
+    """
+
+    def __init__(self, app, email, threads):
+        self._app = app
+        self._email = email
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(threads)]
+        self.logins = 0
+        self.failures = 0
+
+    def _run(self):
+        client = self._app.test_client()
+        while not self._stop.is_set():
+            response = client.post("/auth/login", json={"email": self._email, "password": BENCHMARK_PASSWORD})
+            with self._lock:
+                if response.status_code == 200:
+                    self.logins += 1
+                else:
+                    self.failures += 1
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - self._started
+
+    def result(self):
+        return {
+            "threads": len(self._threads),
+            "logins_per_second": round(self.logins / self.elapsed, 1) if self.elapsed else 0,
+            "failures": self.failures,
+        }
+
+def run_benchmarks(app, requests=DEFAULT_REQUESTS, scenarios=None, sample_chats=1000, seed=42, login_threads=0):
+    """
+    Time the chat routes against the current database through the test client.
+
+    Each scenario makes requests calls against random chats from a sample of
+    live chats. Statement counts are measured on every request; rows scanned
+    are measured by replaying the statements of the last request of each
+    scenario under EXPLAIN ANALYZE.
+
+    With login_threads, that many threads keep signing a seeded user in while
+    the scenarios run, to show how password hashing affects the other routes.
+
+    Returns:
+        Dict of scenario name to latency percentiles in milliseconds, mean
+        statements per request and rows scanned per request, plus
+        "login_load" with the login throughput when login_threads is set
+    """
+    rng = random.Random(seed)
+    chats = [tuple(chat) for chat in db.session.execute(
+        db.select(Chat.id, Chat.user1_id, Chat.user2_id)
+        .where(Chat.deleted_at.is_(None))
+        .order_by(db.func.random())
+        .limit(sample_chats)
+    )]
+    login_email = db.session.scalar(
+        db.select(User.email).where(User.email.like("bench-%")).order_by(User.id).limit(1)
+    )
+    db.session.remove()
+    if not chats:
+        raise ValueError("No chats to benchmark, seed the database first")
+    if login_threads and login_email is None:
+        raise ValueError("No seeded users to sign in, seed the database first")
+
+    client = app.test_client()
+    names = scenarios or list(scenario_requests(chats, rng))
+    results = {}
+    login_load = LoginLoad(app, login_email, login_threads)
+    with login_load:
+        for name in names:
+            results[name] = run_scenario(client, name, chats, rng, requests)
+    if login_threads:
+        results["login_load"] = login_load.result()
+    return results
+
+def run_scenario(client, name, chats, rng, requests):
+    """Time requests calls of one scenario, see run_benchmarks"""
+    statements = []
+    measured_thread = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Statements of the login load threads are not part of the scenario
+        if threading.get_ident() == measured_thread:
+            statements.append((statement, parameters, executemany))
+
+    latencies = []
+    statement_counts = []
+    for _ in range(requests):
+        method, url, body = scenario_requests(chats, rng)[name]
+        statements.clear()
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} {url} returned {response.status_code}")
+        statement_counts.append(len(statements))
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2),
+        "statements": round(sum(statement_counts) / len(statement_counts), 1),
+        "rows_scanned": rows_scanned([
+            (statement, parameters) for statement, parameters, executemany in statements
+            if not executemany
+            and statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"))
+        ]),
+    }
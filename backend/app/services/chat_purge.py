@@ -0,0 +1,128 @@
+import threading
+from flask import current_app
+from ..db import db
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.chat_participant import ChatParticipant
+from ..models.message import Message
+from ..models.message_archive_segment import MessageArchiveSegment
+from ..models.rating import Rating
+from ..models.rating_summary import RatingSummary
+from .profile_cache import profile_cache
+
+DEFAULT_BATCH_SIZE = 1000
+
+def delete_in_batches(cls, chat_id, batch_size):
+    """
+    Delete a chat's rows from one table with set-based DELETEs of at most
+    batch_size rows, committing after each so locks are held briefly.
+
+    Returns:
+        Number of rows deleted
+    """
+    deleted = 0
+    while True:
+        batch = db.select(cls.id).where(cls.chat_id == chat_id).limit(batch_size)
+        result = db.session.execute(
+            db.delete(cls).where(cls.id.in_(batch)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+def delete_ratings(chat_id):
+    """
+    Delete a chat's ratings, a few per chat at most, and take them out of
+    the rated users' summaries in the same transaction.
+
+    Returns:
+        Number of rows deleted
+    """
+    removed = db.session.execute(
+        db.delete(Rating)
+        .where(Rating.chat_id == chat_id)
+        .returning(Rating.rated_id, Rating.rating, Rating.timestamp)
+        .execution_options(synchronize_session=False)
+    ).all()
+    RatingSummary.record(db.session.connection(), [(*row, -1) for row in removed])
+    db.session.commit()
+    profile_cache.invalidate(*{row.rated_id for row in removed})
+    return len(removed)
+
+def purge_chat(chat_id, batch_size=DEFAULT_BATCH_SIZE):
+    """Remove everything belonging to a deleted chat, then the chat itself"""
+    deleted = 0
+    for cls in (Message, MessageArchiveSegment):
+        deleted += delete_in_batches(cls, chat_id, batch_size)
+    deleted += delete_ratings(chat_id)
+    for cls in (ChatParticipant, ChatMember):
+        db.session.execute(
+            db.delete(cls).where(cls.chat_id == chat_id).execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        db.delete(Chat).where(Chat.id == chat_id).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
+
+def purge_deleted_chats(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Purge every chat marked as deleted.
+
+    Returns:
+        Dict with the number of chats purged and rows deleted
+    """
+    chat_ids = list(db.session.scalars(db.select(Chat.id).where(Chat.deleted_at.is_not(None))))
+    rows = 0
+    for chat_id in chat_ids:
+        rows += purge_chat(chat_id, batch_size)
+    return {"chats": len(chat_ids), "rows": rows}
+
+class ChatPurgeWorker:
+    """
+    Background thread that purges one app's deleted chats outside the request.
+
+    Deleted chats stay marked in the database until purged, so anything left
+    over when a worker process stops is picked up by its next run or by
+    'flask chats purge'.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def notify(self):
+        """Start the thread if needed and wake it up to purge"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="chat-purge")
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._app.app_context():
+                try:
+                    purge_deleted_chats(self._app.config["CHAT_PURGE_BATCH_SIZE"])
+                except Exception as e:
+                    print(f"Error purging deleted chats: {e}")
+                finally:
+                    db.session.remove()
+
+class ChatPurge:
+    """Flask extension giving each app its own ChatPurgeWorker"""
+
+    def init_app(self, app):
+        app.extensions["chat_purge"] = ChatPurgeWorker(app)
+
+    def notify(self):
+        """Purge deleted chats in the background, if CHAT_PURGE_IN_BACKGROUND is set"""
+        if current_app.config["CHAT_PURGE_IN_BACKGROUND"]:
+            current_app.extensions["chat_purge"].notify()
+
+chat_purge = ChatPurge()
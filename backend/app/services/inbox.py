@@ -0,0 +1,66 @@
+from ..db import db
+from ..config import MESSAGE_PREVIEW_LENGTH
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.chat_participant import ChatParticipant
+from ..models.rating import Rating
+from ..models.loader_options import chat_list_options
+from .presence import presence
+
+def user_chats_query(user_id):
+    """
+    Select the live chats a user is a member of, most recently active first,
+    with both participants and the last message loaded in the same query.
+    """
+    return (
+        db.select(Chat)
+        .join(ChatMember, ChatMember.chat_id == Chat.id)
+        .where(ChatMember.user_id == user_id, Chat.deleted_at.is_(None))
+        .order_by(ChatMember.last_message_at.desc().nulls_last(), ChatMember.chat_id.desc())
+        .options(*chat_list_options())
+    )
+
+def serialize_inbox(user_id, chats):
+    """
+    Convert a user's chats to dictionaries with the unread message count, a
+    flag indicating if the user has already rated the chat, a preview of the
+    last message and the presence of both participants.
+    Uses two queries however many chats there are.
+    """
+    chat_ids = [chat.id for chat in chats]
+
+    # Count unread messages past the user's read cursor, for all chats in one query
+    unread_counts = ChatParticipant.unread_counts(user_id, chat_ids)
+    # Find the chats this user has already rated, in one query
+    rated_chat_ids = set()
+    if chat_ids:
+        rated_chat_ids = set(db.session.scalars(
+            db.select(Rating.chat_id).where(Rating.rater_id == user_id, Rating.chat_id.in_(chat_ids))
+        ))
+
+    # Create a list to store the chat data
+    chat_list = []
+    for chat in chats:
+        # Use to_dict method to get chat data
+        chat_data = chat.to_dict(current_user_id=user_id, is_rated=chat.id in rated_chat_ids)
+        
+        # Add the unread count to the chat data
+        chat_data["unread_count"] = unread_counts.get(chat.id, 0)
+
+        # Preview the last message, unless it has moved to the archive
+        last_message = chat.last_message
+        chat_data["last_message"] = {
+            "id": last_message.id,
+            "sender_id": last_message.sender_id,
+            "content": last_message.content[:MESSAGE_PREVIEW_LENGTH],
+            "timestamp": last_message.timestamp.isoformat() if last_message.timestamp else None,
+        } if last_message else None
+
+        # Presence comes from memory and the already loaded users, not from extra queries
+        for prefix, participant in (("user1", chat.user1), ("user2", chat.user2)):
+            participant_presence = presence.describe(participant)
+            chat_data[f"{prefix}_online"] = participant_presence["online"]
+            chat_data[f"{prefix}_last_seen_at"] = participant_presence["last_seen_at"]
+        
+        chat_list.append(chat_data)
+    return chat_list
@@ -0,0 +1,132 @@
+import time
+from datetime import datetime, timedelta, timezone
+from ..db import db
+from ..models.message import Message, message_is_read
+from ..models.message_archive_segment import MessageArchiveSegment
+from ..models.user import User
+
+DEFAULT_SEGMENT_SIZE = 500
+
+def find_inactive_chat_ids(inactive_before):
+    """Return the ids of chats whose newest hot message is older than inactive_before"""
+    query = (
+        db.select(Message.chat_id)
+        .group_by(Message.chat_id)
+        .having(db.func.max(Message.timestamp) < inactive_before)
+    )
+    return list(db.session.scalars(query))
+
+def archive_chat(chat_id, archive_before, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    Move a chat's oldest messages into compressed archive segments.
+
+    Only the prefix of the chat in id order with timestamps before archive_before
+    is archived, so every archived id is lower than every hot id and paging can
+    fall through from the hot table to the archive. Each segment is written and
+    its messages deleted in one transaction.
+
+    Returns:
+        Tuple of (segments written, messages archived)
+    """
+    boundary_id = db.session.scalar(
+        db.select(db.func.min(Message.id)).where(
+            Message.chat_id == chat_id,
+            Message.timestamp >= archive_before
+        )
+    )
+    segments = 0
+    archived = 0
+    while True:
+        query = (
+            db.select(Message.id, Message.sender_id, Message.content, Message.timestamp)
+            .where(Message.chat_id == chat_id)
+            .order_by(Message.id)
+            .limit(segment_size)
+        )
+        if boundary_id is not None:
+            query = query.where(Message.id < boundary_id)
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        db.session.add(MessageArchiveSegment.from_messages(chat_id, rows))
+        db.session.execute(
+            db.delete(Message)
+            .where(Message.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        segments += 1
+        archived += len(rows)
+    return segments, archived
+
+def archive_messages(message_age_days, inactive_days, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    Archive messages older than message_age_days from chats with no activity for inactive_days.
+
+    Returns:
+        Dict with the number of chats, segments and messages archived
+    """
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    archive_before = now - timedelta(days=message_age_days)
+    inactive_before = now - timedelta(days=inactive_days)
+
+    result = {"chats": 0, "segments": 0, "messages": 0}
+    for chat_id in find_inactive_chat_ids(inactive_before):
+        segments, archived = archive_chat(chat_id, archive_before, segment_size)
+        if archived:
+            result["chats"] += 1
+            result["segments"] += segments
+            result["messages"] += archived
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def load_archived_messages(chat_id, before=None, limit=None):
+    """
+    Read archived messages for a chat, newest segments first.
+
+    Args:
+        chat_id: The ID of the chat
+        before: Only return messages with a lower id
+        limit: Return at most this many of the newest matching messages
+
+    Returns:
+        List of message dicts ordered by id
+    """
+    query = (
+        db.select(MessageArchiveSegment)
+        .where(MessageArchiveSegment.chat_id == chat_id)
+        .order_by(MessageArchiveSegment.last_message_id.desc())
+    )
+    if before is not None:
+        query = query.where(MessageArchiveSegment.first_message_id < before)
+
+    messages = []
+    for segment in db.session.scalars(query):
+        messages = [
+            message for message in segment.unpack()
+            if before is None or message["id"] < before
+        ] + messages
+        if limit is not None and len(messages) >= limit:
+            return messages[-limit:]
+    return messages
+
+def serialize_archived_messages(messages, read_cursors):
+    """Add sender names and derived read status to archived message dicts, with one name query"""
+    sender_ids = {message["sender_id"] for message in messages}
+    names = {}
+    if sender_ids:
+        query = db.select(User.id, User.name).where(User.id.in_(sender_ids))
+        names = {user_id: name for user_id, name in db.session.execute(query)}
+    return [
+        {
+            "id": message["id"],
+            "chat_id": message["chat_id"],
+            "sender_id": message["sender_id"],
+            "sender_name": names.get(message["sender_id"]),
+            "content": message["content"],
+            "timestamp": message["timestamp"],
+            "is_read": message_is_read(message["id"], message["sender_id"], read_cursors),
+        }
+        for message in messages
+    ]
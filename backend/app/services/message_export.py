@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from ..db import db
+from ..models.chat_member import ChatMember
+from ..models.message import Message, message_is_read
+from ..models.message_archive_segment import MessageArchiveSegment
+from ..models.user import User
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "chat_id", "sender_id", "sender_name", "content", "timestamp", "is_read")
+
+def iter_chat_messages(chat, read_cursors, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield every message of a chat as a dict, archived ones first, ordered by id.
+
+    Rows are fetched batch_size at a time through a server-side cursor and
+    archive segments one at a time, so memory use does not grow with the chat.
+    """
+    # Every sender is a member, so one query finds all the names
+    members = (
+        db.select(User.id, User.name)
+        .join(ChatMember, ChatMember.user_id == User.id)
+        .where(ChatMember.chat_id == chat.id)
+    )
+    names = {user_id: name for user_id, name in db.session.execute(members)}
+
+    def serialize(message_id, sender_id, content, timestamp):
+        return {
+            "id": message_id,
+            "chat_id": chat.id,
+            "sender_id": sender_id,
+            "sender_name": names.get(sender_id),
+            "content": content,
+            "timestamp": timestamp,
+            "is_read": message_is_read(message_id, sender_id, read_cursors),
+        }
+
+    segments = (
+        db.select(MessageArchiveSegment)
+        .where(MessageArchiveSegment.chat_id == chat.id)
+        .order_by(MessageArchiveSegment.first_message_id)
+        .execution_options(yield_per=1)
+    )
+    for segment in db.session.scalars(segments):
+        for message in segment.unpack():
+            yield serialize(message["id"], message["sender_id"], message["content"], message["timestamp"])
+
+    # Plain rows instead of ORM objects, so nothing accumulates in the session
+    messages = (
+        db.select(Message.id, Message.sender_id, Message.content, Message.timestamp)
+        .where(Message.chat_id == chat.id)
+        .order_by(Message.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for message_id, sender_id, content, timestamp in db.session.execute(messages):
+        yield serialize(message_id, sender_id, content, timestamp.isoformat() if timestamp else None)
+
+def jsonl_lines(messages):
+    """Encode messages as JSON Lines, one line at a time"""
+    for message in messages:
+        yield json.dumps(message) + "\n"
+
+def csv_lines(messages):
+    """Encode messages as CSV with a header row, one line at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for message in messages:
+        writer.writerow([message[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # A chat without messages still gets its header
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+EXPORT_FORMATS = {
+    "jsonl": (jsonl_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
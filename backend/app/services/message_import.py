@@ -0,0 +1,129 @@
+import csv
+import io
+import time
+from itertools import islice
+from ..db import db
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.message import Message, parse_timestamp
+from ..models.sync_version import next_version
+
+DEFAULT_CHUNK_SIZE = 5000
+MESSAGE_COLUMNS = ("chat_id", "sender_id", "content", "timestamp")
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from any iterable without materializing it"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def load_chat_participants(chat_ids):
+    """Fetch {chat_id: {member user ids}} for all given chats in one query"""
+    query = (
+        db.select(ChatMember.chat_id, ChatMember.user_id)
+        .join(Chat, Chat.id == ChatMember.chat_id)
+        .where(ChatMember.chat_id.in_(chat_ids), Chat.deleted_at.is_(None))
+    )
+    participants = {}
+    for chat_id, user_id in db.session.execute(query):
+        participants.setdefault(chat_id, set()).add(user_id)
+    return participants
+
+def validate_chunk(records, offset):
+    """
+    Validate a chunk of raw message records with one set-based query.
+
+    A record is accepted when its chat exists and its sender is one of the
+    chat's participants, which also proves the sender exists.
+
+    Returns:
+        Tuple of (rows ready to insert, list of rejected records with reasons)
+    """
+    rows = []
+    rejected = []
+    candidates = []
+    for index, record in enumerate(records, start=offset):
+        try:
+            row = {
+                "chat_id": int(record["chat_id"]),
+                "sender_id": int(record["sender_id"]),
+                "content": record["content"],
+                "timestamp": parse_timestamp(record.get("timestamp")),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            rejected.append({"index": index, "error": f"Invalid data: {str(e)}"})
+            continue
+        if not isinstance(row["content"], str) or not row["content"]:
+            rejected.append({"index": index, "error": "content required"})
+            continue
+        candidates.append((index, row))
+
+    participants = load_chat_participants({row["chat_id"] for _, row in candidates})
+    for index, row in candidates:
+        if row["chat_id"] not in participants:
+            rejected.append({"index": index, "error": f"Chat {row['chat_id']} not found"})
+        elif row["sender_id"] not in participants[row["chat_id"]]:
+            rejected.append({"index": index, "error": f"User {row['sender_id']} is not a participant of chat {row['chat_id']}"})
+        else:
+            rows.append(row)
+    # Keep ids in timestamp order so imported history sorts the same way either way
+    rows.sort(key=lambda row: row["timestamp"])
+    rejected.sort(key=lambda item: item["index"])
+    return rows, rejected
+
+def copy_rows(rows):
+    """Stream rows into messages with PostgreSQL COPY on the session's connection"""
+    # The sync version default is applied by SQLAlchemy, which COPY bypasses,
+    # so read this transaction's version once and write it with every row
+    version = db.session.scalar(db.select(next_version()))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] if column != "timestamp" else row[column].isoformat() for column in MESSAGE_COLUMNS] + [version])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY messages ({', '.join(MESSAGE_COLUMNS)}, version) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def insert_rows(rows):
+    """Insert a chunk of validated rows: COPY on PostgreSQL, executemany elsewhere"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        copy_rows(rows)
+    else:
+        db.session.execute(db.insert(Message), rows)
+
+def import_messages(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bulk insert message records, committing one transaction per chunk.
+
+    Args:
+        records: Iterable of dicts with chat_id, sender_id, content and an optional ISO timestamp
+        chunk_size: Number of records validated and committed together
+
+    Returns:
+        Dict with inserted and rejected counts, rejected record details and throughput
+    """
+    started = time.perf_counter()
+    inserted = 0
+    rejected = []
+    offset = 0
+    for chunk in chunked(records, chunk_size):
+        rows, chunk_rejected = validate_chunk(chunk, offset)
+        if rows:
+            insert_rows(rows)
+            Chat.record_messages(db.session.connection(), [(row["chat_id"], row["timestamp"]) for row in rows])
+            db.session.commit()
+        inserted += len(rows)
+        rejected.extend(chunk_rejected)
+        offset += len(chunk)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "rejected_count": len(rejected),
+        "rejected": rejected,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if elapsed > 0 else float(inserted),
+    }
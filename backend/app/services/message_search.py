@@ -0,0 +1,58 @@
+import sqlalchemy as sa
+from ..db import db
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.message import Message, SEARCH_CONFIG
+from ..models.loader_options import message_list_options
+
+# The SQLite FTS5 table created alongside messages, see models/message.py
+messages_fts = sa.Table(
+    "messages_fts", sa.MetaData(),
+    sa.Column("rowid", sa.Integer),
+    sa.Column("content", sa.String),
+)
+
+def fts5_query(text):
+    """Quote each search term so FTS5 treats user input as plain words, all of which must match"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def content_matches(text):
+    """Build the full-text match condition for the bound database dialect"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Same expression as ix_messages_content_fts, so the GIN index serves it
+        vector = db.func.to_tsvector(db.literal_column(f"'{SEARCH_CONFIG}'"), Message.content)
+        query = db.func.websearch_to_tsquery(db.literal_column(f"'{SEARCH_CONFIG}'"), text)
+        return vector.bool_op("@@")(query)
+    matching_ids = db.select(messages_fts.c.rowid).where(messages_fts.c.content.op("MATCH")(fts5_query(text)))
+    return Message.id.in_(matching_ids)
+
+def search_messages(user_id, text, before=None, limit=20):
+    """
+    Full-text search the messages of the chats a user takes part in, newest first.
+
+    Args:
+        user_id: The ID of the user searching
+        text: The search terms
+        before: Only return messages with a lower id, for the next page
+        limit: Maximum number of messages to return
+
+    Returns:
+        Tuple of (messages, next_before cursor or None)
+    """
+    user_chat_ids = (
+        db.select(ChatMember.chat_id)
+        .join(Chat, Chat.id == ChatMember.chat_id)
+        .where(ChatMember.user_id == user_id, Chat.deleted_at.is_(None))
+    )
+    query = (
+        db.select(Message)
+        .where(Message.chat_id.in_(user_chat_ids), content_matches(text))
+        .order_by(Message.id.desc())
+        .limit(limit + 1)
+        .options(*message_list_options())
+    )
+    if before is not None:
+        query = query.where(Message.id < before)
+    messages = db.session.scalars(query).all()
+    next_before = messages[limit - 1].id if len(messages) > limit else None
+    return messages[:limit], next_before
@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+from flask import current_app
+from ..db import db
+from ..models.message import Message
+from ..models.user import User
+
+def write_messages(rows):
+    """
+    Insert messages in one transaction.
+
+    Args:
+        rows: List of message dictionaries, as accepted by Message.from_dict
+
+    Returns:
+        List of the saved messages as dictionaries, in the order of rows
+    """
+    messages = [Message.from_dict(row) for row in rows]
+    # Load the senders in one query so serializing the messages finds them in the session
+    sender_ids = {message.sender_id for message in messages}
+    db.session.scalars(db.select(User).where(User.id.in_(sender_ids))).all()
+    db.session.add_all(messages)
+    db.session.flush()
+    # Nobody has read a message that was just sent
+    saved = [message.to_dict(read_cursors={}) for message in messages]
+    db.session.commit()
+    return saved
+
+class PendingWrite:
+    """A message waiting in the buffer, and the result of its batch once committed"""
+
+    def __init__(self, data):
+        self.data = data
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class GroupCommitBuffer:
+    """
+    Write-behind buffer that commits message inserts in groups.
+
+    Requests queue their message and wait. A writer thread takes the first
+    waiting message, collects whatever else arrives within window_ms (up to
+    max_batch messages), commits them as one transaction and then releases
+    every request in the batch, so each acknowledgement still means the
+    message is durable.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, data, timeout=10):
+        """
+        Queue a message and block until the batch holding it is committed.
+
+        Returns:
+            The saved message as a dictionary
+
+        Raises:
+            TimeoutError: If the batch did not finish within timeout seconds.
+                It may still commit, so the message is neither saved nor lost.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="message-group-commit")
+                self._thread.start()
+        pending = PendingWrite(data)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for the message batch to commit")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """Wait for a message, then gather the rest of its batch"""
+        batch = [self._queue.get()]
+        window = self._app.config["MESSAGE_GROUP_COMMIT_WINDOW_MS"] / 1000
+        max_batch = self._app.config["MESSAGE_GROUP_COMMIT_MAX_BATCH"]
+        deadline = time.monotonic() + window
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            results = write_messages([pending.data for pending in batch])
+        except Exception:
+            db.session.rollback()
+            # Retry one by one so a bad message only fails its own request
+            for pending in batch:
+                try:
+                    pending.result = write_messages([pending.data])[0]
+                except Exception as e:
+                    db.session.rollback()
+                    pending.error = e
+                pending.done.set()
+            return
+        for pending, result in zip(batch, results):
+            pending.result = result
+            pending.done.set()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self._app.app_context():
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    print(f"Error writing message batch: {e}")
+                    for pending in batch:
+                        if not pending.done.is_set():
+                            pending.error = e
+                            pending.done.set()
+                finally:
+                    db.session.remove()
+
+class MessageWriter:
+    """Flask extension giving each app its own GroupCommitBuffer"""
+
+    def init_app(self, app):
+        app.extensions["message_writer"] = GroupCommitBuffer(app)
+
+    def submit(self, data):
+        return current_app.extensions["message_writer"].submit(
+            data, current_app.config["MESSAGE_GROUP_COMMIT_TIMEOUT_SECONDS"]
+        )
+
+message_writer = MessageWriter()
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is full and a slot did not free up in time"""
+
+def normalize_method(method):
+    """
+    Spell a werkzeug hash method out with all its cost parameters, the way
+    it is written at the start of the hashes it produces.
+    """
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = (args + ["32768", "8", "1"][len(args):])[:3]
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2":
+        digest = args[0] if args else "sha256"
+        iterations = args[1] if len(args) > 1 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{digest}:{iterations}"
+    return method
+
+def needs_rehash(password_hash, method):
+    """Whether a stored hash was made with other cost parameters than method"""
+    return password_hash.split("$", 1)[0] != normalize_method(method)
+
+# Module-level functions, so the pool's worker processes can import them
+
+def hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+def verify_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+class HashingPool:
+    """
+    Runs password hashing in a bounded pool of worker processes.
+
+    Hashing is deliberately CPU-heavy, so doing it on request threads lets a
+    burst of signups or logins starve every other route. The pool caps the
+    CPU spent on it at PASSWORD_HASH_WORKERS processes, and at most
+    PASSWORD_HASH_MAX_PENDING hashes may wait for them. Beyond that, callers
+    wait up to PASSWORD_HASH_TIMEOUT_SECONDS for a slot and then get
+    HashingBusy. With PASSWORD_HASH_WORKERS set to 0, hashing runs inline.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._pid = None
+
+    @property
+    def method(self):
+        return self._app.config["PASSWORD_HASH_METHOD"]
+
+    def _pool(self):
+        """Return the executor and its slots, starting them in this process if needed"""
+        with self._lock:
+            # Worker processes do not survive a fork, so each server process starts its own
+            if self._executor is None or self._pid != os.getpid():
+                workers = self._app.config["PASSWORD_HASH_WORKERS"]
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._slots = threading.BoundedSemaphore(workers + self._app.config["PASSWORD_HASH_MAX_PENDING"])
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _run(self, function, *args):
+        if self._app.config["PASSWORD_HASH_WORKERS"] == 0:
+            return function(*args)
+        executor, slots = self._pool()
+        if not slots.acquire(timeout=self._app.config["PASSWORD_HASH_TIMEOUT_SECONDS"]):
+            raise HashingBusy("Too many passwords waiting to be hashed")
+        try:
+            return executor.submit(function, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run(verify_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return needs_rehash(password_hash, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+class PasswordHasher:
+    """Flask extension giving each app its own HashingPool"""
+
+    def init_app(self, app):
+        app.extensions["password_hasher"] = HashingPool(app)
+
+    @property
+    def pool(self):
+        return current_app.extensions["password_hasher"]
+
+    def hash(self, password):
+        return self.pool.hash(password)
+
+    def verify(self, password_hash, password):
+        return self.pool.verify(password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return self.pool.needs_rehash(password_hash)
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,139 @@
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from flask import current_app
+from ..db import db
+from ..models.user import User
+
+def as_utc(value):
+    """Treat naive datetimes read back from the database as UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class PresenceStore:
+    """
+    In-memory last-seen times for one app, flushed to users.last_seen_at.
+
+    Activity only touches a dict; the changes are written in one batched
+    UPDATE every flush_seconds by a background thread, or by flush().
+    Each worker process has its own store, so presence seen by another
+    worker shows up here once that worker has flushed.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self._seen = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ttl(self):
+        return timedelta(seconds=self._app.config["PRESENCE_TTL_SECONDS"])
+
+    @property
+    def flush_seconds(self):
+        return self._app.config["PRESENCE_FLUSH_SECONDS"]
+
+    def touch(self, user_id, now=None):
+        """Record activity by a user"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            self._seen[user_id] = now
+            self._dirty.add(user_id)
+            if self.flush_seconds and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, daemon=True, name="presence-flush")
+                self._thread.start()
+
+    def last_seen(self, user):
+        """The newest of the in-memory and stored last-seen times for a loaded user"""
+        seen = self._seen.get(user.id)
+        stored = as_utc(user.last_seen_at)
+        if seen is None or (stored is not None and stored > seen):
+            return stored
+        return seen
+
+    def describe(self, user, now=None):
+        """
+        Presence for a user that is already loaded, without touching the database.
+
+        Returns:
+            Dict with online and last_seen_at (ISO format or None)
+        """
+        now = now or datetime.now(timezone.utc)
+        last_seen = self.last_seen(user)
+        return {
+            "online": last_seen is not None and now - last_seen < self.ttl,
+            "last_seen_at": last_seen.isoformat() if last_seen else None,
+        }
+
+    def flush(self, now=None):
+        """
+        Write pending last-seen times in one batched UPDATE and forget
+        entries older than the TTL, which the database now holds.
+
+        Returns:
+            Number of users updated
+        """
+        now = now or datetime.now(timezone.utc)
+        ttl = self.ttl
+        with self._lock:
+            pending = [{"id": user_id, "last_seen_at": self._seen[user_id]} for user_id in self._dirty]
+            self._dirty.clear()
+            for user_id, seen in list(self._seen.items()):
+                if now - seen >= ttl:
+                    del self._seen[user_id]
+        if not pending:
+            return 0
+        try:
+            # Presence is not a profile change, so keep the user's sync version
+            users = User.__table__
+            db.session.execute(
+                db.update(users)
+                .where(users.c.id == db.bindparam("user_key"))
+                .values(last_seen_at=db.bindparam("seen_at"), version=users.c.version),
+                [{"user_key": row["id"], "seen_at": row["last_seen_at"]} for row in pending]
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keep the times so the next flush retries them
+            with self._lock:
+                for row in pending:
+                    self._seen.setdefault(row["id"], row["last_seen_at"])
+                    self._dirty.add(row["id"])
+            raise
+        return len(pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing presence: {e}")
+                finally:
+                    db.session.remove()
+
+class Presence:
+    """Flask extension giving each app its own PresenceStore"""
+
+    def init_app(self, app):
+        app.extensions["presence"] = PresenceStore(app)
+
+    @property
+    def store(self):
+        return current_app.extensions["presence"]
+
+    def touch(self, user_id):
+        self.store.touch(user_id)
+
+    def describe(self, user):
+        return self.store.describe(user)
+
+    def flush(self):
+        return self.store.flush()
+
+presence = Presence()
@@ -0,0 +1,161 @@
+import hashlib
+import threading
+from typing import NamedTuple, Optional
+from cachetools import TTLCache
+from flask import current_app
+from .profile_events import profile_changed
+
+class MemoryBackend:
+    """Per-process backend, for a single server process or development"""
+
+    def __init__(self, url, ttl, size):
+        self._entries = TTLCache(maxsize=size, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def compare_and_set(self, key, expected, value):
+        """Set the key only if it still holds expected, None meaning absent"""
+        with self._lock:
+            if self._entries.get(key) != expected:
+                return False
+            self._entries[key] = value
+            return True
+
+# Runs atomically on the Redis server
+COMPARE_AND_SET_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+class RedisBackend:
+    """
+    Backend shared by every server process through Redis. Needs the redis
+    package, which is only imported when this backend is configured.
+    """
+
+    def __init__(self, url, ttl, size):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PROFILE_CACHE_URL points to Redis, but the redis package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl
+        self._compare_and_set = self._client.register_script(COMPARE_AND_SET_SCRIPT)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def compare_and_set(self, key, expected, value):
+        """Set the key only if it still holds expected, None meaning absent"""
+        # No stored value is empty, so "" stands for an absent key
+        return bool(self._compare_and_set(keys=[key], args=[expected or b"", value, self._ttl]))
+
+# Backends by the scheme of PROFILE_CACHE_URL
+BACKENDS = {
+    "memory": MemoryBackend,
+    "redis": RedisBackend,
+    "rediss": RedisBackend,
+}
+
+def cache_key(user_id):
+    return f"profile:{user_id}"
+
+class CacheEntry(NamedTuple):
+    """
+    A cached profile, or a miss when etag is None. raw is the stored value
+    the entry was read from, which put checks is still there.
+    """
+    etag: Optional[str]
+    body: Optional[bytes]
+    raw: Optional[bytes]
+
+def parse_entry(raw):
+    """
+    Stored values are "generation\netag\nbody" for a profile, or
+    "generation\n" for a profile invalidated since it was cached.
+    """
+    if raw is None:
+        return 0, CacheEntry(None, None, raw)
+    generation, _, rest = raw.partition(b"\n")
+    if not rest:
+        return int(generation), CacheEntry(None, None, raw)
+    etag, body = rest.split(b"\n", 1)
+    return int(generation), CacheEntry(etag.decode(), body, raw)
+
+def invalidate_entries(backend, user_ids):
+    """
+    Replace each user's entry with a marker one generation on. A reader that
+    missed before this, and may have loaded the profile as it was, then
+    finds its put refused.
+    """
+    for user_id in user_ids:
+        key = cache_key(user_id)
+        while True:
+            raw = backend.get(key)
+            generation, _ = parse_entry(raw)
+            if backend.compare_and_set(key, raw, b"%d\n" % (generation + 1)):
+                break
+
+class ProfileCache:
+    """
+    Flask extension caching each user's serialized profile with its ETag.
+
+    The backend is chosen by PROFILE_CACHE_URL and entries expire after
+    PROFILE_CACHE_TTL_SECONDS, which also bounds how stale the time-decayed
+    reputation in a cached profile can get. Writers call invalidate after
+    committing anything that appears in the profile.
+    """
+
+    def init_app(self, app):
+        url = app.config["PROFILE_CACHE_URL"]
+        scheme = url.split("://", 1)[0]
+        if scheme not in BACKENDS:
+            raise ValueError(f"Unknown PROFILE_CACHE_URL scheme {scheme!r}")
+        app.extensions["profile_cache"] = BACKENDS[scheme](
+            url, app.config["PROFILE_CACHE_TTL_SECONDS"], app.config["PROFILE_CACHE_SIZE"]
+        )
+
+    @property
+    def backend(self):
+        return current_app.extensions["profile_cache"]
+
+    def get(self, user_id):
+        """
+        Returns:
+            CacheEntry of the cached profile, or a miss to pass to put
+        """
+        _, entry = parse_entry(self.backend.get(cache_key(user_id)))
+        return entry
+
+    def put(self, user_id, body, miss):
+        """
+        Cache a profile serialized after the miss was read. It is only stored
+        if the profile was not invalidated in between, as it may be stale then.
+
+        Returns:
+            CacheEntry with the body encoded, to serve either way
+        """
+        body = body.encode()
+        etag = hashlib.sha1(body).hexdigest()
+        generation, _ = parse_entry(miss.raw)
+        self.backend.compare_and_set(
+            cache_key(user_id), miss.raw, b"%d\n%s\n%s" % (generation, etag.encode(), body)
+        )
+        return CacheEntry(etag, body, None)
+
+    def invalidate(self, *user_ids):
+        """Drop the cached profiles of users whose profile changed"""
+        invalidate_entries(self.backend, [user_id for user_id in user_ids if user_id is not None])
+
+profile_cache = ProfileCache()
+
+@profile_changed.connect
+def invalidate_changed_profile(app, user_id, **kwargs):
+    """Every kind of profile change shows in the serialized profile"""
+    invalidate_entries(app.extensions["profile_cache"], [user_id])
@@ -0,0 +1,58 @@
+from enum import Enum
+from blinker import Namespace
+from flask import current_app
+
+class ProfileChange(str, Enum):
+    """Kinds of profile change that consumers subscribe to"""
+    NAME = "name"
+    SKILLS = "skills"
+    AVATAR = "avatar"
+    DETAILS = "details"
+
+# The profile fields clients may change, and the kind of change each one is
+FIELD_CHANGES = {
+    "name": ProfileChange.NAME,
+    "pronouns": ProfileChange.DETAILS,
+    "bio": ProfileChange.DETAILS,
+    "location": ProfileChange.DETAILS,
+    "availability": ProfileChange.DETAILS,
+    "learning_style": ProfileChange.DETAILS,
+    "skills_to_offer": ProfileChange.SKILLS,
+    "skills_to_learn": ProfileChange.SKILLS,
+    "image_url": ProfileChange.AVATAR,
+}
+
+signals = Namespace()
+# Sent after a profile change is committed, with the app as sender and
+# user_id, changes (frozenset of ProfileChange) and fields ({field: (old, new)})
+profile_changed = signals.signal("profile-changed")
+
+def diff_profile(user, data):
+    """
+    Compare requested profile values with the user's current ones.
+    Fields that are not profile fields, or whose value is unchanged, are left out.
+
+    Returns:
+        Dict of {field: (old value, new value)}
+    """
+    return {
+        field: (getattr(user, field), data[field])
+        for field in FIELD_CHANGES
+        if field in data and getattr(user, field) != data[field]
+    }
+
+def apply_profile_changes(user, fields):
+    """Set the changed fields from diff_profile on the user"""
+    for field, (_, new) in fields.items():
+        setattr(user, field, new)
+
+def emit_profile_changes(user_id, fields):
+    """Tell subscribers what changed in a profile, once the change is committed"""
+    if not fields:
+        return
+    profile_changed.send(
+        current_app._get_current_object(),
+        user_id=user_id,
+        changes=frozenset(FIELD_CHANGES[field] for field in fields),
+        fields=fields
+    )
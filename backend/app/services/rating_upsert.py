@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from ..db import db, dialect_insert
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.rating import Rating
+from ..models.rating_summary import RatingSummary, is_rating_value
+from ..models.user import User
+from .profile_cache import profile_cache
+
+# Attempts before giving up when concurrent writes keep changing the rating
+UPSERT_ATTEMPTS = 3
+
+def rating_context(rater_id, rated_id, chat_id):
+    """
+    Check everything a rating depends on with one query.
+
+    Returns:
+        Row saying whether the users and chat exist and whether both users
+        are members of the chat, with the rater's current rating in the chat
+        (previous_rated_id, previous_rating and previous_timestamp, None if
+        they have not rated it)
+    """
+    def member(user_id):
+        return db.exists().where(ChatMember.chat_id == chat_id, ChatMember.user_id == user_id)
+
+    def previous(column):
+        return db.select(column).where(Rating.chat_id == chat_id, Rating.rater_id == rater_id).scalar_subquery()
+
+    return db.session.execute(db.select(
+        db.exists().where(User.id == rater_id).label("rater_exists"),
+        db.exists().where(User.id == rated_id).label("rated_exists"),
+        db.exists().where(Chat.id == chat_id, Chat.deleted_at.is_(None)).label("chat_exists"),
+        member(rater_id).label("rater_is_member"),
+        member(rated_id).label("rated_is_member"),
+        previous(Rating.rated_id).label("previous_rated_id"),
+        previous(Rating.rating).label("previous_rating"),
+        previous(Rating.timestamp).label("previous_timestamp"),
+    )).one()
+
+def upsert_rating(rater_id, rated_id, chat_id, rating, comment, previous):
+    """
+    Insert the rater's rating for the chat, or replace the one they gave
+    before, and return the saved row with the rater's name in one statement.
+
+    The replace only applies while the stored rating is still the previous
+    one the caller read from rating_context, so the summary change below is
+    exact. If a concurrent write
+    got there first, nothing is written and None is returned.
+    """
+    ratings = Rating.__table__
+    timestamp = datetime.now(timezone.utc)
+    statement = dialect_insert(ratings).values(
+        rater_id=rater_id,
+        rated_id=rated_id,
+        chat_id=chat_id,
+        rating=rating,
+        comment=comment,
+        timestamp=timestamp
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ratings.c.chat_id, ratings.c.rater_id],
+        set_={
+            "rated_id": statement.excluded.rated_id,
+            "rating": statement.excluded.rating,
+            "comment": statement.excluded.comment,
+            "timestamp": statement.excluded.timestamp,
+        },
+        where=db.and_(
+            ratings.c.rated_id.is_not_distinct_from(previous.previous_rated_id),
+            ratings.c.rating.is_not_distinct_from(previous.previous_rating),
+            ratings.c.timestamp.is_not_distinct_from(previous.previous_timestamp)
+        )
+    )
+    # Refer to the inserted row by name, since RETURNING does not correlate
+    # subqueries to the target table on every dialect
+    rater_name = (
+        db.select(User.name)
+        .where(User.id == db.literal_column("ratings.rater_id"))
+        .scalar_subquery()
+    )
+    row = db.session.execute(statement.returning(ratings, rater_name.label("rater_name"))).one_or_none()
+    if row is None:
+        return None
+
+    changes = [(rated_id, rating, timestamp, 1)]
+    if previous.previous_rating is not None:
+        changes.append((previous.previous_rated_id, previous.previous_rating, previous.previous_timestamp, -1))
+    RatingSummary.record(db.session.connection(), changes)
+    values = row._asdict()
+    rater_name = values.pop("rater_name")
+    return Rating(**values).to_dict(rater_name=rater_name)
+
+def save_rating(rater_id, rated_id, chat_id, rating, comment=None):
+    """
+    Validate and save a rating, one per rater and chat. Submitting again
+    replaces the rater's earlier rating instead of adding a second one.
+
+    Returns:
+        Tuple of (response_data, status_code): 201 with the rating when it is
+        new, 200 when it replaced an earlier one, or an error and its status
+    """
+    if not is_rating_value(rating):
+        return {"error": "rating must be an integer between 1 and 5"}, 400
+    for _ in range(UPSERT_ATTEMPTS):
+        context = rating_context(rater_id, rated_id, chat_id)
+        if not context.rater_exists or not context.rated_exists:
+            return {"error": "User not found"}, 404
+        if not context.chat_exists:
+            return {"error": f"Chat {chat_id} not found"}, 404
+        if not context.rater_is_member or not context.rated_is_member:
+            return {"error": "The rater and rated user must both be members of the chat"}, 403
+
+        saved = upsert_rating(rater_id, rated_id, chat_id, rating, comment, context)
+        if saved is not None:
+            # The rater's chat is now rated, so clients should sync it again
+            Chat.touch(chat_id)
+            db.session.commit()
+            # The rated users' average rating and reputation changed
+            profile_cache.invalidate(rated_id, context.previous_rated_id)
+            return saved, 201 if context.previous_rating is None else 200
+        db.session.rollback()
+    return {"error": "The rating was changed concurrently, try again"}, 409
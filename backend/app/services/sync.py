@@ -0,0 +1,132 @@
+from ..db import db
+from ..models.chat import Chat
+from ..models.chat_member import ChatMember
+from ..models.chat_participant import ChatParticipant
+from ..models.message import Message
+from ..models.user import User
+from ..models.loader_options import message_list_options
+from ..models.sync_version import current_version
+from .inbox import user_chats_query, serialize_inbox
+
+def parse_sync_token(token):
+    """
+    Split a sync token into the message id and change version it stands for.
+    Together they are a cursor in (version, id) order: every change up to the
+    version, and the messages of that version up to the id, were synced.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    message_id, version = (int(part) for part in token.split("."))
+    if message_id < 0 or version < 0:
+        raise ValueError("Sync token parts must not be negative")
+    return message_id, version
+
+def format_sync_token(message_id, version):
+    """Build the opaque token a client sends back as ?since= on its next sync"""
+    return f"{message_id}.{version}"
+
+def changed_partner_chat_ids(user_id, since_version, version_head):
+    """Select the chats of a user where another member has changed their profile"""
+    partner = db.aliased(ChatMember)
+    return (
+        db.select(ChatMember.chat_id)
+        .join(partner, partner.chat_id == ChatMember.chat_id)
+        .join(User, User.id == partner.user_id)
+        .where(ChatMember.user_id == user_id, partner.user_id != user_id,
+            User.version > since_version, User.version <= version_head)
+    )
+
+def sync_user(user, since=None, message_limit=500):
+    """
+    Collect what changed for a user since a sync token.
+
+    Without a token this is the full client state: every chat and the
+    profile, with no messages, which the client pages in as usual. With a
+    token it is only the chats whose version moved (new messages, reads,
+    ratings, deletion or a partner's profile update), the messages sent after
+    the token, and the profile if it changed.
+
+    Args:
+        user: The user syncing
+        since: Tuple of (message_id, version) from parse_sync_token, or None
+        message_limit: Maximum number of new messages to return
+
+    Returns:
+        Dict with the next token, live chat ids, changed chats, new messages
+        grouped by chat id, the profile or None, and has_more when messages
+        were cut off at message_limit
+    """
+    # Read the heads first, so anything changing during the sync is picked up
+    # again next time. Changes past version_head may have older neighbours
+    # still in flight, so they wait for the next sync too.
+    version_head = current_version()
+    message_head = db.session.scalar(db.select(db.func.max(Message.id))) or 0
+
+    # Every live chat id, so clients can drop chats that were deleted
+    chat_ids = list(db.session.scalars(
+        db.select(ChatMember.chat_id)
+        .join(Chat, Chat.id == ChatMember.chat_id)
+        .where(ChatMember.user_id == user.id, Chat.deleted_at.is_(None))
+        .order_by(ChatMember.chat_id)
+    ))
+
+    if since is None:
+        # Serialize the profile before the chat query marks the user's relationships raiseload
+        profile = user.to_dict()
+        chats = db.session.scalars(user_chats_query(user.id)).unique().all()
+        return {
+            "token": format_sync_token(message_head, version_head),
+            "chat_ids": chat_ids,
+            "chats": serialize_inbox(user.id, chats),
+            "messages": {},
+            "profile": profile,
+            "has_more": False,
+        }
+
+    since_message_id, since_version = since
+    profile = user.to_dict() if since_version < user.version <= version_head else None
+    chats = db.session.scalars(
+        user_chats_query(user.id).where(
+            ((Chat.version > since_version) & (Chat.version <= version_head))
+            | Chat.id.in_(changed_partner_chat_ids(user.id, since_version, version_head))
+        )
+    ).unique().all()
+
+    # New messages in the user's live chats, in the order they were committed
+    messages = db.session.scalars(
+        db.select(Message)
+        .where(
+            Message.chat_id.in_(chat_ids),
+            db.tuple_(Message.version, Message.id) > (since_version, since_message_id),
+            Message.version <= version_head
+        )
+        .order_by(Message.version, Message.id)
+        .limit(message_limit + 1)
+        .options(*message_list_options())
+    ).all()
+    has_more = len(messages) > message_limit
+    messages = messages[:message_limit]
+    if has_more:
+        next_message_id, next_version = messages[-1].id, messages[-1].version
+    elif version_head == since_version:
+        # Archiving can lower the highest id, so keep the client's
+        next_message_id, next_version = max(message_head, since_message_id), version_head
+    else:
+        # Every message up to version_head has an id up to message_head, read after it
+        next_message_id, next_version = message_head, version_head
+    read_cursors = ChatParticipant.read_cursors_for_chats({message.chat_id for message in messages})
+    messages_by_chat = {}
+    for message in messages:
+        messages_by_chat.setdefault(message.chat_id, []).append(message.to_dict(read_cursors[message.chat_id]))
+    for chat_messages in messages_by_chat.values():
+        chat_messages.sort(key=lambda message: message["id"])
+
+    return {
+        "token": format_sync_token(next_message_id, next_version),
+        "chat_ids": chat_ids,
+        "chats": serialize_inbox(user.id, chats),
+        "messages": messages_by_chat,
+        "profile": profile,
+        "has_more": has_more,
+    }
@@ -0,0 +1,154 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+from flask import current_app
+from ..db import db, dialect_insert
+from ..models.user import User, normalize_email
+from .message_import import chunked
+from .password_hasher import hash_password
+
+DEFAULT_CHUNK_SIZE = 2000
+OPTIONAL_FIELDS = ("pronouns", "bio", "location", "availability", "learning_style", "image_url")
+SKILL_FIELDS = ("skills_to_offer", "skills_to_learn")
+# Separates skills in a CSV cell, where the list cannot be written as JSON
+SKILL_SEPARATOR = ";"
+
+def parse_skills(value):
+    """Read a skill list from a JSON array or a SKILL_SEPARATOR-separated CSV cell"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.split(SKILL_SEPARATOR)
+    if not isinstance(value, list) or not all(isinstance(skill, str) for skill in value):
+        raise ValueError("skills must be a list of strings")
+    return [skill.strip() for skill in value if skill.strip()]
+
+def registered_emails(emails):
+    """Return which of the normalized emails are already registered, with one query"""
+    if not emails:
+        return set()
+    normalized = db.func.lower(User.email)
+    return set(db.session.scalars(db.select(normalized).where(normalized.in_(emails))))
+
+def validate_chunk(records, offset, seen):
+    """
+    Validate a chunk of raw user records, checking their emails against the
+    database with one query.
+
+    Args:
+        records: The chunk's records
+        offset: Index of the chunk's first record in the file
+        seen: Normalized emails of earlier records, updated with this chunk's,
+            so an email repeated in the file is only imported once
+
+    Returns:
+        Tuple of (rows ready to hash and insert, with the plain password
+        under "password", and the list of rejected records with reasons)
+    """
+    rows = []
+    rejected = []
+    for index, record in enumerate(records, start=offset):
+        try:
+            name, email, password = record["name"], record["email"], record["password"]
+            if not all(isinstance(value, str) and value.strip() for value in (name, email, password)):
+                raise ValueError("name, email and password must be non-empty strings")
+            row = {"name": name.strip(), "email": email.strip(), "password": password}
+            row.update({field: record.get(field) or None for field in OPTIONAL_FIELDS})
+            row.update({field: parse_skills(record.get(field)) for field in SKILL_FIELDS})
+        except (KeyError, TypeError, ValueError) as e:
+            rejected.append({"index": index, "error": f"Invalid data: {str(e)}"})
+            continue
+        key = normalize_email(row["email"])
+        if key in seen:
+            rejected.append({"index": index, "error": f"Duplicate email {row['email']} in file"})
+            continue
+        seen.add(key)
+        rows.append((index, row))
+
+    registered = registered_emails({normalize_email(row["email"]) for _, row in rows})
+    accepted = []
+    for index, row in rows:
+        if normalize_email(row["email"]) in registered:
+            rejected.append({"index": index, "error": f"Email {row['email']} already registered"})
+        else:
+            accepted.append((index, row))
+    return accepted, rejected
+
+def insert_users(rows):
+    """
+    Insert a chunk of hashed rows in one executemany, skipping emails that
+    were registered since the chunk was validated.
+
+    Returns:
+        The normalized emails that were inserted
+    """
+    statement = dialect_insert(User).on_conflict_do_nothing().returning(User.email)
+    return {normalize_email(email) for email in db.session.scalars(statement, rows)}
+
+def hash_passwords(executor, workers, passwords, method):
+    """Hash passwords across the executor's workers, or in this process without one"""
+    if executor is None:
+        return [hash_password(password, method) for password in passwords]
+    # Hand each worker several passwords per task, to keep the round trips few
+    chunksize = max(1, len(passwords) // (4 * workers))
+    return list(executor.map(hash_password, passwords, repeat(method), chunksize=chunksize))
+
+def refresh_statistics():
+    """Refresh the planner's statistics for users once, after the import"""
+    db.session.execute(db.text("ANALYZE users"))
+    db.session.commit()
+
+def import_users(records, chunk_size=DEFAULT_CHUNK_SIZE, workers=0):
+    """
+    Bulk import user records, committing one transaction per chunk.
+
+    Passwords are hashed with PASSWORD_HASH_METHOD across a pool of worker
+    processes, only for records that passed validation.
+
+    Args:
+        records: Iterable of dicts with name, email and password, plus the
+            optional profile fields and skill lists
+        chunk_size: Number of records validated, hashed and committed together
+        workers: Processes hashing passwords, 0 to hash in this process
+
+    Returns:
+        Dict with inserted and rejected counts, rejected record details and throughput
+    """
+    started = time.perf_counter()
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    inserted = 0
+    rejected = []
+    seen = set()
+    offset = 0
+    executor = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) if workers else None
+    with executor or nullcontext():
+        for chunk in chunked(records, chunk_size):
+            rows, chunk_rejected = validate_chunk(chunk, offset, seen)
+            if rows:
+                passwords = [row.pop("password") for _, row in rows]
+                for (_, row), password_hash in zip(rows, hash_passwords(executor, workers, passwords, method)):
+                    row["password_hash"] = password_hash
+                created = insert_users([row for _, row in rows])
+                db.session.commit()
+                inserted += len(created)
+                chunk_rejected.extend(
+                    {"index": index, "error": f"Email {row['email']} already registered"}
+                    for index, row in rows if normalize_email(row["email"]) not in created
+                )
+            rejected.extend(sorted(chunk_rejected, key=lambda item: item["index"]))
+            offset += len(chunk)
+
+    if inserted:
+        refresh_statistics()
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "rejected_count": len(rejected),
+        "rejected": rejected,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if elapsed > 0 else float(inserted),
+    }
@@ -0,0 +1,68 @@
+import sqlalchemy as sa
+from ..db import db
+from ..models.user import User
+from ..models.loader_options import user_card_options
+
+# Shorter search terms have no trigram to look up, so they match as prefixes instead
+TRIGRAM_MIN_LENGTH = 3
+
+# Escape character for LIKE patterns, the same one SQLAlchemy's autoescape uses
+LIKE_ESCAPE = "/"
+
+def like_pattern(text):
+    """Escape LIKE wildcards so user input matches literally"""
+    return text.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+
+def text_matches(column, text):
+    """
+    Case-insensitive match of a text column: a substring match, served by
+    the column's trigram index, or a prefix match for short terms, served
+    by its lower(column) pattern index.
+    """
+    text = text.lower()
+    if len(text) < TRIGRAM_MIN_LENGTH:
+        return db.func.lower(column).like(like_pattern(text) + "%", escape=LIKE_ESCAPE)
+    return column.ilike("%" + like_pattern(text) + "%", escape=LIKE_ESCAPE)
+
+def has_skill(skill):
+    """Match users offering or wanting to learn the skill, as written"""
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Array containment, served by the GIN indexes on the skill arrays
+        return sa.or_(User.skills_to_offer.contains([skill]), User.skills_to_learn.contains([skill]))
+
+    def contains(column):
+        elements = sa.func.json_each(column).table_valued("value")
+        return sa.exists().where(elements.c.value == skill)
+    return sa.or_(contains(User.skills_to_offer), contains(User.skills_to_learn))
+
+def search_users(text=None, skill=None, location=None, before=None, limit=20):
+    """
+    Search the user directory, newest users first. All given filters must match.
+
+    Args:
+        text: Matched against the user's name
+        skill: A skill the user offers or wants to learn
+        location: Matched against the user's location
+        before: Only return users with a lower id, for the next page
+        limit: Maximum number of users to return
+
+    Returns:
+        Tuple of (users, next_before cursor or None)
+    """
+    query = (
+        db.select(User)
+        .order_by(User.id.desc())
+        .limit(limit + 1)
+        .options(*user_card_options())
+    )
+    if text:
+        query = query.where(text_matches(User.name, text))
+    if location:
+        query = query.where(text_matches(User.location, location))
+    if skill:
+        query = query.where(has_skill(skill))
+    if before is not None:
+        query = query.where(User.id < before)
+    users = db.session.scalars(query).all()
+    next_before = users[limit - 1].id if len(users) > limit else None
+    return users[:limit], next_before
@@ -96,6 +96,24 @@ def run_migrations_online():
 
     connectable = get_engine()
 
+    # Leave out indexes created only on another dialect with ddl_if, such
+    # as the PostgreSQL trigram and GIN indexes, which autogenerate does not check.
+    # The SQLite FTS5 message search table and its shadow tables are created by
+    # hand in a migration, and the inbox index orders by expressions that do
+    # not reflect back as written, so autogenerate leaves both alone.
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and name.startswith('messages_fts'):
+            return False
+        if type_ == 'index' and name == 'ix_chat_members_user_id_last_message_at':
+            return False
+        ddl_if = getattr(object, '_ddl_if', None)
+        if type_ == 'index' and not reflected and ddl_if is not None and ddl_if.dialect:
+            return ddl_if.dialect == connectable.dialect.name
+        return True
+
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
+
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
@@ -0,0 +1,52 @@
+"""Make user emails unique regardless of case
+
+Revision ID: 0a9e4c7d2b15
+Revises: 6f1d3c8b2e57
+Create Date: 2026-10-19 19:42:05.118347
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a9e4c7d2b15'
+down_revision = '6f1d3c8b2e57'
+branch_labels = None
+depends_on = None
+
+
+# The unique constraint on users.email is unnamed in the original schema.
+# PostgreSQL names it users_email_key; on SQLite, batch mode names it on reflection
+SQLITE_NAMING = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def drop_email_constraint():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('users_email_key', 'users', type_='unique')
+    else:
+        with op.batch_alter_table('users', schema=None, naming_convention=SQLITE_NAMING) as batch_op:
+            batch_op.drop_constraint('uq_users_email', type_='unique')
+
+
+def upgrade():
+    # Users whose emails differ only in case cannot be merged automatically
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(email) FROM users GROUP BY lower(email) HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            "Emails registered more than once in different case, resolve them first: " + ", ".join(duplicates)
+        )
+
+    drop_email_constraint()
+    op.create_index('ix_users_lower_email', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_users_lower_email', table_name='users')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('users_email_key', 'users', ['email'])
+    else:
+        with op.batch_alter_table('users', schema=None) as batch_op:
+            batch_op.create_unique_constraint('uq_users_email', ['email'])
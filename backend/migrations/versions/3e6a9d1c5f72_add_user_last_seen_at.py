@@ -0,0 +1,26 @@
+"""Add users.last_seen_at for the presence service
+
+Revision ID: 3e6a9d1c5f72
+Revises: 7d4c1f8e2a96
+Create Date: 2026-10-19 13:21:40.518392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e6a9d1c5f72'
+down_revision = '7d4c1f8e2a96'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('last_seen_at')
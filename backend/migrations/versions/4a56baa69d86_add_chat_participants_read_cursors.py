@@ -0,0 +1,64 @@
+"""Replace per-message is_read flags with per-participant read cursors
+
+Revision ID: 4a56baa69d86
+Revises: 
+Create Date: 2026-10-19 09:12:44.183201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a56baa69d86'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_participants',
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('chat_id', 'user_id')
+    )
+    op.create_index('ix_messages_chat_id_id', 'messages', ['chat_id', 'id'], unique=False)
+
+    # Each participant's cursor starts at the newest message they had already read
+    op.execute("""
+        INSERT INTO chat_participants (chat_id, user_id, last_read_message_id)
+        SELECT chats.id, chats.user1_id, MAX(messages.id)
+        FROM chats JOIN messages ON messages.chat_id = chats.id
+        WHERE messages.sender_id = chats.user2_id AND messages.is_read
+        GROUP BY chats.id, chats.user1_id
+        UNION ALL
+        SELECT chats.id, chats.user2_id, MAX(messages.id)
+        FROM chats JOIN messages ON messages.chat_id = chats.id
+        WHERE messages.sender_id = chats.user1_id AND messages.is_read
+            AND chats.user1_id <> chats.user2_id
+        GROUP BY chats.id, chats.user2_id
+    """)
+
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_column('is_read')
+
+
+def downgrade():
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_read', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    op.execute("""
+        UPDATE messages SET is_read = TRUE
+        WHERE EXISTS (
+            SELECT 1 FROM chat_participants
+            WHERE chat_participants.chat_id = messages.chat_id
+                AND chat_participants.user_id <> messages.sender_id
+                AND chat_participants.last_read_message_id >= messages.id
+        )
+    """)
+
+    op.drop_index('ix_messages_chat_id_id', table_name='messages')
+    op.drop_table('chat_participants')
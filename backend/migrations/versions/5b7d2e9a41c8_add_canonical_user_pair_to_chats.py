@@ -0,0 +1,62 @@
+"""Add canonical user pair to chats with a unique index
+
+Revision ID: 5b7d2e9a41c8
+Revises: e83f5a0c6d21
+Create Date: 2026-10-19 11:20:51.774630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7d2e9a41c8'
+down_revision = 'e83f5a0c6d21'
+branch_labels = None
+depends_on = None
+
+# Chats that repeat an earlier chat's user pair, and the earliest chat they merge into
+DUPLICATE_CHATS = """
+    SELECT id FROM chats
+    WHERE EXISTS (
+        SELECT 1 FROM chats AS keeper
+        WHERE keeper.user_low_id = chats.user_low_id
+            AND keeper.user_high_id = chats.user_high_id
+            AND keeper.id < chats.id
+    )
+"""
+KEEPER_CHAT = """
+    (SELECT MIN(keeper.id) FROM chats AS duplicate JOIN chats AS keeper
+        ON keeper.user_low_id = duplicate.user_low_id AND keeper.user_high_id = duplicate.user_high_id
+    WHERE duplicate.id = {table}.chat_id)
+"""
+
+
+def upgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_low_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('user_high_id', sa.Integer(), nullable=True))
+
+    op.execute("""
+        UPDATE chats SET
+            user_low_id = CASE WHEN user1_id < user2_id THEN user1_id ELSE user2_id END,
+            user_high_id = CASE WHEN user1_id < user2_id THEN user2_id ELSE user1_id END
+    """)
+
+    # Merge duplicate chats created by concurrent requests into the earliest one
+    for table in ('messages', 'ratings', 'message_archive_segments'):
+        op.execute(f"UPDATE {table} SET chat_id = {KEEPER_CHAT.format(table=table)} WHERE chat_id IN ({DUPLICATE_CHATS})")
+    op.execute(f"DELETE FROM chat_participants WHERE chat_id IN ({DUPLICATE_CHATS})")
+    op.execute(f"DELETE FROM chats WHERE id IN ({DUPLICATE_CHATS})")
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.alter_column('user_low_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('user_high_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_unique_constraint('uq_chats_user_pair', ['user_low_id', 'user_high_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_chats_user_pair', type_='unique')
+        batch_op.drop_column('user_high_id')
+        batch_op.drop_column('user_low_id')
@@ -0,0 +1,47 @@
+"""Add user directory search indexes
+
+Revision ID: 5c2f8a1e7d43
+Revises: 0a9e4c7d2b15
+Create Date: 2026-10-19 20:36:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2f8a1e7d43'
+down_revision = '0a9e4c7d2b15'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_users_name_trgm', ['name'], {'postgresql_using': 'gin', 'postgresql_ops': {'name': 'gin_trgm_ops'}}),
+    ('ix_users_lower_name_prefix', [sa.text('lower(name) text_pattern_ops')], {}),
+    ('ix_users_location_trgm', ['location'], {'postgresql_using': 'gin', 'postgresql_ops': {'location': 'gin_trgm_ops'}}),
+    ('ix_users_lower_location_prefix', [sa.text('lower(location) text_pattern_ops')], {}),
+    ('ix_users_skills_to_offer', ['skills_to_offer'], {'postgresql_using': 'gin'}),
+    ('ix_users_skills_to_learn', ['skills_to_learn'], {'postgresql_using': 'gin'}),
+]
+
+
+def upgrade():
+    # SQLite has no trigram or array indexes, and searches it by scanning
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Build without blocking signups and profile updates on a large users table
+    with op.get_context().autocommit_block():
+        for name, columns, options in INDEXES:
+            op.create_index(name, 'users', columns, unique=False, postgresql_concurrently=True, **options)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.drop_index(name, table_name='users', postgresql_concurrently=True)
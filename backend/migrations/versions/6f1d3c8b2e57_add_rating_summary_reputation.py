@@ -0,0 +1,59 @@
+"""Add time-decayed reputation state to rating summaries
+
+Revision ID: 6f1d3c8b2e57
+Revises: 8e3b6a0d9f24
+Create Date: 2026-10-19 18:31:17.640092
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3c8b2e57'
+down_revision = '8e3b6a0d9f24'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copies of the app's settings, so the backfill does not change with them
+REPUTATION_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+REPUTATION_HALF_LIFE_DAYS = 180
+
+
+def reputation_weight(timestamp):
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return 2.0 ** ((timestamp - REPUTATION_EPOCH).total_seconds() / (REPUTATION_HALF_LIFE_DAYS * 86400))
+
+
+def upgrade():
+    with op.batch_alter_table('rating_summaries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reputation_weight', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reputation_weighted_total', sa.Float(), server_default='0', nullable=False))
+
+    # The weights need exponentiation, which SQLite may lack, so sum them here
+    connection = op.get_bind()
+    ratings = sa.table('ratings', sa.column('rated_id', sa.Integer), sa.column('rating', sa.Integer),
+                       sa.column('timestamp', sa.DateTime))
+    sums = {}
+    for rated_id, rating, timestamp in connection.execute(sa.select(ratings.c.rated_id, ratings.c.rating, ratings.c.timestamp)):
+        weight = reputation_weight(timestamp or REPUTATION_EPOCH)
+        total_weight, weighted_total = sums.get(rated_id, (0.0, 0.0))
+        sums[rated_id] = (total_weight + weight, weighted_total + weight * rating)
+    if sums:
+        summaries = sa.table('rating_summaries', sa.column('user_id', sa.Integer),
+                             sa.column('reputation_weight', sa.Float), sa.column('reputation_weighted_total', sa.Float))
+        connection.execute(
+            summaries.update()
+            .where(summaries.c.user_id == sa.bindparam('target_id'))
+            .values(reputation_weight=sa.bindparam('weight'), reputation_weighted_total=sa.bindparam('weighted_total')),
+            [{'target_id': user_id, 'weight': weight, 'weighted_total': total} for user_id, (weight, total) in sums.items()]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('rating_summaries', schema=None) as batch_op:
+        batch_op.drop_column('reputation_weighted_total')
+        batch_op.drop_column('reputation_weight')
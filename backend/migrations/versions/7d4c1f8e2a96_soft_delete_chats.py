@@ -0,0 +1,33 @@
+"""Soft-delete chats and limit the user pair constraint to live chats
+
+Revision ID: 7d4c1f8e2a96
+Revises: b2f90d6c7e14
+Create Date: 2026-10-19 12:48:15.206733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4c1f8e2a96'
+down_revision = 'b2f90d6c7e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.drop_constraint('uq_chats_user_pair', type_='unique')
+
+    op.create_index('uq_chats_user_pair', 'chats', ['user_low_id', 'user_high_id'], unique=True,
+                    postgresql_where=sa.text('deleted_at IS NULL'), sqlite_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('uq_chats_user_pair', table_name='chats')
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_chats_user_pair', ['user_low_id', 'user_high_id'])
+        batch_op.drop_column('deleted_at')
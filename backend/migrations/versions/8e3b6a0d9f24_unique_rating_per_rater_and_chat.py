@@ -0,0 +1,49 @@
+"""Allow one rating per rater and chat
+
+Revision ID: 8e3b6a0d9f24
+Revises: d4b8f1a27c63
+Create Date: 2026-10-19 17:48:09.270431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b6a0d9f24'
+down_revision = 'd4b8f1a27c63'
+branch_labels = None
+depends_on = None
+
+
+SUMMARIZE_RATINGS = """
+    INSERT INTO rating_summaries (user_id, rating_count, rating_total, stars_1, stars_2, stars_3, stars_4, stars_5)
+    SELECT rated_id, count(*), sum(rating),
+           sum(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+           sum(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+           sum(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+           sum(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+           sum(CASE WHEN rating = 5 THEN 1 ELSE 0 END)
+    FROM ratings
+    GROUP BY rated_id
+"""
+
+
+def upgrade():
+    # Keep each rater's latest rating per chat, then summarize what is left
+    op.execute("""
+        DELETE FROM ratings
+        WHERE id NOT IN (SELECT max(id) FROM ratings GROUP BY chat_id, rater_id)
+    """)
+    op.execute("DELETE FROM rating_summaries")
+    op.execute(SUMMARIZE_RATINGS)
+
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_index('ix_ratings_chat_id_rater_id')
+        batch_op.create_unique_constraint('uq_ratings_chat_id_rater_id', ['chat_id', 'rater_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_ratings_chat_id_rater_id', type_='unique')
+        batch_op.create_index('ix_ratings_chat_id_rater_id', ['chat_id', 'rater_id'], unique=False)
@@ -0,0 +1,37 @@
+"""Add compressed message archive segments
+
+Revision ID: 9c1e47d2b3f0
+Revises: 4a56baa69d86
+Create Date: 2026-10-19 10:03:27.551874
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c1e47d2b3f0'
+down_revision = '4a56baa69d86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('message_archive_segments',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('first_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('first_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_archive_segments_chat_id_last_message_id', 'message_archive_segments', ['chat_id', 'last_message_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_message_archive_segments_chat_id_last_message_id', table_name='message_archive_segments')
+    op.drop_table('message_archive_segments')
@@ -0,0 +1,55 @@
+"""Denormalize each chat's latest message and message count
+
+Revision ID: a61f0c3b8d57
+Revises: 3e6a9d1c5f72
+Create Date: 2026-10-19 14:02:33.871045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61f0c3b8d57'
+down_revision = '3e6a9d1c5f72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_message_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the hot messages and the archive segments
+    op.execute("""
+        UPDATE chats SET
+            message_count = (SELECT count(*) FROM messages WHERE messages.chat_id = chats.id)
+                + (SELECT coalesce(sum(message_count), 0) FROM message_archive_segments
+                   WHERE message_archive_segments.chat_id = chats.id),
+            last_message_id = (SELECT id FROM messages WHERE messages.chat_id = chats.id
+                               ORDER BY timestamp DESC, id DESC LIMIT 1),
+            last_message_at = coalesce(
+                (SELECT max(timestamp) FROM messages WHERE messages.chat_id = chats.id),
+                (SELECT max(last_timestamp) FROM message_archive_segments
+                 WHERE message_archive_segments.chat_id = chats.id)
+            )
+    """)
+
+    op.drop_index('ix_chats_user1_id', table_name='chats')
+    op.drop_index('ix_chats_user2_id', table_name='chats')
+    op.create_index('ix_chats_user1_id_last_message_at', 'chats', ['user1_id', sa.text('last_message_at DESC')], unique=False)
+    op.create_index('ix_chats_user2_id_last_message_at', 'chats', ['user2_id', sa.text('last_message_at DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_chats_user2_id_last_message_at', table_name='chats')
+    op.drop_index('ix_chats_user1_id_last_message_at', table_name='chats')
+    op.create_index('ix_chats_user2_id', 'chats', ['user2_id'], unique=False)
+    op.create_index('ix_chats_user1_id', 'chats', ['user1_id'], unique=False)
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_column('message_count')
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('last_message_id')
@@ -0,0 +1,46 @@
+"""Add full-text search index on message content
+
+Revision ID: b2f90d6c7e14
+Revises: 5b7d2e9a41c8
+Create Date: 2026-10-19 12:02:38.910455
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f90d6c7e14'
+down_revision = '5b7d2e9a41c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_messages_content_fts', 'messages', [sa.text("to_tsvector('simple', content)")], unique=False, postgresql_using='gin')
+        return
+
+    # SQLite: an FTS5 table over messages.content, kept in sync by triggers
+    op.execute("CREATE VIRTUAL TABLE messages_fts USING fts5(content, content='messages', content_rowid='id')")
+    op.execute("""CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END""")
+    op.execute("""CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""")
+    op.execute("""CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END""")
+    op.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_messages_content_fts', table_name='messages', postgresql_using='gin')
+        return
+
+    for trigger in ('messages_fts_insert', 'messages_fts_delete', 'messages_fts_update'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS messages_fts")
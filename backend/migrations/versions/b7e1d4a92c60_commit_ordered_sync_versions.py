@@ -0,0 +1,49 @@
+"""Version messages for sync and order versions by commit
+
+Revision ID: b7e1d4a92c60
+Revises: 5c2f8a1e7d43
+Create Date: 2026-10-19 21:12:40.318562
+
+On PostgreSQL, versions become the writing transaction's id instead of a
+sequence value, so existing versions restart at 0 and clients must drop
+their sync tokens and sync again from scratch.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1d4a92c60'
+down_revision = '5c2f8a1e7d43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    # Existing messages start at version 0, which a client's first full sync covers
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), server_default='0', nullable=False))
+
+    if not postgresql:
+        op.create_index(op.f('ix_messages_version'), 'messages', ['version'], unique=False)
+        return
+
+    # Build without blocking message sends on a large messages table
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_messages_version'), 'messages', ['version'], unique=False, postgresql_concurrently=True)
+    for table in ('chats', 'users'):
+        op.alter_column(table, 'version', type_=sa.BigInteger(), postgresql_using='0')
+    op.execute(sa.schema.DropSequence(sa.Sequence('sync_version_seq')))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.CreateSequence(sa.Sequence('sync_version_seq')))
+        for table in ('chats', 'users'):
+            op.alter_column(table, 'version', type_=sa.Integer(), postgresql_using='0')
+
+    op.drop_index(op.f('ix_messages_version'), table_name='messages')
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_column('version')
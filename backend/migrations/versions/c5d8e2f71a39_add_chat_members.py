@@ -0,0 +1,46 @@
+"""Add chat_members for index-backed chat membership lookups
+
+Revision ID: c5d8e2f71a39
+Revises: a61f0c3b8d57
+Create Date: 2026-10-19 14:47:09.336120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e2f71a39'
+down_revision = 'a61f0c3b8d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_members',
+    sa.Column('chat_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('chat_id', 'user_id')
+    )
+    op.create_index('ix_chat_members_user_id_chat_id', 'chat_members', ['user_id', 'chat_id'], unique=False)
+
+    # Every chat so far has exactly its two users as members
+    op.execute("""
+        INSERT INTO chat_members (chat_id, user_id)
+        SELECT id, user1_id FROM chats
+        UNION
+        SELECT id, user2_id FROM chats
+    """)
+
+    # Chats are now found through chat_members, not by user1_id or user2_id
+    op.drop_index('ix_chats_user1_id_last_message_at', table_name='chats')
+    op.drop_index('ix_chats_user2_id_last_message_at', table_name='chats')
+
+
+def downgrade():
+    op.create_index('ix_chats_user2_id_last_message_at', 'chats', ['user2_id', sa.text('last_message_at DESC')], unique=False)
+    op.create_index('ix_chats_user1_id_last_message_at', 'chats', ['user1_id', sa.text('last_message_at DESC')], unique=False)
+    op.drop_index('ix_chat_members_user_id_chat_id', table_name='chat_members')
+    op.drop_table('chat_members')
@@ -0,0 +1,42 @@
+"""Copy last_message_at to chat_members for an index-backed inbox
+
+Revision ID: d1f6a3b8e450
+Revises: b7e1d4a92c60
+Create Date: 2026-10-19 21:48:05.671934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f6a3b8e450'
+down_revision = 'b7e1d4a92c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    with op.batch_alter_table('chat_members', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    op.execute("""
+        UPDATE chat_members
+        SET last_message_at = (SELECT last_message_at FROM chats WHERE chats.id = chat_members.chat_id)
+    """)
+
+    # PostgreSQL sorts nulls first in a descending index unless told otherwise,
+    # while SQLite sorts them last and cannot be told
+    nulls_last = ' NULLS LAST' if postgresql else ''
+    op.create_index(
+        'ix_chat_members_user_id_last_message_at', 'chat_members',
+        ['user_id', sa.text(f'last_message_at DESC{nulls_last}'), sa.text('chat_id DESC')],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_chat_members_user_id_last_message_at', table_name='chat_members')
+    with op.batch_alter_table('chat_members', schema=None) as batch_op:
+        batch_op.drop_column('last_message_at')
@@ -0,0 +1,55 @@
+"""Add per-user rating summaries and page received ratings by id
+
+Revision ID: d4b8f1a27c63
+Revises: f2a7c94e0b18
+Create Date: 2026-10-19 17:02:41.583120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8f1a27c63'
+down_revision = 'f2a7c94e0b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rating_summaries',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rating_total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('stars_1', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('stars_2', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('stars_3', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('stars_4', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('stars_5', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Summarize the ratings received so far
+    op.execute("""
+        INSERT INTO rating_summaries (user_id, rating_count, rating_total, stars_1, stars_2, stars_3, stars_4, stars_5)
+        SELECT rated_id, count(*), sum(rating),
+               sum(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+               sum(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+               sum(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+               sum(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+               sum(CASE WHEN rating = 5 THEN 1 ELSE 0 END)
+        FROM ratings
+        GROUP BY rated_id
+    """)
+
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ratings_rated_id'))
+        batch_op.create_index('ix_ratings_rated_id_id', ['rated_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_index('ix_ratings_rated_id_id')
+        batch_op.create_index(batch_op.f('ix_ratings_rated_id'), ['rated_id'], unique=False)
+
+    op.drop_table('rating_summaries')
@@ -0,0 +1,48 @@
+"""Add the reputation landmark period to rating summaries
+
+Revision ID: e5a2c7f9d314
+Revises: d1f6a3b8e450
+Create Date: 2026-10-19 23:12:40.318206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a2c7f9d314'
+down_revision = 'd1f6a3b8e450'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of the app's setting, so the downgrade does not change with it
+REPUTATION_LANDMARK_HALF_LIVES = 32
+
+
+def upgrade():
+    # The stored sums are relative to the epoch, which is the landmark of period 0
+    with op.batch_alter_table('rating_summaries', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reputation_period', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    # Earlier code reads the sums as relative to the epoch, so scale them back
+    connection = op.get_bind()
+    summaries = sa.table('rating_summaries', sa.column('user_id', sa.Integer), sa.column('reputation_period', sa.Integer),
+                         sa.column('reputation_weight', sa.Float), sa.column('reputation_weighted_total', sa.Float))
+    rows = connection.execute(
+        sa.select(summaries.c.user_id, summaries.c.reputation_period, summaries.c.reputation_weight,
+                  summaries.c.reputation_weighted_total)
+        .where(summaries.c.reputation_period != 0)
+    ).all()
+    if rows:
+        connection.execute(
+            summaries.update()
+            .where(summaries.c.user_id == sa.bindparam('target_id'))
+            .values(reputation_weight=sa.bindparam('weight'), reputation_weighted_total=sa.bindparam('weighted_total')),
+            [{'target_id': user_id, 'weight': weight * 2.0 ** (REPUTATION_LANDMARK_HALF_LIVES * period), 'weighted_total': total * 2.0 ** (REPUTATION_LANDMARK_HALF_LIVES * period)}
+             for user_id, period, weight, total in rows]
+        )
+    with op.batch_alter_table('rating_summaries', schema=None) as batch_op:
+        batch_op.drop_column('reputation_period')
@@ -0,0 +1,32 @@
+"""Add indexes for chat, message and rating hot queries
+
+Revision ID: e83f5a0c6d21
+Revises: 9c1e47d2b3f0
+Create Date: 2026-10-19 10:41:09.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83f5a0c6d21'
+down_revision = '9c1e47d2b3f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_messages_chat_id_timestamp', 'messages', ['chat_id', 'timestamp'], unique=False)
+    op.create_index(op.f('ix_chats_user1_id'), 'chats', ['user1_id'], unique=False)
+    op.create_index(op.f('ix_chats_user2_id'), 'chats', ['user2_id'], unique=False)
+    op.create_index('ix_ratings_chat_id_rater_id', 'ratings', ['chat_id', 'rater_id'], unique=False)
+    op.create_index(op.f('ix_ratings_rated_id'), 'ratings', ['rated_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_ratings_rated_id'), table_name='ratings')
+    op.drop_index('ix_ratings_chat_id_rater_id', table_name='ratings')
+    op.drop_index(op.f('ix_chats_user2_id'), table_name='chats')
+    op.drop_index(op.f('ix_chats_user1_id'), table_name='chats')
+    op.drop_index('ix_messages_chat_id_timestamp', table_name='messages')
@@ -0,0 +1,43 @@
+"""Add change versions to chats and users for client sync
+
+Revision ID: f2a7c94e0b18
+Revises: c5d8e2f71a39
+Create Date: 2026-10-19 15:36:52.104217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c94e0b18'
+down_revision = 'c5d8e2f71a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.CreateSequence(sa.Sequence('sync_version_seq')))
+
+    # Existing rows start at version 0, which a client's first full sync covers
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_chats_version'), ['version'], unique=False)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_users_version'), ['version'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_version'))
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chats_version'))
+        batch_op.drop_column('version')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(sa.schema.DropSequence(sa.Sequence('sync_version_seq')))
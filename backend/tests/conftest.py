@@ -8,6 +8,7 @@ from app.models.user import User
 from app.models.chat import Chat
 from app.models.message import Message
 from app.models.rating import Rating
+from app.services.auth import issue_token
 from werkzeug.security import generate_password_hash
 
 
@@ -17,12 +18,16 @@ def app():
     # Create a temporary file to isolate the database for each test
     db_fd, db_path = tempfile.mkstemp()
     
-    app = create_app()
+    app = create_app({'TESTING': True})
     app.config.update({
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'WTF_CSRF_ENABLED': False,
-        'SECRET_KEY': 'test-secret-key'
+        'SECRET_KEY': 'test-secret-key',
+        # Tests flush presence explicitly instead of from a background thread
+        'PRESENCE_FLUSH_SECONDS': 0,
+        # Tests hash passwords inline instead of starting worker processes
+        'PASSWORD_HASH_WORKERS': 0
     })
 
     # Create the database and load test data
@@ -151,6 +156,13 @@ def auth_headers(client, sample_user, app):
         return headers
 
 
+@pytest.fixture
+def token_headers(app, sample_user):
+    """Get bearer token headers for sample_user."""
+    with app.app_context():
+        return {'Authorization': f'Bearer {issue_token(sample_user)}'}
+
+
 @pytest.fixture
 def mock_gemini_api(monkeypatch):
     """Mock the Gemini API for testing."""
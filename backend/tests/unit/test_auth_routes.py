@@ -2,6 +2,9 @@ import pytest
 import json
 from app.models.user import User
 from app.db import db
+from app.services.password_hasher import normalize_method, needs_rehash, password_hasher, HashingBusy
+from app.services.auth import issue_token
+from sqlalchemy import event
 
 
 class TestAuthRoutes:
@@ -32,6 +35,17 @@ class TestAuthRoutes:
         data = json.loads(response.data)
         assert 'error' in data
     
+    def test_signup_email_not_a_string(self, client):
+        """Test registration with an email that is not a string."""
+        for email in (42, ['test@gmail.com'], {'address': 'test@gmail.com'}):
+            response = client.post('/auth/signup', json={
+                'name': 'Test User',
+                'email': email,
+                'password': 'testpassword'
+            })
+            assert response.status_code == 400
+            assert 'error' in json.loads(response.data)
+    
     def test_signup_duplicate_email(self, client, sample_user, app):
         """Test registration with existing email."""
         with app.app_context():
@@ -45,6 +59,29 @@ class TestAuthRoutes:
             data = json.loads(response.data)
             assert 'error' in data
     
+    def test_signup_duplicate_email_in_other_case(self, client, sample_user):
+        """Test that emails differing only in case count as already registered."""
+        response = client.post('/auth/signup', json={
+            'name': 'Another User',
+            'email': ' TEST@Gmail.com ',
+            'password': 'testpassword'
+        })
+        assert response.status_code == 400
+        assert json.loads(response.data)['error'] == 'Email already registered'
+        # The failed insert leaves the session usable
+        response = client.post('/auth/signup', json={
+            'name': 'Another User',
+            'email': 'another@gmail.com',
+            'password': 'testpassword'
+        })
+        assert response.status_code == 201
+    
+    def test_login_ignores_email_case(self, client, sample_user):
+        """Test that login finds the user whatever the case of the email."""
+        response = client.post('/auth/login', json={'email': 'Test@GMAIL.com ', 'password': 'testpassword'})
+        assert response.status_code == 200
+        assert json.loads(response.data)['user_id'] == sample_user
+    
     def test_login_success(self, client, sample_user, app):
         """Test successful user login."""
         with app.app_context():
@@ -92,6 +129,16 @@ class TestAuthRoutes:
         data = json.loads(response.data)
         assert 'error' in data
     
+    def test_login_email_not_a_string(self, client, sample_user):
+        """Test login with an email that is not a string."""
+        for email in (42, ['test@gmail.com'], {'address': 'test@gmail.com'}):
+            response = client.post('/auth/login', json={
+                'email': email,
+                'password': 'testpassword'
+            })
+            assert response.status_code == 400
+            assert 'error' in json.loads(response.data)
+    
     def test_signup_with_additional_fields(self, client, app):
         """Test registration with optional fields."""
         response = client.post('/auth/signup', json={
@@ -121,4 +168,173 @@ class TestAuthRoutes:
             assert user.availability == 'Weekends'
             assert user.learning_style == 'Visual'
             assert user.skills_to_offer == ['Python', 'Cooking']
-            assert user.skills_to_learn == ['Guitar', 'Spanish'] 
\ No newline at end of file
+            assert user.skills_to_learn == ['Guitar', 'Spanish'] 
+    
+    def test_signup_does_not_store_a_given_hash(self, client, app):
+        """Test that signup hashes the password and ignores a password_hash in the request."""
+        response = client.post('/auth/signup', json={
+            'name': 'Test User', 'email': 'test@gmail.com', 'password': 'testpassword', 'password_hash': 'x'
+        })
+        assert response.status_code == 201
+        with app.app_context():
+            user = User.query.filter_by(email='test@gmail.com').first()
+            assert user.password_hash.startswith('scrypt:32768:8:1$')
+            assert user.check_password('testpassword')
+    
+    def test_login_rehashes_with_new_parameters(self, client, sample_user, app):
+        """Test that a login rehashes a password hashed with other cost parameters."""
+        with app.app_context():
+            version = db.session.get(User, sample_user).version
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        
+        response = client.post('/auth/login', json={'email': 'test@gmail.com', 'password': 'testpassword'})
+        assert response.status_code == 200
+        with app.app_context():
+            user = db.session.get(User, sample_user)
+            assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+            assert user.check_password('testpassword')
+            # A new hash is not a profile change for sync
+            assert user.version == version
+        
+        # The new hash still works and is left alone
+        response = client.post('/auth/login', json={'email': 'test@gmail.com', 'password': 'testpassword'})
+        assert response.status_code == 200
+    
+    def test_login_succeeds_when_rehash_is_busy(self, client, sample_user, app, monkeypatch):
+        """Test that a verified login still succeeds when no slot is free to rehash."""
+        with app.app_context():
+            old_hash = db.session.get(User, sample_user).password_hash
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+        def busy_hash(password):
+            raise HashingBusy()
+
+        monkeypatch.setattr(password_hasher, 'hash', busy_hash)
+        response = client.post('/auth/login', json={'email': 'test@gmail.com', 'password': 'testpassword'})
+        assert response.status_code == 200
+        assert json.loads(response.data)['token']
+        with app.app_context():
+            assert db.session.get(User, sample_user).password_hash == old_hash
+
+    def test_hash_method_normalization(self):
+        """Test that short hash methods are compared with their default cost parameters."""
+        assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+        assert normalize_method('scrypt:16384') == 'scrypt:16384:8:1'
+        assert normalize_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+        assert not needs_rehash('scrypt:32768:8:1$salt$hash', 'scrypt')
+        assert needs_rehash('scrypt:16384:8:1$salt$hash', 'scrypt')
+    
+    def test_login_through_process_pool(self, client, sample_user, app):
+        """Test signing up and in with hashing in a worker process."""
+        app.config['PASSWORD_HASH_WORKERS'] = 1
+        try:
+            response = client.post('/auth/signup', json={'name': 'Pool User', 'email': 'pool@gmail.com', 'password': 'poolpassword'})
+            assert response.status_code == 201
+            response = client.post('/auth/login', json={'email': 'pool@gmail.com', 'password': 'poolpassword'})
+            assert response.status_code == 200
+            response = client.post('/auth/login', json={'email': 'pool@gmail.com', 'password': 'wrong'})
+            assert response.status_code == 401
+        finally:
+            app.extensions['password_hasher'].shutdown()
+    
+    def test_login_when_pool_is_full(self, client, sample_user, app):
+        """Test that logins are turned away with 503 when no hashing slot frees up."""
+        app.config.update({'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_MAX_PENDING': 0, 'PASSWORD_HASH_TIMEOUT_SECONDS': 0.01})
+        pool = app.extensions['password_hasher']
+        try:
+            executor, slots = pool._pool()
+            slots.acquire()
+            response = client.post('/auth/login', json={'email': 'test@gmail.com', 'password': 'testpassword'})
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '1'
+            slots.release()
+        finally:
+            pool.shutdown()
+
+
+class TestAuthTokens:
+    """Test cases for signed tokens and the principal cache."""
+    
+    def login(self, client):
+        response = client.post('/auth/login', json={'email': 'test@gmail.com', 'password': 'testpassword'})
+        return json.loads(response.data)
+    
+    def test_login_returns_token(self, client, sample_user, app):
+        """Test that login returns a token for the user and its lifetime."""
+        data = self.login(client)
+        assert data['token']
+        assert data['expires_in'] == app.config['AUTH_TOKEN_MAX_AGE_SECONDS']
+        response = client.get(f'/sync/{sample_user}', headers={'Authorization': f"Bearer {data['token']}"})
+        assert response.status_code == 200
+    
+    def test_token_for_another_user(self, client, sample_user, sample_user2):
+        """Test that a token cannot be used to act as another user."""
+        token = self.login(client)['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get(f'/sync/{sample_user2}', headers=headers).status_code == 403
+        assert client.get(f'/chats/{sample_user2}', headers=headers).status_code == 403
+        response = client.put(f'/profile/{sample_user2}', json={'name': 'Changed'}, headers=headers)
+        assert response.status_code == 403
+        assert json.loads(response.data) == {'error': 'Access denied'}
+        # Public reads are not tied to the token's user
+        assert client.get(f'/ratings/user/{sample_user2}/summary', headers=headers).status_code == 200
+    
+    def test_invalid_and_expired_tokens(self, client, sample_user, app):
+        """Test that bad and expired tokens are rejected."""
+        response = client.get(f'/sync/{sample_user}', headers={'Authorization': 'Bearer not-a-token'})
+        assert response.status_code == 401
+        assert json.loads(response.data) == {'error': 'Invalid or expired token'}
+        
+        token = issue_token(sample_user)
+        app.config['SECRET_KEY'] = 'another-secret-key'
+        response = client.get(f'/sync/{sample_user}', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 401
+        
+        app.config['AUTH_TOKEN_MAX_AGE_SECONDS'] = -1
+        token = issue_token(sample_user)
+        response = client.get(f'/sync/{sample_user}', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 401
+    
+    def test_auth_required(self, client, sample_user, app):
+        """Test that routes acting as a user need a token when AUTH_REQUIRED is set."""
+        app.config['AUTH_REQUIRED'] = True
+        assert client.get(f'/sync/{sample_user}').status_code == 401
+        assert client.get(f'/ratings/user/{sample_user}').status_code == 200
+        token = issue_token(sample_user)
+        assert client.get(f'/sync/{sample_user}', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+    def test_secret_key_required_outside_tests(self, monkeypatch):
+        """Test that the app refuses to start without a SECRET_KEY, unless debugging or testing."""
+        from app import create_app
+        monkeypatch.delenv('SECRET_KEY', raising=False)
+        monkeypatch.delenv('FLASK_DEBUG', raising=False)
+        with pytest.raises(RuntimeError):
+            create_app()
+        assert create_app({'TESTING': True}).config['SECRET_KEY']
+        assert create_app({'SECRET_KEY': 'configured-key'}).config['SECRET_KEY'] == 'configured-key'
+
+    def test_principal_cache_skips_user_lookup(self, client, sample_user, app):
+        """Test that a repeated request does not load the user again."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        assert client.get(f'/ratings/user/{sample_user}/summary').status_code == 200
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                response = client.get(f'/ratings/user/{sample_user}/summary')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert response.status_code == 200
+        assert not any('FROM users' in statement for statement in statements)
+    
+    def test_profile_update_refreshes_principal(self, client, sample_user, app):
+        """Test that a profile update drops the user's cached principal."""
+        client.get(f'/chats/{sample_user}')
+        assert app.extensions['principal_cache'].get(sample_user).name == 'Test User'
+        client.put(f'/profile/{sample_user}', json={'name': 'Renamed User'})
+        assert app.extensions['principal_cache'].get(sample_user) is None
+        client.get(f'/chats/{sample_user}')
+        assert app.extensions['principal_cache'].get(sample_user).name == 'Renamed User'
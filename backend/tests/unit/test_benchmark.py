@@ -0,0 +1,30 @@
+import json
+from app.models.chat import Chat
+from app.models.chat_member import ChatMember
+from app.models.message import Message
+
+
+class TestBenchmark:
+    """Test cases for the flask bench commands."""
+    
+    def test_bench_seed_and_run(self, runner, app):
+        """Test seeding a small benchmark data set and running every scenario against it."""
+        result = runner.invoke(args=['bench', 'seed', '--users', '10', '--chats', '12', '--messages', '100', '--batch-size', '7'])
+        assert result.exit_code == 0
+        assert 'Seeded 10 users, 12 chats and 100 messages' in result.output
+        with app.app_context():
+            assert Message.query.count() == 100
+            assert ChatMember.query.count() == 24
+            assert sum(chat.message_count for chat in Chat.query) == 100
+        
+        result = runner.invoke(args=['bench', 'run', '--requests', '3', '--json'])
+        assert result.exit_code == 0
+        results = json.loads(result.output)
+        assert set(results) == {'get_user_chats', 'get_chat_messages', 'send_message', 'mark_messages_as_read'}
+        assert all(r['p50_ms'] <= r['p95_ms'] <= r['p99_ms'] and r['statements'] > 0 for r in results.values())
+    
+    def test_bench_seed_too_many_chats(self, runner):
+        """Test that seeding refuses more chats than there are pairs of users."""
+        result = runner.invoke(args=['bench', 'seed', '--users', '3', '--chats', '4', '--messages', '0'])
+        assert result.exit_code != 0
+        assert 'Too many chats' in result.output
@@ -1,11 +1,29 @@
 import pytest
+import csv
+import io
 import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.models.chat import Chat
+from app.models.chat_member import ChatMember
+from app.models.chat_participant import ChatParticipant
 from app.models.message import Message
+from app.services.message_archive import archive_chat
+from app.services.auth import issue_token
 from app.db import db
 
 
+@pytest.fixture
+def bulk_import_headers(app, token_headers):
+    """Enable the bulk import route and return a token for sample_user."""
+    app.config['MESSAGE_BULK_IMPORT_ENABLED'] = True
+    return token_headers
+
+
 class TestChatRoutes:
     """Test cases for chat routes."""
     
@@ -190,6 +208,26 @@ class TestChatRoutes:
             assert data['content'] == 'Test message'
             assert 'timestamp' in data
     
+    def test_send_message_with_client_timestamp(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test sending the ISO 8601 timestamp the frontend sets, and rejecting malformed ones."""
+        response = client.post(f'/chats/{sample_chat}/messages', json={
+            'sender_id': sample_user,
+            'content': 'Timestamped',
+            'timestamp': '2024-05-01T12:30:00.000Z'
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        assert json.loads(response.data)['timestamp'] == '2024-05-01T12:30:00+00:00'
+        with app.app_context():
+            message = Message.query.filter_by(content='Timestamped').one()
+            assert message.timestamp.replace(tzinfo=None) == datetime(2024, 5, 1, 12, 30)
+        
+        response = client.post(f'/chats/{sample_chat}/messages', json={
+            'sender_id': sample_user,
+            'content': 'Badly timestamped',
+            'timestamp': 'yesterday'
+        }, headers=auth_headers)
+        assert response.status_code == 400
+    
     def test_send_message_nonexistent_chat(self, client, sample_user, auth_headers):
         """Test sending message to non-existent chat."""
         response = client.post('/chats/99999/messages', json={
@@ -234,6 +272,23 @@ class TestChatRoutes:
         data = json.loads(response.data)
         assert 'error' in data
     
+    def test_send_message_requires_membership(self, client, sample_chat, app):
+        """Test that a user outside the chat cannot post into it."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            outsider_id = outsider.id
+            outsider_headers = {'Authorization': f'Bearer {issue_token(outsider_id)}'}
+
+        response = client.post(f'/chats/{sample_chat}/messages', json={
+            'sender_id': outsider_id,
+            'content': 'Let me in'
+        }, headers=outsider_headers)
+        assert response.status_code == 403
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 0
+
     def test_mark_messages_read_success(self, client, sample_user, sample_chat, sample_message, auth_headers):
         """Test successful message read marking."""
         response = client.put(f'/chats/{sample_chat}/messages/read', json={
@@ -270,4 +325,550 @@ class TestChatRoutes:
         
         assert response.status_code == 400
         data = json.loads(response.data)
-        assert 'error' in data
\ No newline at end of file
+        assert 'error' in data
+
+    def test_mark_messages_read_requires_membership(self, client, sample_chat, sample_message, auth_headers, app):
+        """Test that a user outside the chat cannot mark it read."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            outsider_id = outsider.id
+
+        response = client.put(f'/chats/{sample_chat}/messages/read', json={
+            'user_id': outsider_id
+        }, headers=auth_headers)
+        assert response.status_code == 403
+        with app.app_context():
+            assert db.session.get(ChatParticipant, (sample_chat, outsider_id)) is None
+
+    def test_mark_messages_read_moves_read_cursor(self, client, sample_user, sample_user2, sample_chat, sample_message, auth_headers):
+        """Test that marking a chat read clears the unread count and derives is_read."""
+        response = client.get(f'/chats/{sample_user2}', headers=auth_headers)
+        assert json.loads(response.data)['chats'][0]['unread_count'] == 1
+        
+        response = client.put(f'/chats/{sample_chat}/messages/read', json={
+            'user_id': sample_user2
+        }, headers=auth_headers)
+        assert response.status_code == 200
+        
+        response = client.get(f'/chats/{sample_user2}', headers=auth_headers)
+        assert json.loads(response.data)['chats'][0]['unread_count'] == 0
+        
+        response = client.get(f'/chats/{sample_chat}/messages', headers=auth_headers)
+        assert json.loads(response.data)['messages'][0]['is_read'] is True
+        
+        # A new message lands past the cursor and is unread again
+        client.post(f'/chats/{sample_chat}/messages', json={
+            'sender_id': sample_user,
+            'content': 'Another message'
+        }, headers=auth_headers)
+        response = client.get(f'/chats/{sample_user2}', headers=auth_headers)
+        assert json.loads(response.data)['chats'][0]['unread_count'] == 1
+    
+    def test_mark_messages_read_own_messages_stay_unread(self, client, sample_user, sample_chat, sample_message, auth_headers):
+        """Test that the sender reading a chat does not mark their own messages read."""
+        client.put(f'/chats/{sample_chat}/messages/read', json={
+            'user_id': sample_user
+        }, headers=auth_headers)
+        
+        response = client.get(f'/chats/{sample_chat}/messages', headers=auth_headers)
+        assert json.loads(response.data)['messages'][0]['is_read'] is False
+    
+    def test_bulk_import_messages(self, client, sample_user, sample_chat, auth_headers, bulk_import_headers):
+        """Test bulk importing messages with invalid records rejected."""
+        messages = [
+            {'chat_id': sample_chat, 'sender_id': sample_user, 'content': f'Message {i}',
+             'timestamp': f'2024-01-15T10:{i:02d}:00Z'}
+            for i in range(50)
+        ]
+        messages.append({'chat_id': 99999, 'sender_id': sample_user, 'content': 'No chat'})
+        messages.append({'chat_id': sample_chat, 'sender_id': sample_user, 'content': 'Bad time', 'timestamp': 'yesterday'})
+        messages.append({'chat_id': sample_chat, 'sender_id': sample_user})
+        
+        response = client.post('/chats/messages/bulk', json={'messages': messages}, headers=bulk_import_headers)
+        
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data['inserted'] == 50
+        assert data['rejected_count'] == 3
+        assert [rejected['index'] for rejected in data['rejected']] == [50, 51, 52]
+        assert 'rows_per_second' in data
+        
+        response = client.get(f'/chats/{sample_chat}/messages', headers=auth_headers)
+        contents = [message['content'] for message in json.loads(response.data)['messages']]
+        assert contents == [f'Message {i}' for i in range(50)]
+    
+    def test_bulk_import_messages_missing_list(self, client, bulk_import_headers):
+        """Test bulk import without a list of messages."""
+        response = client.post('/chats/messages/bulk', json={}, headers=bulk_import_headers)
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+
+    def test_bulk_import_messages_body_not_an_object(self, client, sample_user, sample_chat, bulk_import_headers):
+        """Test bulk import with a JSON body that is not an object."""
+        message = {'chat_id': sample_chat, 'sender_id': sample_user, 'content': 'Hello'}
+        for body in ([message], 'messages', 42):
+            response = client.post('/chats/messages/bulk', json=body, headers=bulk_import_headers)
+            assert response.status_code == 400
+            assert 'error' in json.loads(response.data)
+
+    def test_bulk_import_messages_all_rejected(self, client, sample_user, sample_chat, bulk_import_headers):
+        """Test that a bulk import that inserts nothing is not reported as created."""
+        messages = [
+            {'chat_id': 99999, 'sender_id': sample_user, 'content': 'No chat'},
+            {'chat_id': sample_chat, 'sender_id': sample_user},
+        ]
+        response = client.post('/chats/messages/bulk', json={'messages': messages}, headers=bulk_import_headers)
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert data['inserted'] == 0
+        assert [rejected['index'] for rejected in data['rejected']] == [0, 1]
+
+    def test_bulk_import_messages_forbidden(self, client, sample_user, sample_user2, sample_chat, app):
+        """Test that bulk import is refused when disabled, without a token, or for another user's messages."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            member_headers = {'Authorization': f'Bearer {issue_token(sample_user)}'}
+            outsider_headers = {'Authorization': f'Bearer {issue_token(outsider.id)}'}
+        body = {'messages': [{'chat_id': sample_chat, 'sender_id': sample_user, 'content': 'Spoofed'}]}
+
+        assert client.post('/chats/messages/bulk', json=body, headers=member_headers).status_code == 403
+        app.config['MESSAGE_BULK_IMPORT_ENABLED'] = True
+        assert client.post('/chats/messages/bulk', json=body).status_code == 403
+        assert client.post('/chats/messages/bulk', json=body, headers=outsider_headers).status_code == 403
+        partner = {'messages': [{'chat_id': sample_chat, 'sender_id': sample_user2, 'content': 'Spoofed'}]}
+        assert client.post('/chats/messages/bulk', json=partner, headers=member_headers).status_code == 403
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 0
+    
+    def test_import_messages_command(self, runner, sample_user, sample_user2, sample_chat, tmp_path, app):
+        """Test the flask messages import command with a JSON Lines file."""
+        path = tmp_path / 'messages.jsonl'
+        path.write_text('\n'.join(
+            json.dumps({'chat_id': sample_chat, 'sender_id': sender, 'content': 'Imported'})
+            for sender in [sample_user, sample_user2, sample_user]
+        ))
+        
+        result = runner.invoke(args=['messages', 'import', str(path), '--chunk-size', '2'])
+        
+        assert result.exit_code == 0
+        assert 'Imported 3 messages' in result.output
+        assert 'rows/s' in result.output
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 3
+    
+    def test_archived_messages_page_from_archive(self, client, runner, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that archived messages are still served, including across page boundaries."""
+        with app.app_context():
+            old = datetime.now(timezone.utc) - timedelta(days=400)
+            for i in range(5):
+                db.session.add(Message(
+                    chat_id=sample_chat,
+                    sender_id=sample_user if i % 2 == 0 else sample_user2,
+                    content=f'Old message {i}',
+                    timestamp=old + timedelta(minutes=i)
+                ))
+            db.session.commit()
+        response = client.get(f'/chats/{sample_chat}/messages', headers=auth_headers)
+        before_archive = json.loads(response.data)['messages']
+        
+        result = runner.invoke(args=['messages', 'archive', '--older-than-days', '365',
+                                     '--inactive-days', '30', '--segment-size', '2'])
+        assert result.exit_code == 0
+        assert 'Archived 5 messages from 1 chats into 3 segments' in result.output
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 0
+        
+        # The full history is unchanged
+        response = client.get(f'/chats/{sample_chat}/messages', headers=auth_headers)
+        assert json.loads(response.data)['messages'] == before_archive
+        
+        # Paging walks backwards through the archive
+        response = client.get(f'/chats/{sample_chat}/messages?limit=3', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [m['content'] for m in data['messages']] == ['Old message 2', 'Old message 3', 'Old message 4']
+        assert data['next_before'] == data['messages'][0]['id']
+        
+        response = client.get(f'/chats/{sample_chat}/messages?limit=3&before={data["next_before"]}', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [m['content'] for m in data['messages']] == ['Old message 0', 'Old message 1']
+        assert data['next_before'] is None
+    
+    def test_get_messages_page_spans_hot_and_archive(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test a page that starts in the hot table and continues into the archive."""
+        with app.app_context():
+            old = datetime.now(timezone.utc) - timedelta(days=400)
+            for i in range(3):
+                db.session.add(Message(chat_id=sample_chat, sender_id=sample_user,
+                                       content=f'Old message {i}', timestamp=old))
+            db.session.add(Message(chat_id=sample_chat, sender_id=sample_user, content='New message'))
+            db.session.commit()
+            archive_chat(sample_chat, datetime.now(timezone.utc) - timedelta(days=365))
+        
+        response = client.get(f'/chats/{sample_chat}/messages?limit=3', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [m['content'] for m in data['messages']] == ['Old message 1', 'Old message 2', 'New message']
+        assert all(m['sender_name'] == 'Test User' for m in data['messages'])
+    
+    def test_get_messages_invalid_limit(self, client, sample_chat, auth_headers):
+        """Test paging messages with an out of range limit."""
+        response = client.get(f'/chats/{sample_chat}/messages?limit=0', headers=auth_headers)
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+    
+    def test_create_chat_reversed_pair_returns_existing(self, client, sample_user, sample_user2, sample_chat, auth_headers):
+        """Test that the same pair in the other order gets the existing chat."""
+        response = client.post('/chats', json={
+            'user1_id': sample_user2,
+            'user2_id': sample_user
+        }, headers=auth_headers)
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['id'] == sample_chat
+        assert data['user1_id'] == sample_user
+        assert data['user2_id'] == sample_user2
+    
+    def test_create_chat_duplicate_pair_rejected_by_unique_index(self, sample_user, sample_user2, sample_chat, app):
+        """Test that the canonical pair index rejects a second chat between the same users."""
+        with app.app_context():
+            db.session.add(Chat(user1_id=sample_user2, user2_id=sample_user))
+            with pytest.raises(IntegrityError):
+                db.session.commit()
+            db.session.rollback()
+    
+    def test_get_chats_statement_count_independent_of_chat_count(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test that the inbox issues the same number of queries for one chat or many."""
+        def count_statements():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            with app.app_context():
+                event.listen(db.engine, 'before_cursor_execute', listener)
+                try:
+                    response = client.get(f'/chats/{sample_user}', headers=auth_headers)
+                finally:
+                    event.remove(db.engine, 'before_cursor_execute', listener)
+            assert response.status_code == 200
+            return len(statements), len(json.loads(response.data)['chats'])
+        
+        single_count, single_chats = count_statements()
+        with app.app_context():
+            for i in range(5):
+                partner = User(name=f'Partner {i}', email=f'partner{i}@gmail.com', password_hash='x')
+                db.session.add(partner)
+                db.session.flush()
+                db.session.add(Chat(user1_id=sample_user, user2_id=partner.id))
+                db.session.add(Message(chat_id=sample_chat, sender_id=partner.id, content='Hi'))
+            db.session.commit()
+        many_count, many_chats = count_statements()
+        
+        assert (single_chats, many_chats) == (1, 6)
+        assert many_count == single_count
+    
+    def test_search_messages(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test full-text search across the user's chats, newest first and paginated."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.flush()
+            other_chat = Chat(user1_id=sample_user2, user2_id=outsider.id)
+            db.session.add(other_chat)
+            db.session.flush()
+            for content in ['Here is the link to the guitar course', 'No match here',
+                            'Another guitar link for you', 'Guitar LINK three']:
+                db.session.add(Message(chat_id=sample_chat, sender_id=sample_user2, content=content))
+            db.session.add(Message(chat_id=other_chat.id, sender_id=outsider.id, content='A private guitar link'))
+            db.session.commit()
+        
+        response = client.get(f'/chats/{sample_user}/search?q=guitar link&limit=2', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [m['content'] for m in data['messages']] == ['Guitar LINK three', 'Another guitar link for you']
+        assert data['messages'][0]['sender_name'] == 'Test User 2'
+        assert data['next_before'] == data['messages'][-1]['id']
+        
+        response = client.get(f'/chats/{sample_user}/search?q=guitar link&limit=2&before={data["next_before"]}', headers=auth_headers)
+        data = json.loads(response.data)
+        assert [m['content'] for m in data['messages']] == ['Here is the link to the guitar course']
+        assert data['next_before'] is None
+    
+    def test_search_messages_missing_query(self, client, sample_user, auth_headers):
+        """Test searching without search terms."""
+        response = client.get(f'/chats/{sample_user}/search?q=', headers=auth_headers)
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+    
+    def test_search_messages_quotes_user_input(self, client, sample_user, sample_chat, sample_message, auth_headers):
+        """Test that FTS syntax characters in the query are treated as plain text."""
+        response = client.get(f'/chats/{sample_user}/search?q="test OR (', headers=auth_headers)
+        
+        assert response.status_code == 200
+    
+    def test_delete_chat_hides_then_purges(self, client, runner, sample_user, sample_user2, sample_chat, sample_message, sample_rating, auth_headers, app, token_headers):
+        """Test that a deleted chat disappears at once and its rows are purged in batches later."""
+        app.config['CHAT_PURGE_IN_BACKGROUND'] = False
+        with app.app_context():
+            for i in range(5):
+                db.session.add(Message(chat_id=sample_chat, sender_id=sample_user, content=f'Message {i}'))
+            db.session.commit()
+        
+        response = client.delete(f'/chats/{sample_chat}', headers=token_headers)
+        assert response.status_code == 200
+        
+        assert client.get(f'/chats/{sample_chat}/messages', headers=auth_headers).status_code == 404
+        response = client.get(f'/chats/{sample_user}', headers=auth_headers)
+        assert json.loads(response.data)['chats'] == []
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 6
+        
+        # The same pair can start a new chat while the old one waits to be purged
+        response = client.post('/chats', json={'user1_id': sample_user, 'user2_id': sample_user2}, headers=auth_headers)
+        assert response.status_code == 201
+        assert json.loads(response.data)['id'] != sample_chat
+        
+        result = runner.invoke(args=['chats', 'purge', '--batch-size', '2'])
+        assert result.exit_code == 0
+        assert 'Purged 1 deleted chats (7 rows)' in result.output
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 0
+            assert db.session.get(Chat, sample_chat) is None
+    
+    def test_delete_chat_requires_membership(self, client, sample_chat, auth_headers, app):
+        """Test that a chat can only be deleted with a member's token."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            outsider_headers = {'Authorization': f'Bearer {issue_token(outsider.id)}'}
+
+        assert client.delete(f'/chats/{sample_chat}', headers=outsider_headers).status_code == 403
+        assert client.delete(f'/chats/{sample_chat}', headers=auth_headers).status_code == 401
+        with app.app_context():
+            assert db.session.get(Chat, sample_chat).deleted_at is None
+
+    def test_delete_chat_purged_by_background_worker(self, client, sample_chat, sample_message, auth_headers, app, token_headers):
+        """Test that the background worker purges a deleted chat."""
+        response = client.delete(f'/chats/{sample_chat}', headers=token_headers)
+        assert response.status_code == 200
+        
+        with app.app_context():
+            for _ in range(50):
+                db.session.remove()
+                if db.session.get(Chat, sample_chat) is None:
+                    break
+                time.sleep(0.1)
+            assert db.session.get(Chat, sample_chat) is None
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 0
+    
+    def test_get_chats_includes_presence(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that chat activity shows participants online and is flushed to last_seen_at in one batch."""
+        response = client.get(f'/chats/{sample_user}', headers=auth_headers)
+        chat = json.loads(response.data)['chats'][0]
+        assert chat['user1_online'] is True
+        assert chat['user1_last_seen_at'] is not None
+        assert chat['user2_online'] is False
+        assert chat['user2_last_seen_at'] is None
+        
+        client.post(f'/chats/{sample_chat}/messages', json={'sender_id': sample_user2, 'content': 'Hi'}, headers=auth_headers)
+        response = client.get(f'/chats/{sample_user}', headers=auth_headers)
+        assert json.loads(response.data)['chats'][0]['user2_online'] is True
+        
+        with app.app_context():
+            assert db.session.get(User, sample_user).last_seen_at is None
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                assert app.extensions['presence'].flush() == 2
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            assert len([s for s in statements if s.startswith('UPDATE users')]) == 1
+            db.session.remove()
+            assert db.session.get(User, sample_user).last_seen_at is not None
+            assert db.session.get(User, sample_user2).last_seen_at is not None
+    
+    def test_presence_expires_after_ttl(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test that a user goes offline after the TTL but keeps their stored last-seen time."""
+        client.get(f'/chats/{sample_chat}/messages?user_id={sample_user}', headers=auth_headers)
+        with app.app_context():
+            store = app.extensions['presence']
+            later = datetime.now(timezone.utc) + timedelta(seconds=app.config['PRESENCE_TTL_SECONDS'])
+            store.flush(now=later)
+            user = db.session.get(User, sample_user)
+            assert store.describe(user, now=later)['online'] is False
+            assert store.describe(user, now=later)['last_seen_at'] is not None
+    
+    def test_send_message_group_commit(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test that concurrent sends in group-commit mode share one transaction."""
+        app.config['MESSAGE_GROUP_COMMIT'] = True
+        app.config['MESSAGE_GROUP_COMMIT_WINDOW_MS'] = 500
+        commits = []
+        listener = lambda *args: commits.append(args)
+        event.listen(db.engine, 'commit', listener)
+        barrier = threading.Barrier(5)
+        responses = []
+        
+        def send(i):
+            barrier.wait()
+            responses.append(client.post(f'/chats/{sample_chat}/messages', json={
+                'sender_id': sample_user,
+                'content': f'Burst {i}'
+            }, headers=auth_headers))
+        
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(5)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            event.remove(db.engine, 'commit', listener)
+        
+        assert [response.status_code for response in responses] == [201] * 5
+        data = [json.loads(response.data) for response in responses]
+        assert sorted(message['content'] for message in data) == [f'Burst {i}' for i in range(5)]
+        assert all(message['sender_name'] == 'Test User' and message['is_read'] is False for message in data)
+        assert len(commits) < 5
+        with app.app_context():
+            assert Message.query.filter_by(chat_id=sample_chat).count() == 5
+    
+    def test_send_message_group_commit_timeout(self, client, sample_user, sample_chat, auth_headers, app, monkeypatch):
+        """Test that a send whose batch is slow to commit is accepted as indeterminate, not failed."""
+        from app.services import message_writer
+        write_messages = message_writer.write_messages
+        released = threading.Event()
+
+        def slow_write_messages(rows):
+            released.wait(5)
+            return write_messages(rows)
+
+        monkeypatch.setattr(message_writer, 'write_messages', slow_write_messages)
+        app.config['MESSAGE_GROUP_COMMIT'] = True
+        app.config['MESSAGE_GROUP_COMMIT_TIMEOUT_SECONDS'] = 0.1
+        response = client.post(f'/chats/{sample_chat}/messages', json={
+            'sender_id': sample_user,
+            'content': 'Slow batch'
+        }, headers=auth_headers)
+        assert response.status_code == 202
+        assert json.loads(response.data)['status'] == 'indeterminate'
+
+        # The batch still commits once the writer gets through
+        released.set()
+        deadline = time.monotonic() + 5
+        with app.app_context():
+            while not Message.query.filter_by(content='Slow batch').count() and time.monotonic() < deadline:
+                db.session.rollback()
+                time.sleep(0.05)
+            assert Message.query.filter_by(content='Slow batch').count() == 1
+
+    def test_get_chats_sorted_by_last_message_with_preview(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that the inbox is ordered by latest activity and previews the last message."""
+        with app.app_context():
+            partner = User(name='Partner', email='partner@gmail.com', password_hash='x')
+            db.session.add(partner)
+            db.session.flush()
+            other_chat = Chat(user1_id=sample_user, user2_id=partner.id)
+            db.session.add(other_chat)
+            db.session.commit()
+            other_chat_id = other_chat.id
+        
+        client.post(f'/chats/{sample_chat}/messages', json={'sender_id': sample_user2, 'content': 'First'}, headers=auth_headers)
+        client.post(f'/chats/{other_chat_id}/messages', json={'sender_id': sample_user, 'content': 'Second'}, headers=auth_headers)
+        client.post(f'/chats/{other_chat_id}/messages', json={'sender_id': sample_user, 'content': 'Third'}, headers=auth_headers)
+        
+        chats = json.loads(client.get(f'/chats/{sample_user}', headers=auth_headers).data)['chats']
+        assert [chat['id'] for chat in chats] == [other_chat_id, sample_chat]
+        assert chats[0]['last_message']['content'] == 'Third'
+        assert chats[0]['message_count'] == 2
+        assert chats[1]['last_message']['content'] == 'First'
+        assert chats[1]['last_message']['sender_id'] == sample_user2
+        
+        client.post(f'/chats/{sample_chat}/messages', json={'sender_id': sample_user, 'content': 'Fourth'}, headers=auth_headers)
+        chats = json.loads(client.get(f'/chats/{sample_user}', headers=auth_headers).data)['chats']
+        assert [chat['id'] for chat in chats] == [sample_chat, other_chat_id]
+    
+    def test_bulk_import_keeps_newer_last_message(self, client, sample_user, sample_chat, sample_message, auth_headers, bulk_import_headers):
+        """Test that importing older history counts the messages but keeps the latest preview."""
+        messages = [
+            {'chat_id': sample_chat, 'sender_id': sample_user, 'content': f'Old {i}', 'timestamp': f'2020-01-01T10:{i:02d}:00Z'}
+            for i in range(3)
+        ]
+        response = client.post('/chats/messages/bulk', json={'messages': messages}, headers=bulk_import_headers)
+        assert response.status_code == 201
+        
+        chat = json.loads(client.get(f'/chats/{sample_user}', headers=auth_headers).data)['chats'][0]
+        assert chat['message_count'] == 4
+        assert chat['last_message']['id'] == sample_message
+    
+    def test_export_chat_streams_archived_and_hot_messages(self, client, runner, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that the export streams the whole transcript as JSON Lines and CSV."""
+        with app.app_context():
+            old = datetime.now(timezone.utc) - timedelta(days=400)
+            for i in range(3):
+                db.session.add(Message(chat_id=sample_chat, sender_id=sample_user, content=f'Old {i}', timestamp=old + timedelta(minutes=i)))
+            db.session.commit()
+        runner.invoke(args=['messages', 'archive', '--older-than-days', '365', '--inactive-days', '30', '--segment-size', '2'])
+        client.post(f'/chats/{sample_chat}/messages', json={'sender_id': sample_user2, 'content': 'New, with "quotes"'}, headers=auth_headers)
+        
+        response = client.get(f'/chats/{sample_chat}/export', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        assert f'chat-{sample_chat}.jsonl' in response.headers['Content-Disposition']
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [line['content'] for line in lines] == ['Old 0', 'Old 1', 'Old 2', 'New, with "quotes"']
+        assert lines[-1]['sender_name'] == 'Test User 2'
+        
+        response = client.get(f'/chats/{sample_chat}/export?format=csv', headers=auth_headers)
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert [row['content'] for row in rows] == ['Old 0', 'Old 1', 'Old 2', 'New, with "quotes"']
+        assert rows[0]['sender_name'] == 'Test User'
+    
+    def test_export_chat_invalid_format(self, client, sample_chat, auth_headers):
+        """Test exporting a chat in an unsupported format."""
+        response = client.get(f'/chats/{sample_chat}/export?format=xml', headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_reading_messages_with_a_token_requires_membership(self, client, sample_user, sample_chat, sample_message, app):
+        """Test that a token's user must be in the chat to read or export its messages."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            member_headers = {'Authorization': f'Bearer {issue_token(sample_user)}'}
+            outsider_headers = {'Authorization': f'Bearer {issue_token(outsider.id)}'}
+
+        for path in (f'/chats/{sample_chat}/messages', f'/chats/{sample_chat}/messages?limit=5', f'/chats/{sample_chat}/export'):
+            assert client.get(path, headers=outsider_headers).status_code == 403
+            assert client.get(path, headers=member_headers).status_code == 200
+    
+    def test_chats_found_through_membership(self, client, sample_user, sample_user2, auth_headers, app):
+        """Test that new chats get members and the inbox and search find chats through them."""
+        response = client.post('/chats', json={'user1_id': sample_user, 'user2_id': sample_user2}, headers=auth_headers)
+        chat_id = json.loads(response.data)['id']
+        client.post(f'/chats/{chat_id}/messages', json={'sender_id': sample_user, 'content': 'Study group tonight'}, headers=auth_headers)
+        with app.app_context():
+            assert {member.user_id for member in ChatMember.query.filter_by(chat_id=chat_id)} == {sample_user, sample_user2}
+            # A third member, as a study group chat would have
+            third = User(name='Third User', email='third@gmail.com', password_hash='x')
+            db.session.add(third)
+            db.session.flush()
+            db.session.add(ChatMember(chat_id=chat_id, user_id=third.id))
+            db.session.commit()
+            third_id = third.id
+        
+        response = client.get(f'/chats/{third_id}', headers=auth_headers)
+        assert [chat['id'] for chat in json.loads(response.data)['chats']] == [chat_id]
+        response = client.get(f'/chats/{third_id}/search?q=study', headers=auth_headers)
+        assert [m['content'] for m in json.loads(response.data)['messages']] == ['Study group tonight']
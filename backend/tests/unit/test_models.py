@@ -1,9 +1,12 @@
 import pytest
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from app.models.user import User
 from app.models.chat import Chat
 from app.models.message import Message
+from app.models.chat_participant import ChatParticipant
+from app.models.loader_options import chat_list_options, message_list_options
 from app.models.rating import Rating
+from app.models.rating_summary import RatingSummary
 from werkzeug.security import check_password_hash
 from app.db import db
 
@@ -65,10 +68,17 @@ class TestUserModel:
                 chat_id=chat.id,
                 rating=4
             )
+            # One rating per rater and chat, so the second comes from another partner
+            user3 = User(name="Third User", email="third@gmail.com", password_hash="x")
+            db.session.add(user3)
+            db.session.flush()
+            chat2 = Chat(user1_id=user.id, user2_id=user3.id)
+            db.session.add(chat2)
+            db.session.flush()
             rating2 = Rating(
-                rater_id=user2.id,
+                rater_id=user3.id,
                 rated_id=user.id,
-                chat_id=chat.id,
+                chat_id=chat2.id,
                 rating=5
             )
             
@@ -79,6 +89,63 @@ class TestUserModel:
             db.session.refresh(user)
             assert user.average_rating == 4.5
     
+    def test_user_reputation_decays(self, app, sample_user, sample_user2, sample_chat):
+        """Test that reputation starts at the prior and older ratings count for less."""
+        with app.app_context():
+            user = db.session.get(User, sample_user)
+            assert user.reputation == 3.0
+            
+            # A 5 given one half-life ago weighs half a rating: (5 * 3 + 0.5 * 5) / (5 + 0.5)
+            half_life_ago = datetime.now(timezone.utc) - timedelta(days=180)
+            rating = Rating(rater_id=sample_user2, rated_id=sample_user, chat_id=sample_chat, rating=5, timestamp=half_life_ago)
+            db.session.add(rating)
+            db.session.commit()
+            db.session.refresh(user)
+            assert user.reputation == pytest.approx(17.5 / 5.5, rel=1e-4)
+            assert user.average_rating == 5
+            
+            # Rating again now replaces it with a full-weight 5: (5 * 3 + 5) / (5 + 1)
+            rating.timestamp = datetime.now(timezone.utc)
+            db.session.commit()
+            db.session.refresh(user)
+            assert user.reputation == pytest.approx(20 / 6, rel=1e-4)
+            assert user.rating_summary.rating_count == 1
+    
+    def test_reputation_read_later_is_decayed(self, app, sample_user, sample_user2, sample_chat):
+        """Test that the stored reputation state is decayed to the time it is read."""
+        with app.app_context():
+            db.session.add(Rating(rater_id=sample_user2, rated_id=sample_user, chat_id=sample_chat, rating=1))
+            db.session.commit()
+            summary = db.session.get(RatingSummary, sample_user)
+            now = datetime.now(timezone.utc)
+            assert summary.reputation(now) == pytest.approx(16 / 6, rel=1e-4)
+            assert summary.reputation(now + timedelta(days=180)) == pytest.approx(15.5 / 5.5, rel=1e-4)
+
+    def test_reputation_rescaled_at_landmark(self, app, sample_user, sample_user2, sample_chat, monkeypatch):
+        """Test that the first write after a landmark rescales the sums without changing the reputation."""
+        with app.app_context():
+            rating = Rating(rater_id=sample_user2, rated_id=sample_user, chat_id=sample_chat, rating=1)
+            db.session.add(rating)
+            db.session.commit()
+            summary = db.session.get(RatingSummary, sample_user)
+            assert summary.reputation_period == 0
+
+            monkeypatch.setattr('app.models.rating_summary.reputation_period', lambda timestamp: 1)
+            rating.rating = 5
+            db.session.commit()
+            db.session.refresh(summary)
+            assert summary.reputation_period == 1
+            assert summary.reputation_weight < 1
+            assert summary.reputation() == pytest.approx(20 / 6, rel=1e-4)
+
+            # A writer still on the old landmark has its change rescaled instead
+            monkeypatch.setattr('app.models.rating_summary.reputation_period', lambda timestamp: 0)
+            rating.rating = 1
+            db.session.commit()
+            db.session.refresh(summary)
+            assert summary.reputation_period == 1
+            assert summary.reputation() == pytest.approx(16 / 6, rel=1e-4)
+
     def test_user_to_dict(self, app):
         """Test user to_dict method."""
         with app.app_context():
@@ -236,6 +303,17 @@ class TestMessageModel:
             assert message_dict["is_read"] is False
             assert "timestamp" in message_dict
     
+    def test_message_is_read_from_read_cursor(self, app, sample_message, sample_chat, sample_user2):
+        """Test that is_read is derived from the recipient's read cursor."""
+        with app.app_context():
+            ChatParticipant.mark_read(sample_chat, sample_user2)
+            db.session.commit()
+            message = Message.query.get(sample_message)
+            
+            assert message.is_read is True
+            assert message.to_dict()["is_read"] is True
+            assert message.is_read_by({sample_user2: message.id - 1}) is False
+    
     def test_message_from_dict(self, app, sample_chat, sample_user):
         """Test creating message from dictionary."""
         with app.app_context():
@@ -252,6 +330,26 @@ class TestMessageModel:
             assert message.chat_id == chat.id
             assert message.sender_id == user.id
             assert message.content == "Test message from dict"
+    
+    def test_string_timestamp_reaches_flush_as_datetime(self, app, sample_chat, sample_user):
+        """Test that a client's ISO string is stored aware before the after_flush hook reads it."""
+        from app.services.message_writer import write_messages
+        with app.app_context():
+            message = Message(chat_id=sample_chat, sender_id=sample_user, content="Direct",
+                              timestamp="2030-01-02T03:04:05Z")
+            assert message.timestamp == datetime(2030, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+            db.session.add(message)
+            db.session.commit()
+            
+            # The group-commit writer builds its messages from the request data
+            saved = write_messages([{"chat_id": sample_chat, "sender_id": sample_user,
+                                     "content": "Batched", "timestamp": "2031-01-01T00:00:00+00:00"}])
+            assert saved[0]["timestamp"] == "2031-01-01T00:00:00+00:00"
+            chat = db.session.get(Chat, sample_chat)
+            assert chat.last_message_id == saved[0]["id"]
+            
+            with pytest.raises(ValueError):
+                Message(chat_id=sample_chat, sender_id=sample_user, content="Bad", timestamp="soon")
 
 
 class TestRatingModel:
@@ -312,4 +410,33 @@ class TestRatingModel:
             assert rating.rated_id == user2.id
             assert rating.chat_id == chat.id
             assert rating.rating == 4
-            assert rating.comment == "Good experience" 
\ No newline at end of file
+            assert rating.comment == "Good experience" 
+
+class TestLoaderOptions:
+    """Test cases for the list loader options."""
+    
+    def test_message_list_options_serialize_detached(self, app, sample_chat, sample_user, sample_user2):
+        """Test that messages loaded with the list options serialize without any further queries."""
+        with app.app_context():
+            for sender_id in [sample_user, sample_user2]:
+                db.session.add(Message(chat_id=sample_chat, sender_id=sender_id, content="Hi"))
+            db.session.commit()
+            query = db.select(Message).where(Message.chat_id == sample_chat).options(*message_list_options())
+            messages = db.session.scalars(query).all()
+            # Detached objects cannot lazy load, so any query during to_dict would raise
+            db.session.expunge_all()
+            
+            names = [message.to_dict(read_cursors={})["sender_name"] for message in messages]
+            assert names == ["Test User", "Test User 2"]
+    
+    def test_chat_list_options_serialize_detached(self, app, sample_chat):
+        """Test that chats loaded with the list options serialize without any further queries."""
+        with app.app_context():
+            query = db.select(Chat).where(Chat.id == sample_chat).options(*chat_list_options())
+            chat = db.session.scalars(query).unique().one()
+            db.session.expunge_all()
+            
+            chat_dict = chat.to_dict(current_user_id=chat.user1_id, is_rated=False)
+            assert chat_dict["user1_name"] == "Test User"
+            assert chat_dict["user2_name"] == "Test User 2"
+            assert chat_dict["is_rated_by_current_user"] is False
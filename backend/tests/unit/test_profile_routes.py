@@ -2,6 +2,7 @@ import pytest
 import json
 from app.models.user import User
 from app.models.rating import Rating
+from app.services.profile_cache import profile_cache
 from app.db import db
 
 
@@ -174,9 +175,17 @@ class TestProfileRoutes:
             db.session.add(chat)
             db.session.commit()
             
+            # One rating per rater and chat, so the second comes from another partner
+            user3 = User(name="Third User", email="third@gmail.com", password_hash="x")
+            db.session.add(user3)
+            db.session.flush()
+            chat2 = Chat(user1_id=user.id, user2_id=user3.id)
+            db.session.add(chat2)
+            db.session.commit()
+            
             # Add ratings
             rating1 = Rating(rater_id=user2.id, rated_id=user.id, chat_id=chat.id, rating=4, comment="Good")
-            rating2 = Rating(rater_id=user2.id, rated_id=user.id, chat_id=chat.id, rating=5, comment="Excellent")
+            rating2 = Rating(rater_id=user3.id, rated_id=user.id, chat_id=chat2.id, rating=5, comment="Excellent")
             db.session.add_all([rating1, rating2])
             db.session.commit()
 
@@ -190,4 +199,166 @@ class TestProfileRoutes:
         response = client.get(f'/profile/{sample_user}')
         assert response.status_code == 200
         data = json.loads(response.data)
-        assert data['average_rating'] == 0.0 
\ No newline at end of file
+        assert data['average_rating'] == 0.0 
+
+class TestProfileCache:
+    """Test cases for the serialized profile cache."""
+    
+    def test_etag_and_not_modified(self, client, sample_user):
+        """Test that a profile comes with an ETag and revalidates with 304."""
+        response = client.get(f'/profile/{sample_user}')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert 'no-cache' in response.headers['Cache-Control']
+        
+        response = client.get(f'/profile/{sample_user}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+    
+    def test_cached_profile_skips_database(self, client, sample_user, app):
+        """Test that a cached profile is served without any query."""
+        from sqlalchemy import event
+        client.get(f'/profile/{sample_user}')
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                response = client.get(f'/profile/{sample_user}')
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert response.status_code == 200
+        assert json.loads(response.data)['name'] == 'Test User'
+        assert statements == []
+    
+    def test_update_profile_invalidates(self, client, sample_user):
+        """Test that a profile update changes the served profile and its ETag."""
+        etag = client.get(f'/profile/{sample_user}').headers['ETag']
+        client.put(f'/profile/{sample_user}', json={'bio': 'New bio'})
+        
+        response = client.get(f'/profile/{sample_user}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert json.loads(response.data)['bio'] == 'New bio'
+    
+    def test_stale_put_after_invalidation_is_refused(self, client, sample_user, app):
+        """Test that a profile read before a concurrent update is not cached after it."""
+        with app.test_request_context():
+            # A reader misses and loads the profile as it is now
+            miss = profile_cache.get(sample_user)
+            assert miss.etag is None
+            stale_body = json.dumps(db.session.get(User, sample_user).to_dict())
+            db.session.rollback()
+
+            # A writer commits an update and invalidates before the reader caches
+            assert client.put(f'/profile/{sample_user}', json={'bio': 'New bio'}).status_code == 200
+            served = profile_cache.put(sample_user, stale_body, miss)
+            assert json.loads(served.body)['bio'] != 'New bio'
+            assert profile_cache.get(sample_user).etag is None
+
+        assert json.loads(client.get(f'/profile/{sample_user}').data)['bio'] == 'New bio'
+        assert json.loads(client.get(f'/profile/{sample_user}').data)['bio'] == 'New bio'
+
+    def test_new_rating_invalidates(self, client, sample_user, sample_user2, sample_chat):
+        """Test that a rating shows up in the rated user's cached profile."""
+        assert json.loads(client.get(f'/profile/{sample_user2}').data)['average_rating'] == 0
+        response = client.post('/ratings', json={
+            'rater_id': sample_user, 'rated_id': sample_user2, 'chat_id': sample_chat, 'rating': 4
+        })
+        assert response.status_code == 201
+        assert json.loads(client.get(f'/profile/{sample_user2}').data)['average_rating'] == 4
+    
+    def test_profile_image_invalidates(self, client, sample_user, app):
+        """Test that uploading and deleting a profile image refresh the cached profile."""
+        from io import BytesIO
+        from PIL import Image
+        image = BytesIO()
+        Image.new('RGB', (10, 10), color='red').save(image, format='PNG')
+        image.seek(0)
+        client.get(f'/profile/{sample_user}')
+        
+        response = client.post(f'/upload/profile-image/{sample_user}', data={'image': (image, 'avatar.png')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        assert json.loads(client.get(f'/profile/{sample_user}').data)['image_url'] == response.get_json()['image_url']
+        
+        assert client.delete(f'/upload/profile-image/{sample_user}').status_code == 200
+        assert json.loads(client.get(f'/profile/{sample_user}').data)['image_url'] is None
+    
+    def test_unknown_backend(self):
+        """Test that an unknown cache URL scheme is rejected at startup."""
+        from app import create_app
+        with pytest.raises(ValueError):
+            create_app({'TESTING': True, 'PROFILE_CACHE_URL': 'memcached://localhost'})
+
+
+class TestProfileChanges:
+    """Test cases for field-level diffing and profile change events."""
+    
+    @pytest.fixture
+    def events(self, app):
+        from app.services.profile_events import profile_changed
+        received = []
+        
+        def receiver(sender, **kwargs):
+            received.append(kwargs)
+        
+        profile_changed.connect(receiver)
+        yield received
+        profile_changed.disconnect(receiver)
+    
+    def test_unchanged_values_write_nothing(self, client, sample_user, events, app):
+        """Test that resending the current values is a no-op."""
+        from sqlalchemy import event
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            version = db.session.get(User, sample_user).version
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                response = client.patch(f'/profile/{sample_user}', json={
+                    'name': 'Test User', 'skills_to_offer': ['Python', 'Cooking'], 'unknown': 'ignored'
+                })
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+            db.session.expire_all()
+            assert db.session.get(User, sample_user).version == version
+        assert response.status_code == 200
+        assert json.loads(response.data)['name'] == 'Test User'
+        assert not any(statement.lstrip().startswith('UPDATE') for statement in statements)
+        assert events == []
+    
+    def test_change_event_lists_changed_fields(self, client, sample_user, events):
+        """Test that only changed fields are reported, with their kinds."""
+        from app.services.profile_events import ProfileChange
+        response = client.patch(f'/profile/{sample_user}', json={
+            'bio': 'Test bio', 'skills_to_learn': ['Guitar', 'Drums'], 'location': 'Elsewhere'
+        })
+        assert response.status_code == 200
+        assert len(events) == 1
+        assert events[0]['user_id'] == sample_user
+        assert events[0]['changes'] == {ProfileChange.SKILLS, ProfileChange.DETAILS}
+        assert events[0]['fields'] == {
+            'skills_to_learn': (['Guitar', 'Spanish'], ['Guitar', 'Drums']),
+            'location': ('Test City', 'Elsewhere')
+        }
+    
+    def test_principal_only_dropped_on_name_change(self, client, sample_user, app):
+        """Test that consumers only react to the kinds of change they use."""
+        principals = app.extensions['principal_cache']
+        client.get(f'/chats/{sample_user}')
+        client.patch(f'/profile/{sample_user}', json={'bio': 'Another bio'})
+        assert principals.get(sample_user) is not None
+        client.patch(f'/profile/{sample_user}', json={'name': 'New Name'})
+        assert principals.get(sample_user) is None
+    
+    def test_update_profile_requires_object(self, client, sample_user):
+        """Test that a body that is not a JSON object is rejected."""
+        response = client.patch(f'/profile/{sample_user}', json=['name'])
+        assert response.status_code == 400
@@ -0,0 +1,213 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models.user import User
+from app.models.chat import Chat
+from app.models.message import Message
+from app.models.rating import Rating
+from app.db import db
+
+
+@contextmanager
+def capture_statements():
+    """Record every (statement, parameters) pair sent to the database."""
+    statements = []
+    engine = db.engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(statement, parameters):
+    """Return the query plan lines for a captured statement."""
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        # Make the planner use any usable index, so a seq scan means there is none
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).all()
+        return [row[0] for row in rows]
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def sequential_scans(plan):
+    """Return the plan lines that read a whole table."""
+    return [
+        line for line in plan
+        if "Seq Scan" in line
+        or (line.startswith("SCAN ") and not line.startswith(("SCAN CONSTANT ROW", "SCAN (subquery")))
+    ]
+
+
+def assert_no_sequential_scans(statements):
+    """Explain each captured statement and fail with the offending plans."""
+    regressions = []
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+            continue
+        plan = explain(statement, parameters)
+        if sequential_scans(plan):
+            regressions.append(f"{statement}\n    " + "\n    ".join(plan))
+    db.session.rollback()
+    assert not regressions, "Sequential scans found:\n" + "\n".join(regressions)
+
+
+@pytest.fixture
+def seeded_db(app, sample_user, sample_user2, sample_chat):
+    """Seed enough users, chats, messages and ratings for the planner to have a choice."""
+    with app.app_context():
+        users = []
+        for i in range(20):
+            user = User(name=f"Seed User {i}", email=f"seed{i}@gmail.com", password_hash="x")
+            db.session.add(user)
+            users.append(user)
+        db.session.flush()
+        for i, user in enumerate(users):
+            partner = users[(i + 1) % len(users)]
+            chat = Chat(user1_id=user.id, user2_id=partner.id)
+            db.session.add(chat)
+            db.session.flush()
+            for j in range(10):
+                db.session.add(Message(chat_id=chat.id, sender_id=user.id if j % 2 else partner.id, content=f"Seed {j}"))
+            db.session.add(Rating(rater_id=user.id, rated_id=partner.id, chat_id=chat.id, rating=4))
+        db.session.add(Message(chat_id=sample_chat, sender_id=sample_user, content="Hello"))
+        db.session.commit()
+        return {"user_id": sample_user, "user2_id": sample_user2, "chat_id": sample_chat}
+
+
+class TestQueryPlans:
+    """Fail if any route's queries regress to a sequential scan."""
+
+    def test_get_user_chats_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/chats/{seeded_db['user_id']}")
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_get_user_chats_read_in_index_order(self, client, seeded_db, app):
+        """The inbox must come off the membership index in order, without a sort."""
+        with app.app_context():
+            with capture_statements() as statements:
+                client.get(f"/chats/{seeded_db['user_id']}")
+            inbox = [(s, p) for s, p in statements if "chat_members.last_message_at DESC" in s]
+            assert len(inbox) == 1
+            plan = explain(*inbox[0])
+            db.session.rollback()
+            assert not [line for line in plan if "TEMP B-TREE" in line or "Sort" in line], "\n".join(plan)
+
+    def test_mark_messages_as_read_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.put(f"/chats/{seeded_db['chat_id']}/messages/read", json={
+                    "user_id": seeded_db["user2_id"]
+                })
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_create_chat_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.post("/chats", json={
+                    "user1_id": seeded_db["user_id"],
+                    "user2_id": seeded_db["user2_id"]
+                })
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_get_chat_messages_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/chats/{seeded_db['chat_id']}/messages")
+                paged_response = client.get(f"/chats/{seeded_db['chat_id']}/messages?limit=5")
+            assert response.status_code == 200
+            assert paged_response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_export_chat_messages_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/chats/{seeded_db['chat_id']}/export")
+                response.get_data()
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_send_message_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.post(f"/chats/{seeded_db['chat_id']}/messages", json={
+                    "sender_id": seeded_db["user_id"],
+                    "content": "Plan check"
+                })
+            assert response.status_code == 201
+            assert_no_sequential_scans(statements)
+
+    def test_create_rating_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.post("/ratings", json={
+                    "rater_id": seeded_db["user2_id"],
+                    "rated_id": seeded_db["user_id"],
+                    "chat_id": seeded_db["chat_id"],
+                    "rating": 5
+                })
+            assert response.status_code == 201
+            assert_no_sequential_scans(statements)
+
+    def test_get_user_ratings_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/ratings/user/{seeded_db['user_id']}?limit=5")
+                summary_response = client.get(f"/ratings/user/{seeded_db['user_id']}/summary")
+            assert response.status_code == 200
+            assert summary_response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_get_profile_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/profile/{seeded_db['user_id']}")
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_sync_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.get(f"/sync/{seeded_db['user_id']}?since=0.0")
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_login_plan(self, client, seeded_db, app):
+        with app.app_context():
+            with capture_statements() as statements:
+                response = client.post("/auth/login", json={"email": "Test@Gmail.com", "password": "testpassword"})
+            assert response.status_code == 200
+            assert_no_sequential_scans(statements)
+
+    def test_search_users_plan(self, client, seeded_db, app):
+        with app.app_context():
+            if db.engine.dialect.name != "postgresql":
+                pytest.skip("SQLite has no trigram or array indexes and scans users")
+            with capture_statements() as statements:
+                responses = [
+                    client.get("/users/search?q=seed"),
+                    client.get("/users/search?q=se"),
+                    client.get("/users/search?skill=Python&location=test"),
+                ]
+            assert all(response.status_code == 200 for response in responses)
+            assert_no_sequential_scans(statements)
+
+    def test_detects_sequential_scan(self, seeded_db, app):
+        """The harness itself must flag an unindexed predicate."""
+        with app.app_context():
+            with capture_statements() as statements:
+                db.session.execute(db.select(Message).where(Message.content == "Hello")).all()
+            with pytest.raises(AssertionError, match="Sequential scans found"):
+                assert_no_sequential_scans(statements)
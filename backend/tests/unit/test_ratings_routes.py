@@ -1,8 +1,9 @@
-import pytest
 import json
+from sqlalchemy import event
 from app.models.user import User
 from app.models.rating import Rating
 from app.models.chat import Chat
+from app.services.rating_upsert import save_rating
 from app.db import db
 
 
@@ -112,8 +113,8 @@ class TestRatingsRoutes:
         
         assert response.status_code == 400
     
-    def test_create_rating_duplicate(self, client, sample_user, sample_user2, sample_chat, sample_rating, auth_headers):
-        """Test creating duplicate rating for same chat."""
+    def test_create_rating_duplicate(self, client, sample_user, sample_user2, sample_chat, sample_rating, auth_headers, app):
+        """Test that rating the same chat again replaces the earlier rating."""
         rating_data = {
             'rater_id': sample_user,
             'rated_id': sample_user2,
@@ -124,7 +125,68 @@ class TestRatingsRoutes:
         
         response = client.post('/ratings', json=rating_data, headers=auth_headers)
         
-        assert response.status_code == 201 or response.status_code == 400
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['id'] == sample_rating
+        assert data['rating'] == 4
+        assert data['rater_name'] == 'Test User'
+        with app.app_context():
+            assert Rating.query.filter_by(chat_id=sample_chat).count() == 1
+        summary = json.loads(client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers).data)
+        assert summary['count'] == 1
+        assert summary['histogram'] == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0}
+    
+    def test_create_rating_double_submit(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that submitting the same rating twice stores it once."""
+        rating_data = {'rater_id': sample_user, 'rated_id': sample_user2, 'chat_id': sample_chat, 'rating': 5}
+        
+        assert client.post('/ratings', json=rating_data, headers=auth_headers).status_code == 201
+        assert client.post('/ratings', json=rating_data, headers=auth_headers).status_code == 200
+        with app.app_context():
+            assert Rating.query.filter_by(chat_id=sample_chat).count() == 1
+        assert json.loads(client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers).data)['count'] == 1
+    
+    def test_create_rating_statements(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
+        """Test that a rating is validated with one query and saved with one upsert."""
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                response = client.post('/ratings', json={
+                    'rater_id': sample_user, 'rated_id': sample_user2, 'chat_id': sample_chat, 'rating': 5
+                }, headers=auth_headers)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        
+        assert response.status_code == 201
+        assert sum(s.lstrip().startswith('SELECT') for s in statements) == 1
+        assert sum(s.lstrip().startswith('INSERT INTO ratings') for s in statements) == 1
+        # The rating, the rated user's summary and the chat's sync version
+        assert len(statements) == 4
+    
+    def test_create_rating_not_a_member(self, client, sample_user, sample_chat, auth_headers, app):
+        """Test that only members of the chat can rate each other in it."""
+        with app.app_context():
+            outsider = User(name='Outsider', email='outsider@gmail.com', password_hash='x')
+            db.session.add(outsider)
+            db.session.commit()
+            outsider_id = outsider.id
+        
+        response = client.post('/ratings', json={
+            'rater_id': outsider_id, 'rated_id': sample_user, 'chat_id': sample_chat, 'rating': 5
+        }, headers=auth_headers)
+        assert response.status_code == 403
+    
+    def test_create_rating_self(self, client, sample_user, sample_chat, auth_headers):
+        """Test that users cannot rate themselves."""
+        response = client.post('/ratings', json={
+            'rater_id': sample_user, 'rated_id': sample_user, 'chat_id': sample_chat, 'rating': 5
+        }, headers=auth_headers)
+        assert response.status_code == 400
     
     def test_create_rating_empty_comment(self, client, sample_user, sample_user2, sample_chat, auth_headers):
         """Test creating rating with empty comment."""
@@ -178,15 +240,21 @@ class TestRatingsRoutes:
     def test_create_rating_all_rating_values(self, client, sample_user, sample_user2, sample_chat, auth_headers, app):
         """Test creating ratings with all valid rating values (1-5)."""
         for rating_value in range(1, 6):
+            # Each pair of users has one chat, so rate a new partner each time
             with app.app_context():
-                new_chat = Chat(user1_id=sample_user, user2_id=sample_user2)
+                partner = User(name=f"Partner {rating_value}", email=f"partner{rating_value}@gmail.com")
+                partner.set_password("testpassword")
+                db.session.add(partner)
+                db.session.flush()
+                new_chat = Chat(user1_id=sample_user, user2_id=partner.id)
                 db.session.add(new_chat)
                 db.session.commit()
                 chat_id = new_chat.id
+                partner_id = partner.id
             
             rating_data = {
                 'rater_id': sample_user,
-                'rated_id': sample_user2,
+                'rated_id': partner_id,
                 'chat_id': chat_id,
                 'rating': rating_value,
                 'comment': f'Rating {rating_value}'
@@ -214,4 +282,80 @@ class TestRatingsRoutes:
         
         assert response.status_code == 201
         data = json.loads(response.data)
-        assert data['comment'] == special_comment
\ No newline at end of file
+        assert data['comment'] == special_comment    
+    def _rate_new_partners(self, app, rated_id, values):
+        """Have a new partner rate rated_id in a new chat for each value."""
+        with app.app_context():
+            for i, value in enumerate(values):
+                partner = User(name=f"Rater {i}", email=f"rater{i}@gmail.com", password_hash='x')
+                db.session.add(partner)
+                db.session.flush()
+                chat = Chat(user1_id=partner.id, user2_id=rated_id)
+                db.session.add(chat)
+                db.session.flush()
+                db.session.add(Rating(rater_id=partner.id, rated_id=rated_id, chat_id=chat.id, rating=value))
+            db.session.commit()
+    
+    def test_get_user_ratings_paginated(self, client, sample_user, app, auth_headers):
+        """Test paging through a user's received ratings, newest first."""
+        self._rate_new_partners(app, sample_user, [5, 4, 3, 2, 1])
+        
+        response = client.get(f'/ratings/user/{sample_user}?limit=2', headers=auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [r['rating'] for r in data['ratings']] == [1, 2]
+        assert data['ratings'][0]['rater_name'] == 'Rater 4'
+        
+        seen = [r['rating'] for r in data['ratings']]
+        while data['next_before'] is not None:
+            data = json.loads(client.get(f"/ratings/user/{sample_user}?limit=2&before={data['next_before']}", headers=auth_headers).data)
+            seen += [r['rating'] for r in data['ratings']]
+        assert seen == [1, 2, 3, 4, 5]
+    
+    def test_get_user_ratings_invalid_limit(self, client, sample_user, auth_headers):
+        """Test listing ratings with an invalid page size."""
+        assert client.get(f'/ratings/user/{sample_user}?limit=0', headers=auth_headers).status_code == 400
+        assert client.get(f'/ratings/user/{sample_user}?before=abc', headers=auth_headers).status_code == 400
+        assert client.get('/ratings/user/99999', headers=auth_headers).status_code == 404
+    
+    def test_rating_summary(self, client, sample_user, sample_user2, sample_chat, app, auth_headers):
+        """Test that the summary follows created ratings."""
+        response = client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers)
+        assert response.status_code == 200
+        assert json.loads(response.data) == {
+            'user_id': sample_user2, 'count': 0, 'mean': None,
+            'histogram': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0}, 'reputation': 3.0
+        }
+        
+        client.post('/ratings', json={'rater_id': sample_user, 'rated_id': sample_user2, 'chat_id': sample_chat, 'rating': 5}, headers=auth_headers)
+        self._rate_new_partners(app, sample_user2, [4, 4])
+        
+        data = json.loads(client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers).data)
+        assert data['count'] == 3
+        assert data['mean'] == 4.33
+        assert data['histogram'] == {'1': 0, '2': 0, '3': 0, '4': 2, '5': 1}
+    
+    def test_rating_summary_follows_purged_chats(self, client, sample_user2, sample_chat, sample_rating, runner, app, auth_headers, token_headers):
+        """Test that purging a deleted chat takes its ratings out of the summary."""
+        app.config['CHAT_PURGE_IN_BACKGROUND'] = False
+        assert json.loads(client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers).data)['count'] == 1
+        
+        client.delete(f'/chats/{sample_chat}', headers=token_headers)
+        runner.invoke(args=['chats', 'purge'])
+        
+        data = json.loads(client.get(f'/ratings/user/{sample_user2}/summary', headers=auth_headers).data)
+        assert data['count'] == 0
+        assert data['histogram']['5'] == 0
+    
+    def test_create_rating_out_of_range(self, client, sample_user, sample_user2, sample_chat, auth_headers):
+        """Test that ratings outside 1-5 are rejected."""
+        for value in (0, 6, 'five', 4.0, True):
+            response = client.post('/ratings', json={'rater_id': sample_user, 'rated_id': sample_user2, 'chat_id': sample_chat, 'rating': value}, headers=auth_headers)
+            assert response.status_code == 400
+
+    def test_save_rating_rejects_booleans(self, sample_user, sample_user2, sample_chat, app):
+        """Test that the rating service rejects a boolean, which Python counts as the int 1."""
+        with app.app_context():
+            response_data, status_code = save_rating(sample_user, sample_user2, sample_chat, True)
+            assert status_code == 400
+            assert Rating.query.count() == 0
@@ -0,0 +1,130 @@
+import json
+from app.models.user import User
+from app.models.chat import Chat
+from app.models.message import Message
+from app.services.sync import parse_sync_token, sync_user
+from app.db import db
+
+
+class TestSyncRoutes:
+    """Test cases for sync routes."""
+
+    def test_full_sync_without_token(self, client, sample_user, sample_chat, sample_message, auth_headers):
+        """Test that a sync without a token returns every chat and the profile."""
+        response = client.get(f'/sync/{sample_user}', headers=auth_headers)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['chat_ids'] == [sample_chat]
+        assert [chat['id'] for chat in data['chats']] == [sample_chat]
+        assert data['messages'] == {}
+        assert data['profile']['id'] == sample_user
+        assert data['has_more'] is False
+        assert data['token']
+
+    def test_sync_returns_only_changes(self, client, sample_user, sample_user2, sample_chat, sample_message, auth_headers, app):
+        """Test that a sync with a token returns only new messages and the chats they changed."""
+        with app.app_context():
+            other = User(name='Other User', email='other@gmail.com', password_hash='x')
+            db.session.add(other)
+            db.session.flush()
+            quiet_chat = Chat(user1_id=sample_user, user2_id=other.id)
+            db.session.add(quiet_chat)
+            db.session.commit()
+            quiet_chat_id = quiet_chat.id
+        token = json.loads(client.get(f'/sync/{sample_user}', headers=auth_headers).data)['token']
+
+        # Nothing changed
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert data['chats'] == []
+        assert data['messages'] == {}
+        assert data['profile'] is None
+        assert data['chat_ids'] == [sample_chat, quiet_chat_id]
+
+        client.post(f'/chats/{sample_chat}/messages', json={'sender_id': sample_user2, 'content': 'New one'}, headers=auth_headers)
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert [chat['id'] for chat in data['chats']] == [sample_chat]
+        assert data['chats'][0]['unread_count'] == 1
+        assert [m['content'] for m in data['messages'][str(sample_chat)]] == ['New one']
+        assert data['profile'] is None
+
+        # Reading the chat changes its unread count
+        token = data['token']
+        client.put(f'/chats/{sample_chat}/messages/read', json={'user_id': sample_user}, headers=auth_headers)
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert [chat['id'] for chat in data['chats']] == [sample_chat]
+        assert data['chats'][0]['unread_count'] == 0
+        assert data['messages'] == {}
+
+    def test_sync_returns_profile_changes(self, client, sample_user, sample_user2, sample_chat, auth_headers):
+        """Test that the user's and chat partners' profile updates are synced."""
+        token = json.loads(client.get(f'/sync/{sample_user}', headers=auth_headers).data)['token']
+
+        client.put(f'/profile/{sample_user}', json={'bio': 'New bio'}, headers=auth_headers)
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert data['profile']['bio'] == 'New bio'
+        assert data['chats'] == []
+
+        token = data['token']
+        client.put(f'/profile/{sample_user2}', json={'name': 'Renamed'}, headers=auth_headers)
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert data['profile'] is None
+        assert [chat['user2_name'] for chat in data['chats']] == ['Renamed']
+
+    def test_sync_drops_deleted_chats(self, client, sample_user, sample_chat, auth_headers, app, token_headers):
+        """Test that deleted chats leave chat_ids."""
+        app.config['CHAT_PURGE_IN_BACKGROUND'] = False
+        token = json.loads(client.get(f'/sync/{sample_user}', headers=auth_headers).data)['token']
+        client.delete(f'/chats/{sample_chat}', headers=token_headers)
+
+        data = json.loads(client.get(f'/sync/{sample_user}?since={token}', headers=auth_headers).data)
+        assert data['chat_ids'] == []
+        assert data['chats'] == []
+
+    def test_sync_pages_messages(self, sample_user, sample_user2, sample_chat, app):
+        """Test that messages past the limit are left for the next sync."""
+        with app.app_context():
+            user = db.session.get(User, sample_user)
+            token = sync_user(user)['token']
+            for i in range(5):
+                db.session.add(Message(chat_id=sample_chat, sender_id=sample_user2, content=f'Message {i}'))
+            db.session.commit()
+
+            first = sync_user(user, parse_sync_token(token), message_limit=3)
+            assert first['has_more'] is True
+            assert [m['content'] for m in first['messages'][sample_chat]] == ['Message 0', 'Message 1', 'Message 2']
+            second = sync_user(user, parse_sync_token(first['token']), message_limit=3)
+            assert second['has_more'] is False
+            assert [m['content'] for m in second['messages'][sample_chat]] == ['Message 3', 'Message 4']
+
+    def test_sync_waits_for_older_transactions(self, sample_user, sample_user2, sample_chat, app, monkeypatch):
+        """Test that a message committed behind a newer one is not skipped."""
+        with app.app_context():
+            user = db.session.get(User, sample_user)
+            token = sync_user(user)['token']
+            _, head = parse_sync_token(token)
+
+            # Interleave two transactions as PostgreSQL can: the first takes the
+            # lower id and version but commits after the second
+            db.session.add(Message(id=101, version=head + 2, chat_id=sample_chat, sender_id=sample_user2, content='Second'))
+            db.session.commit()
+            # The first is still in flight, so the watermark stays below it
+            monkeypatch.setattr('app.services.sync.current_version', lambda: head)
+            during = sync_user(user, parse_sync_token(token))
+            assert during['messages'] == {}
+
+            db.session.add(Message(id=100, version=head + 1, chat_id=sample_chat, sender_id=sample_user2, content='First'))
+            db.session.commit()
+            monkeypatch.undo()
+            after = sync_user(user, parse_sync_token(during['token']))
+            assert [m['content'] for m in after['messages'][sample_chat]] == ['First', 'Second']
+
+    def test_sync_invalid_token(self, client, sample_user, auth_headers):
+        """Test syncing with a malformed token."""
+        response = client.get(f'/sync/{sample_user}?since=abc', headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_sync_nonexistent_user(self, client, auth_headers):
+        """Test syncing a user that does not exist."""
+        response = client.get('/sync/99999', headers=auth_headers)
+        assert response.status_code == 404
@@ -0,0 +1,50 @@
+import json
+from app.models.user import User
+
+
+class TestUserImport:
+    """Test cases for the flask users import command."""
+    
+    def test_import_users_command_csv(self, runner, client, sample_user, tmp_path, app):
+        """Test importing users from CSV, rejecting invalid and duplicate emails."""
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        path = tmp_path / 'users.csv'
+        path.write_text(
+            'name,email,password,skills_to_offer\n'
+            'Ada,ada@example.com,secret1,Python;Math\n'
+            'Grace,grace@example.com,secret2,\n'
+            'Copy,ADA@example.com,secret3,\n'
+            'Existing,Test@Gmail.com,secret4,\n'
+            'Nameless,,secret5,\n'
+        )
+        
+        result = runner.invoke(args=['users', 'import', str(path), '--chunk-size', '2', '--workers', '0'])
+        
+        assert result.exit_code == 0
+        assert 'Imported 2 users (3 rejected)' in result.output
+        assert 'Rejected record 2: Duplicate email ADA@example.com in file' in result.output
+        assert 'Rejected record 3: Email Test@Gmail.com already registered' in result.output
+        assert 'Rejected record 4: Invalid data' in result.output
+        with app.app_context():
+            ada = User.by_email('ada@example.com')
+            assert ada.skills_to_offer == ['Python', 'Math']
+            assert ada.password_hash.startswith('pbkdf2:sha256:1000$')
+        response = client.post('/auth/login', json={'email': 'grace@example.com', 'password': 'secret2'})
+        assert response.status_code == 200
+    
+    def test_import_users_hashes_in_worker_processes(self, runner, client, tmp_path, app):
+        """Test importing JSON Lines users with the passwords hashed in a process pool."""
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+        path = tmp_path / 'users.jsonl'
+        path.write_text('\n'.join(
+            json.dumps({'name': f'User {i}', 'email': f'user{i}@example.com', 'password': f'secret{i}',
+                        'skills_to_learn': ['Guitar']})
+            for i in range(5)
+        ))
+        
+        result = runner.invoke(args=['users', 'import', str(path), '--workers', '2'])
+        
+        assert result.exit_code == 0, result.output
+        assert 'Imported 5 users (0 rejected)' in result.output
+        response = client.post('/auth/login', json={'email': 'user3@example.com', 'password': 'secret3'})
+        assert response.status_code == 200
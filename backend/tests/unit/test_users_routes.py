@@ -0,0 +1,81 @@
+import pytest
+import json
+from app.models.user import User
+from app.db import db
+
+
+@pytest.fixture
+def directory(app, sample_user, sample_user2):
+    """Add users with a mix of names, locations and skills to search."""
+    with app.app_context():
+        people = [
+            ('Ada Lovelace', 'London', ['Math', 'Python'], ['Poetry']),
+            ('Adam Smith', 'Edinburgh', ['Economics'], ['Python']),
+            ('Grace Hopper', 'New York', ['COBOL'], ['Math']),
+            ('Percy 100%', 'London', [], []),
+        ]
+        ids = {}
+        for name, location, offer, learn in people:
+            user = User(name=name, email=f"{name.split()[0].lower()}@example.com", password_hash='x',
+                        location=location, skills_to_offer=offer, skills_to_learn=learn)
+            db.session.add(user)
+            db.session.flush()
+            ids[name] = user.id
+        db.session.commit()
+        return ids
+
+
+class TestUsersRoutes:
+    """Test cases for the user directory search."""
+    
+    def search(self, client, **params):
+        response = client.get('/users/search', query_string=params)
+        assert response.status_code == 200
+        return json.loads(response.data)
+    
+    def names(self, data):
+        return [user['name'] for user in data['users']]
+    
+    def test_search_by_name(self, client, directory):
+        """Test substring and short prefix matches on the name, ignoring case."""
+        assert self.names(self.search(client, q='LOVE')) == ['Ada Lovelace']
+        assert self.names(self.search(client, q='ad')) == ['Adam Smith', 'Ada Lovelace']
+        # Short terms only match at the start of the name
+        assert self.names(self.search(client, q='ce')) == []
+    
+    def test_search_escapes_wildcards(self, client, directory):
+        """Test that LIKE wildcards in the query match literally."""
+        assert self.names(self.search(client, q='100%')) == ['Percy 100%']
+        assert self.names(self.search(client, q='a_a')) == []
+    
+    def test_search_by_skill_and_location(self, client, directory):
+        """Test that skills match offered or wanted skills and all filters must match."""
+        assert self.names(self.search(client, skill='Math')) == ['Grace Hopper', 'Ada Lovelace']
+        assert self.names(self.search(client, skill='math')) == []
+        assert self.names(self.search(client, skill='Math', location='york')) == ['Grace Hopper']
+        assert self.names(self.search(client, q='ada', skill='Economics')) == ['Adam Smith']
+        assert self.names(self.search(client, q='grace', skill='Economics')) == []
+    
+    def test_search_returns_cards(self, client, directory):
+        """Test that results are compact cards, not full profiles."""
+        card = self.search(client, q='Grace')['users'][0]
+        assert set(card) == {'id', 'name', 'pronouns', 'location', 'image_url', 'skills_to_offer', 'skills_to_learn'}
+    
+    def test_search_pagination(self, client, directory, sample_user, sample_user2):
+        """Test paging through all users, newest first, with next_before."""
+        seen = []
+        before = None
+        while True:
+            params = {'limit': 2} if before is None else {'limit': 2, 'before': before}
+            data = self.search(client, **params)
+            seen.extend(user['id'] for user in data['users'])
+            before = data['next_before']
+            if before is None:
+                break
+        assert seen == sorted([sample_user, sample_user2, *directory.values()], reverse=True)
+    
+    def test_search_invalid_limit(self, client):
+        """Test that the page size is bounded and must be an integer."""
+        assert client.get('/users/search?limit=0').status_code == 400
+        assert client.get('/users/search?limit=1000').status_code == 400
+        assert client.get('/users/search?before=abc').status_code == 400